@@ -0,0 +1,67 @@
+"""Password hashing on a bounded pool, with a configurable work factor.
+
+``PooledPBKDF2PasswordHasher`` is Django's PBKDF2 hasher (same
+``pbkdf2_sha256`` format, so existing hashes keep verifying) with the
+key derivation run on a per-process pool of ``PASSWORD_HASH_WORKERS``
+threads. At most ``PASSWORD_HASH_QUEUE`` more may wait for a worker;
+beyond that hashing raises ``HashingOverloaded`` at once, and the views
+answer 429 instead of queueing for CPU. Only the derivation moves to the
+pool: user lookups and hash upgrades stay on the request's thread and
+database connection.
+
+``PASSWORD_HASH_ITERATIONS`` sets the PBKDF2 cost for new hashes. Django
+re-hashes a stored password at its next successful login whenever the
+count differs, so changing it migrates users gradually.
+"""
+import base64
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.hashers import PBKDF2PasswordHasher
+from django.utils.crypto import pbkdf2
+
+
+class HashingOverloaded(Exception):
+    """Every worker is busy and the queue is full"""
+
+
+class HashingPool:
+    def __init__(self, workers, max_queued):
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='password-hash')
+        self._slots = threading.BoundedSemaphore(workers + max_queued)
+
+    def run(self, fn, *args):
+        """fn(*args) on a worker thread; raises HashingOverloaded rather than queue past the limit"""
+        if not self._slots.acquire(blocking=False):
+            raise HashingOverloaded()
+        try:
+            return self._executor.submit(fn, *args).result()
+        finally:
+            self._slots.release()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def hashing_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                workers = getattr(settings, 'PASSWORD_HASH_WORKERS', None) or os.cpu_count() or 2
+                _pool = HashingPool(workers, getattr(settings, 'PASSWORD_HASH_QUEUE', 2 * workers))
+    return _pool
+
+
+class PooledPBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    iterations = getattr(settings, 'PASSWORD_HASH_ITERATIONS', None) or PBKDF2PasswordHasher.iterations
+
+    def encode(self, password, salt, iterations=None):
+        self._check_encode_args(password, salt)
+        iterations = iterations or self.iterations
+        hash = hashing_pool().run(pbkdf2, password, salt, iterations, None, self.digest)
+        hash = base64.b64encode(hash).decode("ascii").strip()
+        return "%s$%d$%s$%s" % (self.algorithm, iterations, salt, hash)
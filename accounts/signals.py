@@ -0,0 +1,12 @@
+from django.contrib.auth.models import User
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from ecommerce.authentication import revoke_user
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, **kwargs):
+    """Stateless tokens never re-read the user row: revoke a deactivated user's tokens instead"""
+    if not created and not instance.is_active:
+        revoke_user(instance.id)
@@ -0,0 +1,97 @@
+"""Token buckets in front of the password endpoints (login, register, JWT obtain).
+
+Every attempt takes a token from its client IP's bucket and, for logins,
+from the username's bucket; an empty bucket answers 429 with
+``Retry-After`` before any password is hashed::
+
+    from accounts.throttling import throttle_login
+
+    retry_after = throttle_login(request, username)  # 0, or seconds to wait
+
+Buckets live in the shared "throttle" cache region, so every process
+draws on the same ones. Each is one integer, its GCRA "theoretical
+arrival time" in milliseconds, moved with atomic ``incr``: the bucket is
+empty while that time is more than a full bucket ahead of now.
+``LOGIN_THROTTLE_RATES`` sets each scope's rate as "N/period": a burst of
+N attempts, refilled at N per period.
+"""
+import hashlib
+import math
+import time
+
+from django.conf import settings
+from rest_framework.throttling import BaseThrottle
+
+from ecommerce.cache import region
+
+DEFAULT_RATES = {
+    'login_ip': '20/min',
+    'login_username': '5/min',
+    'register_ip': '10/hour',
+}
+PERIODS = {'s': 1, 'm': 60, 'h': 60 * 60, 'd': 24 * 60 * 60}
+
+
+def parse_rate(rate):
+    """'5/min' -> (5, 60)"""
+    count, _, period = rate.partition('/')
+    return int(count), PERIODS[period.strip()[0]]
+
+
+class TokenBucket:
+    def __init__(self, scope, rate):
+        self.scope = scope
+        self.capacity, period = parse_rate(rate)
+        self.interval = period * 1000 // self.capacity  # Milliseconds to earn one token back
+
+    def take(self, ident, now=None):
+        """Spend one of `ident`'s tokens: 0 if there was one, else seconds until there is"""
+        now = int((now if now is not None else time.time()) * 1000)
+        cache, key = region('throttle'), f"{self.scope}:{ident}"
+        try:
+            arrival = cache.incr(key, self.interval)
+        except ValueError:
+            if cache.add(key, now + self.interval):
+                return 0
+            arrival = cache.incr(key, self.interval)  # Another process created it first
+        if arrival - self.interval < now:
+            # Idle long enough to refill: restart from a full bucket. Racing
+            # requests may each restart it, which only ever lets one extra through.
+            arrival = now + self.interval
+            cache.set(key, arrival)
+        excess = arrival - now - self.capacity * self.interval
+        if excess > 0:
+            cache.incr(key, -self.interval)  # A refused attempt leaves the bucket as it was
+            return excess / 1000
+        return 0
+
+
+def bucket(scope):
+    rates = {**DEFAULT_RATES, **getattr(settings, 'LOGIN_THROTTLE_RATES', {})}
+    return TokenBucket(scope, rates[scope])
+
+
+def client_ip(request):
+    """REMOTE_ADDR, or X-Forwarded-For as DRF's NUM_PROXIES setting allows"""
+    return BaseThrottle().get_ident(request)
+
+
+def _username_key(username):
+    # Hashed: keeps keys short and valid for any input
+    return hashlib.sha1(str(username).strip().lower().encode()).hexdigest()
+
+
+def throttle_login(request, username):
+    """Take a login attempt from the IP's and the username's buckets; returns seconds to wait"""
+    retry_after = bucket('login_ip').take(client_ip(request))
+    if not retry_after and username:
+        retry_after = bucket('login_username').take(_username_key(username))
+    return retry_after
+
+
+def throttle_register(request):
+    return bucket('register_ip').take(client_ip(request))
+
+
+def retry_after_header(retry_after):
+    return str(max(1, math.ceil(retry_after)))
@@ -1,12 +1,30 @@
-from django.contrib.auth import authenticate, login
+from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.models import User
 from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_POST
 from cart.models import Cart  # Import your Cart model
+from cart.session import merge_session_cart
+from rest_framework import status
 from rest_framework.authtoken.models import Token
+from rest_framework.response import Response
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+from rest_framework_simplejwt.views import TokenObtainPairView
+from ecommerce.authentication import revoke
+from .hashers import HashingOverloaded
+from .throttling import retry_after_header, throttle_login, throttle_register
 import json
 
+
+def too_many_requests(message, retry_after):
+    response = JsonResponse({"message": message}, status=429)
+    response["Retry-After"] = retry_after_header(retry_after)
+    return response
+
+
+BUSY_MESSAGE = "Too many sign-ins right now, please try again in a moment"
+
 @csrf_exempt
 @require_POST
 def register_view(request):
@@ -18,6 +36,10 @@ def register_view(request):
         if not username or not password:
             return JsonResponse({"message": "Username and password are required"}, status=400)
 
+        retry_after = throttle_register(request)
+        if retry_after:
+            return too_many_requests("Too many sign-ups from this address, please try again later", retry_after)
+
         if User.objects.filter(username=username).exists():
             return JsonResponse({"message": "Username already taken"}, status=400)
 
@@ -36,6 +58,8 @@ def register_view(request):
 
     except json.JSONDecodeError:
         return JsonResponse({"message": "Invalid JSON format"}, status=400)
+    except HashingOverloaded:
+        return too_many_requests(BUSY_MESSAGE, 1)
     except Exception as e:
         return JsonResponse({"message": f"Error: {str(e)}"}, status=500)
 
@@ -47,10 +71,16 @@ def login_view(request):
         username = data.get("username")
         password = data.get("password")
 
+        # ✅ Refuse early: a throttled attempt never reaches the password hasher
+        retry_after = throttle_login(request, username)
+        if retry_after:
+            return too_many_requests("Too many login attempts, please try again later", retry_after)
+
         user = authenticate(username=username, password=password)
 
         if user is not None:
             token, created = Token.objects.get_or_create(user=user)  # ✅ Generate token
+            merge_session_cart(request.session, user)  # ✅ Keep what was added as a guest
             
             return JsonResponse({
                 "message": "Login successful!",
@@ -60,9 +90,18 @@ def login_view(request):
 
         return JsonResponse({"message": "Invalid credentials"}, status=400)
 
+    except HashingOverloaded:
+        return too_many_requests(BUSY_MESSAGE, 1)
     except Exception as e:
         return JsonResponse({"message": f"Error: {str(e)}"}, status=500)
 
+def revoke_quietly(token_class, raw):
+    """Revoke a JWT; one that is already invalid or expired needs nothing"""
+    try:
+        revoke(token_class(raw))
+    except TokenError:
+        pass
+
 @csrf_exempt
 @require_POST
 def logout_view(request):
@@ -71,8 +110,34 @@ def logout_view(request):
         if auth_header and auth_header.startswith("Token "):
             token_key = auth_header.split(" ")[1]
             Token.objects.filter(key=token_key).delete()  # ✅ Delete token on logout
+        elif auth_header and auth_header.startswith("Bearer "):
+            revoke_quietly(AccessToken, auth_header.split(" ")[1])  # ✅ JWTs can't be deleted: revoke them
+        if request.body:
+            refresh = json.loads(request.body).get("refresh")
+            if refresh:
+                revoke_quietly(RefreshToken, refresh)
 
         logout(request)
         return JsonResponse({"message": "Logged out successfully"}, status=200)
     except:
-        return JsonResponse({"message": "Something went wrong"}, status=400)
\ No newline at end of file
+        return JsonResponse({"message": "Something went wrong"}, status=400)
+
+
+class CartMergingTokenObtainPairView(TokenObtainPairView):
+    """JWT login that also folds the caller's guest (session) cart into their account"""
+
+    def post(self, request, *args, **kwargs):
+        retry_after = throttle_login(request, request.data.get("username"))
+        if retry_after:
+            return too_many_requests("Too many login attempts, please try again later", retry_after)
+
+        serializer = self.get_serializer(data=request.data)
+        try:
+            serializer.is_valid(raise_exception=True)
+        except TokenError as e:
+            raise InvalidToken(e.args[0])
+        except HashingOverloaded:
+            return too_many_requests(BUSY_MESSAGE, 1)
+
+        merge_session_cart(request.session, serializer.user)
+        return Response(serializer.validated_data, status=status.HTTP_200_OK)
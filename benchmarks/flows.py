@@ -0,0 +1,170 @@
+"""Shopper flows for ``bench_api``: browse -> add to cart -> checkout -> track.
+
+Each virtual user is a thread with one keep-alive connection and its own
+seeded RNG, repeating the flow until the deadline::
+
+    result = run_flows(base_url, users, duration=20, warmup=2, seed=42)
+    result.steps["checkout"].latencies
+
+``users`` is a list of (user_id, access token). Every request is recorded
+under its step name with its latency, status and, when the server sends
+``X-DB-Queries`` (``METRICS_QUERY_HEADER``), its query count.
+"""
+import http.client
+import json
+import random
+import threading
+import time
+from collections import Counter
+from urllib.parse import urlsplit
+
+CUSTOMER = {
+    "mpesa_code": "BENCH12345", "first_name": "Bench", "last_name": "User", "age": 30,
+    "phone_number": "0700000000", "email": "bench@example.com", "gender": "Other", "location": "Nairobi",
+}
+
+# Step name -> what it requests, in flow order (also the report's row order)
+STEPS = {
+    "browse": "GET /api/products/?page=N",
+    "product": "GET /api/products/<id>/",
+    "add_to_cart": "POST /api/cart/",
+    "cart": "GET /api/cart/",
+    "reserve": "POST /cart/api/reservations/",
+    "checkout": "POST /cart/cart/orders/",
+    "orders": "GET /api/order/",
+    "track": "GET /api/order/<id>/track/",
+}
+
+
+class StepResult:
+    def __init__(self):
+        self.latencies = []
+        self.queries = []
+        self.statuses = Counter()
+        self.errors = Counter()
+
+    @property
+    def requests(self):
+        return len(self.latencies)
+
+    @property
+    def failures(self):
+        return sum(n for status, n in self.statuses.items() if status >= 400) + sum(self.errors.values())
+
+
+class FlowResult:
+    def __init__(self):
+        self.steps = {name: StepResult() for name in STEPS}
+        self.flows = 0
+        self.elapsed = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, step, latency, status, queries):
+        with self._lock:
+            result = self.steps[step]
+            result.latencies.append(latency)
+            result.statuses[status] += 1
+            if queries is not None:
+                result.queries.append(queries)
+
+    def record_error(self, step, exc):
+        with self._lock:
+            self.steps[step].errors[type(exc).__name__] += 1
+
+
+class Shopper:
+    """One virtual user: a connection, a token and a random but repeatable shopping pattern"""
+
+    def __init__(self, base_url, token, rng, product_ids, pages, result, record):
+        parts = urlsplit(base_url)
+        self.host, self.port = parts.hostname, parts.port or 80
+        self.headers = {"Authorization": f"Bearer {token}", "Accept": "application/json"}
+        self.rng = rng
+        self.product_ids = product_ids
+        self.pages = pages
+        self.result = result
+        self.record = record
+        self.connection = None
+
+    def request(self, step, method, path, body=None):
+        """(status, decoded JSON or None); connection errors are recorded and return (None, None)"""
+        headers = dict(self.headers)
+        if body is not None:
+            body = json.dumps(body)
+            headers["Content-Type"] = "application/json"
+        try:
+            if self.connection is None:
+                self.connection = http.client.HTTPConnection(self.host, self.port, timeout=30)
+            start = time.perf_counter()
+            self.connection.request(method, path, body=body, headers=headers)
+            response = self.connection.getresponse()
+            data = response.read()
+            latency = time.perf_counter() - start
+        except (OSError, http.client.HTTPException) as exc:
+            if self.record():
+                self.result.record_error(step, exc)
+            self.close()
+            return None, None
+
+        if response.getheader("Connection", "").lower() == "close":
+            self.close()
+        queries = response.getheader("X-DB-Queries")
+        if self.record():
+            self.result.record(step, latency, response.status, int(queries) if queries is not None else None)
+        try:
+            return response.status, json.loads(data) if data else None
+        except ValueError:
+            return response.status, None
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+    def flow(self):
+        rng = self.rng
+        self.request("browse", "GET", f"/api/products/?page={rng.choice(self.pages)}")
+        viewed = rng.sample(self.product_ids, min(3, len(self.product_ids)))
+        for product_id in viewed:
+            self.request("product", "GET", f"/api/products/{product_id}/")
+        for product_id in viewed[:rng.randint(1, len(viewed))]:
+            self.request("add_to_cart", "POST", "/api/cart/", {"product_id": product_id, "quantity": rng.randint(1, 2)})
+        self.request("cart", "GET", "/api/cart/")
+        self.request("reserve", "POST", "/cart/api/reservations/", {})
+        self.request("checkout", "POST", "/cart/cart/orders/", CUSTOMER)
+        status, orders = self.request("orders", "GET", "/api/order/")
+        if status == 200 and orders:
+            self.request("track", "GET", f"/api/order/{orders[0]['id']}/track/")
+
+    def run(self, deadline):
+        try:
+            while time.perf_counter() < deadline:
+                self.flow()
+                if self.record():
+                    with self.result._lock:
+                        self.result.flows += 1
+        finally:
+            self.close()
+
+
+def run_flows(base_url, users, product_ids, duration, warmup=0.0, seed=42, pages=(1, 2, 3)):
+    """Run one Shopper per (user_id, token) in `users` for `duration` seconds after `warmup`"""
+    result = FlowResult()
+    begin = time.perf_counter()
+    measure_from = begin + warmup
+    deadline = measure_from + duration
+
+    def record():
+        return time.perf_counter() >= measure_from
+
+    shoppers = [
+        Shopper(base_url, token, random.Random(seed + user_id), product_ids, list(pages), result, record)
+        for user_id, token in users
+    ]
+    threads = [threading.Thread(target=shopper.run, args=(deadline,), daemon=True) for shopper in shoppers]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    result.elapsed = time.perf_counter() - measure_from
+    return result
@@ -0,0 +1,111 @@
+"""A small asyncio HTTP/1.1 load generator (keep-alive, many concurrent connections, no dependencies)"""
+import asyncio
+import time
+from collections import Counter
+from urllib.parse import urlsplit
+
+
+class LoadResult:
+    def __init__(self):
+        self.latencies = []
+        self.statuses = Counter()
+        self.errors = Counter()
+        self.elapsed = 0.0
+
+    @property
+    def requests(self):
+        return len(self.latencies)
+
+    @property
+    def throughput(self):
+        return self.requests / self.elapsed if self.elapsed else 0.0
+
+
+async def _read_response(reader):
+    """Read one response; returns (status, keep_alive)"""
+    head = await reader.readuntil(b"\r\n\r\n")
+    lines = head.decode("latin-1").split("\r\n")
+    version, status = lines[0].split(" ", 2)[:2]
+    headers = {}
+    for line in lines[1:]:
+        if ":" in line:
+            name, value = line.split(":", 1)
+            headers[name.strip().lower()] = value.strip()
+
+    if headers.get("transfer-encoding", "").lower() == "chunked":
+        while True:
+            size = int((await reader.readuntil(b"\r\n")).split(b";")[0], 16)
+            await reader.readexactly(size + 2)
+            if size == 0:
+                break
+    elif "content-length" in headers:
+        await reader.readexactly(int(headers["content-length"]))
+    else:
+        await reader.read()  # Body runs to EOF
+        return int(status), False
+
+    keep_alive = headers.get("connection", "").lower() != "close" and version != "HTTP/1.0"
+    return int(status), keep_alive
+
+
+async def _client(host, port, requests, deadline, record, result):
+    reader = writer = None
+    i = 0
+    while time.perf_counter() < deadline:
+        try:
+            if writer is None:
+                reader, writer = await asyncio.open_connection(host, port)
+            payload = requests[i % len(requests)]
+            i += 1
+            start = time.perf_counter()
+            writer.write(payload)
+            await writer.drain()
+            status, keep_alive = await _read_response(reader)
+            if record():
+                result.latencies.append(time.perf_counter() - start)
+                result.statuses[status] += 1
+            if not keep_alive:
+                writer.close()
+                writer = None
+        except (OSError, asyncio.IncompleteReadError, asyncio.LimitOverrunError, ValueError) as exc:
+            if record():
+                result.errors[type(exc).__name__] += 1
+            if writer is not None:
+                writer.close()
+                writer = None
+            await asyncio.sleep(0.05)
+    if writer is not None:
+        writer.close()
+
+
+def build_request(url, headers=None):
+    parts = urlsplit(url)
+    target = parts.path + (f"?{parts.query}" if parts.query else "")
+    lines = [f"GET {target} HTTP/1.1", f"Host: {parts.netloc}", "Accept: application/json"]
+    lines += [f"{name}: {value}" for name, value in (headers or {}).items()]
+    return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+
+
+def run_load(urls, connections, duration, warmup=0.0, headers=None):
+    """Drive `connections` keep-alive clients over `urls` for `duration` seconds after `warmup`"""
+    parts = urlsplit(urls[0])
+    host, port = parts.hostname, parts.port or 80
+    requests = [build_request(url, headers) for url in urls]
+
+    async def main():
+        result = LoadResult()
+        begin = time.perf_counter()
+        measure_from = begin + warmup
+        deadline = measure_from + duration
+
+        def record():
+            return time.perf_counter() >= measure_from
+
+        await asyncio.gather(*[
+            _client(host, port, requests[n % len(requests):] + requests[:n % len(requests)], deadline, record, result)
+            for n in range(connections)
+        ])
+        result.elapsed = time.perf_counter() - measure_from
+        return result
+
+    return asyncio.run(main())
@@ -0,0 +1,202 @@
+import json
+import os
+import random
+import tempfile
+import threading
+
+from django.contrib.auth.models import User
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand, CommandError
+from django.core.servers.basehttp import ThreadedWSGIServer, WSGIRequestHandler
+from django.db import connection
+from django.test import override_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+from benchmarks.flows import STEPS, run_flows
+from benchmarks.seed import seed_order_items, seed_orders, seed_products, seed_users
+from benchmarks.utils import format_table, median_ms, percentile, scratch_database
+from order.models import Order
+from products.models import Product
+
+USER_PREFIX = "loadtest"
+BENCH_STOCK = 10 ** 9  # Never the bottleneck: checkouts should not fail for lack of stock
+QUERY_SLACK = 0.5  # Average queries/request can wobble with cache hits; more than this is a regression
+ERROR_RATE_SLACK = 0.01
+
+
+class Command(BaseCommand):
+    help = (
+        "Load-test the shopper flow (browse -> add to cart -> checkout -> track) and report throughput, "
+        "p50/p95/p99 latency and queries per request for each step. By default seeds a scratch database "
+        "and serves it in-process; --url targets a running server instead (seed its database with "
+        "--seed-data first, and set METRICS_QUERY_HEADER=1 there to get query counts). "
+        "--save-baseline stores the results as JSON and --baseline compares a run against them."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', help="A running server, e.g. http://127.0.0.1:8000")
+        parser.add_argument('--seed-data', action='store_true',
+                            help="With --url: seed the configured database, then exit")
+        parser.add_argument('--concurrency', type=int, default=8, help="Virtual users, one connection each")
+        parser.add_argument('--duration', type=float, default=20.0, help="Measured seconds")
+        parser.add_argument('--warmup', type=float, default=2.0)
+        parser.add_argument('--products', type=int, default=2000)
+        parser.add_argument('--users', type=int, default=200, help="Seeded users (virtual users pick from them)")
+        parser.add_argument('--orders', type=int, default=5000, help="Seeded order history")
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--baseline', help="Compare against results saved with --save-baseline")
+        parser.add_argument('--save-baseline', help="Write this run's results to a JSON file")
+        parser.add_argument('--tolerance', type=float, default=0.25,
+                            help="Relative p95 growth counted as a regression (default 0.25 = 25%%)")
+        parser.add_argument('--fail-on-regression', action='store_true',
+                            help="Exit with an error if --baseline finds a regression")
+
+    def handle(self, *args, **options):
+        if options['concurrency'] > options['users']:
+            raise CommandError("--concurrency can't exceed --users: virtual users need their own accounts")
+        baseline = self.load_baseline(options['baseline'])
+
+        if options['url']:
+            if options['seed_data']:
+                self.seed(options)
+                return
+            results = self.run(options['url'].rstrip('/'), options)
+        else:
+            # DEBUG off as in production: no per-query logging, no debug error pages
+            bench_settings = override_settings(DEBUG=False, ALLOWED_HOSTS=['127.0.0.1'], METRICS_QUERY_HEADER=True)
+            with self.scratch(), bench_settings:
+                self.seed(options)
+                with self.server() as base_url:
+                    results = self.run(base_url, options)
+
+        self.report(results, baseline, options)
+
+    def scratch(self):
+        # A file, not SQLite's default in-memory test database, so the server's threads share it
+        if connection.vendor == 'sqlite' and not connection.settings_dict['TEST'].get('NAME'):
+            path = os.path.join(tempfile.gettempdir(), f"bench_api_{os.getpid()}.sqlite3")
+            connection.settings_dict['TEST']['NAME'] = path
+        return scratch_database()
+
+    def seed(self, options):
+        if User.objects.filter(username__startswith=USER_PREFIX).exists():
+            raise CommandError(f"{USER_PREFIX}* users already exist in this database; it is seeded")
+        self.stdout.write("Seeding...")
+        rng = random.Random(options['seed'])
+        product_ids = seed_products(options['products'], rng)
+        Product.objects.update(stock=BENCH_STOCK)
+        user_ids = seed_users(options['users'], prefix=USER_PREFIX)
+        seed_orders(user_ids, options['orders'], rng)
+        seed_order_items(list(Order.objects.values_list('id', flat=True)), product_ids, 3, rng)
+
+    def server(self):
+        return _InProcessServer()
+
+    def run(self, base_url, options):
+        users = list(User.objects.filter(username__startswith=USER_PREFIX).order_by('id')[:options['concurrency']])
+        if len(users) < options['concurrency']:
+            raise CommandError(f"Need {options['concurrency']} {USER_PREFIX}* users; seed with --seed-data")
+        product_ids = list(Product.objects.filter(stock__gt=0).values_list('id', flat=True))
+        tokens = [(user.id, str(AccessToken.for_user(user))) for user in users]
+
+        self.stdout.write(
+            f"{options['concurrency']} shoppers against {base_url} for {options['duration']}s "
+            f"(+{options['warmup']}s warmup)..."
+        )
+        result = run_flows(base_url, tokens, product_ids, options['duration'], options['warmup'], options['seed'])
+
+        steps = {}
+        for name, step in result.steps.items():
+            steps[name] = {
+                'requests': step.requests,
+                'throughput': round(step.requests / result.elapsed, 1) if result.elapsed else 0.0,
+                'p50_ms': round(median_ms(step.latencies), 2),
+                'p95_ms': round(percentile(step.latencies, 95) * 1000, 2),
+                'p99_ms': round(percentile(step.latencies, 99) * 1000, 2),
+                'queries': round(sum(step.queries) / len(step.queries), 2) if step.queries else None,
+                'errors': step.failures,
+            }
+        return {
+            'config': {key: options[key] for key in ('concurrency', 'duration', 'products', 'users', 'orders', 'seed')},
+            'flows_per_second': round(result.flows / result.elapsed, 2) if result.elapsed else 0.0,
+            'steps': steps,
+        }
+
+    def report(self, results, baseline, options):
+        rows = []
+        for name, step in results['steps'].items():
+            rows.append([
+                name, STEPS[name], step['requests'], f"{step['throughput']:.1f}",
+                f"{step['p50_ms']:.1f}", f"{step['p95_ms']:.1f}", f"{step['p99_ms']:.1f}",
+                "-" if step['queries'] is None else f"{step['queries']:.1f}", step['errors'],
+            ])
+        self.stdout.write(format_table(
+            ["step", "request", "requests", "req/s", "p50 ms", "p95 ms", "p99 ms", "queries/req", "errors"], rows,
+        ))
+        self.stdout.write(f"Completed flows: {results['flows_per_second']:.2f}/s")
+
+        if options['save_baseline']:
+            with open(options['save_baseline'], 'w') as f:
+                json.dump(results, f, indent=2, sort_keys=True)
+            self.stdout.write(f"Baseline written to {options['save_baseline']}")
+
+        if baseline is not None:
+            regressions = self.compare(results, baseline, options['tolerance'])
+            if regressions and options['fail_on_regression']:
+                raise CommandError(f"Regressed against the baseline: {', '.join(regressions)}")
+
+    def load_baseline(self, path):
+        if not path:
+            return None
+        try:
+            with open(path) as f:
+                return json.load(f)
+        except (OSError, ValueError) as exc:
+            raise CommandError(f"Can't read baseline {path}: {exc}")
+
+    def compare(self, results, baseline, tolerance):
+        """Print the p95 and query changes per step; returns the steps that regressed"""
+        if baseline.get('config') != results['config']:
+            self.stderr.write(f"Baseline was recorded with different settings: {baseline.get('config')}")
+        rows, regressions = [], []
+        for name, step in results['steps'].items():
+            before = baseline.get('steps', {}).get(name)
+            if not before or not before['requests'] or not step['requests']:
+                continue
+            change = (step['p95_ms'] - before['p95_ms']) / before['p95_ms'] if before['p95_ms'] else 0.0
+            more_queries = None not in (step['queries'], before['queries']) and (
+                step['queries'] > before['queries'] + QUERY_SLACK
+            )
+            error_rate, before_rate = step['errors'] / step['requests'], before['errors'] / before['requests']
+            regressed = change > tolerance or more_queries or error_rate > before_rate + ERROR_RATE_SLACK
+            if regressed:
+                regressions.append(name)
+            rows.append([
+                name, f"{before['p95_ms']:.1f}", f"{step['p95_ms']:.1f}", f"{change:+.0%}",
+                before['queries'], step['queries'], f"{before_rate:.1%}", f"{error_rate:.1%}",
+                "REGRESSION" if regressed else "ok",
+            ])
+        self.stdout.write(format_table(
+            ["step", "base p95", "p95", "change", "base queries", "queries", "base error %", "error %", ""], rows,
+        ))
+        return regressions
+
+
+class _QuietHandler(WSGIRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+class _InProcessServer:
+    """Django's threaded development server on a free port, in a background thread"""
+
+    def __enter__(self):
+        self.httpd = ThreadedWSGIServer(('127.0.0.1', 0), _QuietHandler, allow_reuse_address=False)
+        self.httpd.set_app(WSGIHandler())
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return f"http://127.0.0.1:{self.httpd.server_address[1]}"
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
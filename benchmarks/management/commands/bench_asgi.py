@@ -0,0 +1,159 @@
+import resource
+import shlex
+import socket
+import subprocess
+import sys
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework_simplejwt.tokens import AccessToken
+
+from benchmarks.loadgen import run_load
+from benchmarks.utils import format_table, median_ms, percentile
+from order.models import Order
+from products.models import Product
+
+WSGI_CMD = "gunicorn ecommerce.wsgi:application --workers {workers} --threads {threads} --bind 127.0.0.1:{port}"
+ASGI_CMD = "uvicorn ecommerce.asgi:application --workers {workers} --host 127.0.0.1 --port {port} --log-level warning"
+
+# Sync (DRF) path and its async counterpart for each scenario
+SCENARIOS = {
+    'catalog': ("/api/products/?page={page}", "/api/async/products/?page={page}"),
+    'detail': ("/api/products/{product}/", "/api/async/products/{product}/"),
+    'track': ("/api/order/{order}/track/", "/api/async/order/{order}/track/"),
+    'summary': ("/api/cart/summary/", "/api/async/cart/summary/"),
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Load-test the sync endpoints under a WSGI server against the async ones under an ASGI server. "
+        "Starts both servers on the configured database (gunicorn and uvicorn by default, which must be "
+        "installed), or targets running ones with --wsgi-url/--asgi-url."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scenarios', default='catalog,track', help=f"Comma-separated: {', '.join(SCENARIOS)}")
+        parser.add_argument('--connections', type=int, default=1000)
+        parser.add_argument('--duration', type=float, default=20.0, help="Measured seconds per run")
+        parser.add_argument('--warmup', type=float, default=3.0)
+        parser.add_argument('--workers', type=int, default=4, help="Server processes")
+        parser.add_argument('--threads', type=int, default=8, help="Threads per WSGI worker")
+        parser.add_argument('--wsgi-cmd', default=WSGI_CMD)
+        parser.add_argument('--asgi-cmd', default=ASGI_CMD)
+        parser.add_argument('--wsgi-url', help="Use a running WSGI server, e.g. http://127.0.0.1:8000")
+        parser.add_argument('--asgi-url', help="Use a running ASGI server")
+        parser.add_argument('--username', help="User whose token/order the track and summary scenarios use")
+
+    def handle(self, *args, **options):
+        scenarios = [name.strip() for name in options['scenarios'].split(',') if name.strip()]
+        unknown = set(scenarios) - set(SCENARIOS)
+        if unknown:
+            raise CommandError(f"Unknown scenarios: {', '.join(sorted(unknown))}")
+        self.raise_fd_limit(options['connections'])
+        context, headers = self.context(scenarios, options['username'])
+
+        rows = []
+        for kind, index, url_option, cmd_option in (('wsgi', 0, 'wsgi_url', 'wsgi_cmd'), ('asgi', 1, 'asgi_url', 'asgi_cmd')):
+            with self.server(options[url_option], options[cmd_option], options) as base_url:
+                for name in scenarios:
+                    urls = [base_url + path for path in self.paths(SCENARIOS[name][index], context)]
+                    self.stdout.write(f"{kind} {name}: {options['connections']} connections for {options['duration']}s...")
+                    result = run_load(urls, options['connections'], options['duration'], options['warmup'], headers)
+                    ok = sum(n for status, n in result.statuses.items() if status < 400)
+                    rows.append([
+                        kind, name, result.requests, f"{result.throughput:.0f}",
+                        f"{median_ms(result.latencies):.1f}",
+                        f"{percentile(result.latencies, 95) * 1000:.1f}",
+                        f"{percentile(result.latencies, 99) * 1000:.1f}",
+                        result.requests - ok + sum(result.errors.values()),
+                    ])
+
+        self.stdout.write(format_table(["server", "scenario", "requests", "req/s", "p50 ms", "p95 ms", "p99 ms", "errors"], rows))
+
+    def context(self, scenarios, username):
+        context = {'products': list(Product.objects.values_list('id', flat=True)[:50]) or [1], 'pages': [1, 2, 3]}
+        headers = {}
+        if {'track', 'summary'} & set(scenarios):
+            if not username:
+                raise CommandError("The track and summary scenarios need --username")
+            user = User.objects.filter(username=username).first()
+            if user is None:
+                raise CommandError(f"No user {username!r}")
+            headers['Authorization'] = f"Bearer {AccessToken.for_user(user)}"
+            context['orders'] = list(Order.objects.filter(user=user).values_list('id', flat=True)[:50])
+            if 'track' in scenarios and not context['orders']:
+                raise CommandError(f"{username!r} has no orders to track")
+        return context, headers
+
+    def paths(self, template, context):
+        if '{product}' in template:
+            return [template.format(product=pk) for pk in context['products']]
+        if '{order}' in template:
+            return [template.format(order=pk) for pk in context['orders']]
+        if '{page}' in template:
+            return [template.format(page=page) for page in context['pages']]
+        return [template]
+
+    def raise_fd_limit(self, connections):
+        # Each connection costs a descriptor here and another in the server
+        soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+        wanted = min(hard, max(soft, connections * 2 + 256))
+        if wanted > soft:
+            resource.setrlimit(resource.RLIMIT_NOFILE, (wanted, hard))
+        if wanted < connections + 64:
+            self.stderr.write(f"Open-file limit {wanted} is low for {connections} connections; expect errors")
+
+    def server(self, url, command, options):
+        return _Server(url, command, options)
+
+
+class _Server:
+    """Context manager yielding a base URL, starting (and stopping) the server process if needed"""
+
+    def __init__(self, url, command, options):
+        self.url = url
+        self.command = command
+        self.options = options
+        self.process = None
+
+    def __enter__(self):
+        if self.url:
+            return self.url.rstrip('/')
+        port = _free_port()
+        argv = shlex.split(self.command.format(port=port, workers=self.options['workers'], threads=self.options['threads']))
+        try:
+            self.process = subprocess.Popen(argv, stdout=subprocess.DEVNULL, stderr=sys.stderr)
+        except FileNotFoundError:
+            raise CommandError(f"{argv[0]} is not installed; install it or pass an existing server's URL")
+        _wait_for_port(port, self.process)
+        return f"http://127.0.0.1:{port}"
+
+    def __exit__(self, *exc):
+        if self.process is not None:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def _wait_for_port(port, process, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise CommandError(f"Server exited with status {process.returncode}")
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=0.5):
+                return
+        except OSError:
+            time.sleep(0.2)
+    process.terminate()
+    raise CommandError(f"Server did not start listening on port {port}")
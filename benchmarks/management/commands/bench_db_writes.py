@@ -0,0 +1,141 @@
+import itertools
+import os
+import random
+import tempfile
+import threading
+import time
+from contextlib import ExitStack
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, OperationalError, connections, transaction
+from django.db.models import F
+
+from benchmarks.utils import format_table, median_ms, percentile, scratch_database
+from ecommerce.database import database_config, sqlite_config
+from order.models import Order, OrderItem
+from products.models import Product
+
+CUSTOMER = {
+    'mpesa_code': "BENCH", 'first_name': "Bench", 'last_name': "User", 'age': 30,
+    'phone_number': "0700000000", 'email': "bench@example.com", 'gender': "Other", 'location': "Nairobi",
+}
+PROFILES = ('sqlite', 'sqlite-wal', 'postgres')
+
+
+class Command(BaseCommand):
+    help = (
+        "Concurrent checkout-shaped write transactions (read a price, decrement stock, insert an order "
+        "and its item) against each database profile: stock SQLite, the tuned WAL profile, and "
+        "PostgreSQL when --postgres-url (or a postgres DATABASE_URL) is given. Each profile runs on a "
+        "scratch database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--profiles', default=",".join(PROFILES), help=f"Comma-separated: {', '.join(PROFILES)}")
+        parser.add_argument('--threads', default="1,4,16", help="Comma-separated writer counts")
+        parser.add_argument('--duration', type=float, default=5.0, help="Seconds per profile and writer count")
+        parser.add_argument('--products', type=int, default=100, help="Fewer products, hotter rows")
+        parser.add_argument('--postgres-url', default=os.environ.get("DATABASE_URL", ""))
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        profiles = [name.strip() for name in options['profiles'].split(",") if name.strip()]
+        unknown = set(profiles) - set(PROFILES)
+        if unknown:
+            raise CommandError(f"Unknown profiles: {', '.join(sorted(unknown))}")
+        thread_counts = [int(n) for n in options['threads'].split(",")]
+        self.codes = itertools.count()  # Order codes stay unique across runs on the same database
+        self.codes_lock = threading.Lock()
+
+        rows = []
+        with tempfile.TemporaryDirectory() as directory:
+            for profile in profiles:
+                config = self.profile_config(profile, directory, options['postgres_url'])
+                if config is None:
+                    self.stderr.write("Skipping postgres: pass --postgres-url=postgres://... (needs CREATEDB)")
+                    continue
+                alias = f"bench_{profile.replace('-', '_')}"
+                self.add_alias(alias, config)
+                with ExitStack() as stack:
+                    stack.enter_context(scratch_database(alias))
+                    stack.callback(connections[alias].close)
+                    product_ids, user_ids = self.seed(alias, options['products'], max(thread_counts))
+                    for threads in thread_counts:
+                        self.stdout.write(f"{profile}: {threads} writers for {options['duration']}s...")
+                        samples, errors, elapsed = self.run(alias, threads, product_ids, user_ids, options)
+                        rows.append([
+                            profile, threads, len(samples), f"{len(samples) / elapsed:.0f}",
+                            f"{median_ms(samples):.2f}", f"{percentile(samples, 95) * 1000:.2f}",
+                            f"{percentile(samples, 99) * 1000:.2f}", errors,
+                        ])
+
+        self.stdout.write(format_table(
+            ["profile", "writers", "commits", "commits/s", "p50 ms", "p95 ms", "p99 ms", "errors"], rows,
+        ))
+
+    def profile_config(self, profile, directory, postgres_url):
+        if profile == 'postgres':
+            if not postgres_url.startswith(("postgres://", "postgresql://", "pgsql://")):
+                return None
+            return database_config(postgres_url, sqlite_path=None)
+        config = sqlite_config(os.path.join(directory, f"{profile}.sqlite3"), tuned=profile == 'sqlite-wal')
+        config['TEST'] = {'NAME': config['NAME']}  # A file: the writers' threads must share it
+        return config
+
+    def add_alias(self, alias, config):
+        connections.settings[alias] = connections.configure_settings({DEFAULT_DB_ALIAS: {}, alias: config})[alias]
+
+    def seed(self, alias, products, users):
+        Product.objects.using(alias).bulk_create([
+            Product(name=f"Product {i}", price=Decimal(1000), stock=10 ** 9, category="Entertainment")
+            for i in range(products)
+        ])
+        User.objects.db_manager(alias).bulk_create([User(username=f"writer{i}") for i in range(users)])
+        return (
+            list(Product.objects.using(alias).values_list('id', flat=True)),
+            list(User.objects.using(alias).values_list('id', flat=True)),
+        )
+
+    def run(self, alias, threads, product_ids, user_ids, options):
+        samples, errors = [], []
+        deadline = time.perf_counter() + options['duration']
+
+        def write(user_id, rng):
+            product_id = rng.choice(product_ids)
+            with self.codes_lock:
+                code = f"BW-{next(self.codes):010d}"
+            with transaction.atomic(using=alias):
+                # Read, then write: the shape that makes stock SQLite fail with "database is locked"
+                price = Product.objects.using(alias).filter(id=product_id).values_list('price', flat=True).get()
+                Product.objects.using(alias).filter(id=product_id, stock__gte=1).update(stock=F('stock') - 1)
+                [order] = Order.objects.using(alias).bulk_create([
+                    Order(user_id=user_id, order_code=code, total_amount=price, **CUSTOMER),
+                ])
+                OrderItem.objects.using(alias).bulk_create([OrderItem(order=order, product_id=product_id, quantity=1)])
+
+        def writer(n):
+            rng = random.Random(options['seed'] + n)
+            mine, failed = [], 0
+            try:
+                while time.perf_counter() < deadline:
+                    start = time.perf_counter()
+                    try:
+                        write(user_ids[n], rng)
+                    except OperationalError:
+                        failed += 1
+                        continue
+                    mine.append(time.perf_counter() - start)
+            finally:
+                connections[alias].close()
+            samples.extend(mine)
+            errors.append(failed)
+
+        begin = time.perf_counter()
+        workers = [threading.Thread(target=writer, args=(n,)) for n in range(threads)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        return samples, sum(errors), time.perf_counter() - begin
@@ -0,0 +1,93 @@
+import json
+import random
+import time
+
+from django.contrib.sessions.backends.db import SessionStore
+from django.core.cache import caches
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client, override_settings
+
+from benchmarks.seed import seed_products
+from benchmarks.utils import format_table, median_ms, percentile, scratch_database
+
+ENGINES = {
+    "db": "django.contrib.sessions.backends.db",
+    "cache": "django.contrib.sessions.backends.cache",
+    "write-through": "django.contrib.sessions.backends.cached_db",
+}
+WRITE_VERBS = ("INSERT", "UPDATE", "DELETE", "REPLACE")
+
+
+class QueryCounter:
+    """execute_wrapper that tallies statements, writes, and writes to django_session"""
+
+    def __init__(self):
+        self.total = self.writes = self.session_writes = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.total += 1
+        if sql.lstrip().upper().startswith(WRITE_VERBS):
+            self.writes += 1
+            if "django_session" in sql:
+                self.session_writes += 1
+        return execute(sql, params, many, context)
+
+
+class Command(BaseCommand):
+    help = "Simulate anonymous shoppers filling session carts and compare DB writes per session engine"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--guests', type=int, default=200)
+        parser.add_argument('--adds', type=int, default=8, help="Add-to-cart requests per guest")
+        parser.add_argument('--products', type=int, default=1000)
+        parser.add_argument('--engines', default=",".join(ENGINES), help="Comma-separated subset of: " + ", ".join(ENGINES))
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        engines = [name.strip() for name in options['engines'].split(",") if name.strip()]
+        rows = []
+        with scratch_database(), override_settings(ALLOWED_HOSTS=['testserver']):
+            product_ids = seed_products(options['products'], random.Random(options['seed']))
+            for name in engines:
+                with override_settings(SESSION_ENGINE=ENGINES[name], SESSION_CACHE_ALIAS='sessions'):
+                    caches['sessions'].clear()
+                    counter, samples = self.simulate(product_ids, options)
+                requests = options['guests'] * options['adds']
+                rows.append([
+                    name, requests, counter.total, counter.writes, counter.session_writes,
+                    f"{counter.writes / requests:.2f}",
+                    f"{median_ms(samples):.2f}", f"{percentile(samples, 95) * 1000:.2f}",
+                ])
+
+        self.stdout.write(format_table(
+            ["engine", "requests", "queries", "writes", "session writes", "writes/req", "p50 ms", "p95 ms"], rows,
+        ))
+        self.report_payload(options['adds'])
+
+    def simulate(self, product_ids, options):
+        # Same shopping sequence for every engine
+        rng = random.Random(options['seed'])
+        counter, samples = QueryCounter(), []
+        with connection.execute_wrapper(counter):
+            for _ in range(options['guests']):
+                client = Client()
+                for _ in range(options['adds']):
+                    body = json.dumps({"product_id": rng.choice(product_ids), "quantity": 1})
+                    start = time.perf_counter()
+                    response = client.post("/api/cart/", body, content_type="application/json")
+                    samples.append(time.perf_counter() - start)
+                    if response.status_code != 201:
+                        raise RuntimeError(f"Add to cart failed: {response.status_code} {response.content[:200]!r}")
+        return counter, samples
+
+    def report_payload(self, lines):
+        """Encoded session size for a full guest cart, old per-line dicts vs {product_id: quantity}"""
+        legacy = {str(pid): {"name": f"Product {pid}", "price": "1234.00", "quantity": 1} for pid in range(1, lines + 1)}
+        compact = {str(pid): 1 for pid in range(1, lines + 1)}
+        store = SessionStore()
+        legacy_size, compact_size = len(store.encode({"cart": legacy})), len(store.encode({"cart": compact}))
+        self.stdout.write(
+            f"\nEncoded session for a {lines}-line cart: "
+            f"{legacy_size} bytes before, {compact_size} bytes now ({compact_size / legacy_size:.0%})"
+        )
@@ -0,0 +1,132 @@
+import random
+
+from django.core.management.base import BaseCommand
+from django.db import connection, models
+from django.db.models import Q
+
+from benchmarks.seed import CATEGORIES, seed_carts, seed_orders, seed_products, seed_users
+from benchmarks.utils import format_table, measure, median_ms, percentile, scratch_database
+from cart.models import Cart
+from order.models import Order
+from products.models import Product
+
+
+class Command(BaseCommand):
+    help = "Seed a scratch database and time the hot lookups with and without the composite indexes"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=100_000)
+        parser.add_argument('--users', type=int, default=10_000)
+        parser.add_argument('--cart-per-user', type=int, default=100, help="Cart rows = users x this")
+        parser.add_argument('--orders', type=int, default=200_000)
+        parser.add_argument('--repeat', type=int, default=200, help="Timed runs per query")
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--explain', action='store_true', help="Print query plans before and after")
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        with scratch_database():
+            # Seed without the new indexes: that is the "before" schema, and inserts are faster
+            indexes = self.composite_indexes()
+            self.apply(indexes, add=False)
+
+            self.stdout.write("Seeding...")
+            product_ids = seed_products(options['products'], rng)
+            user_ids = seed_users(options['users'])
+            seed_carts(user_ids, product_ids, options['cart_per_user'], rng)
+            seed_orders(user_ids, options['orders'], rng)
+            self.analyze()
+
+            carts = list(Cart.objects.values_list('user_id', 'product_id'))
+            queries = self.queries(rng, user_ids, carts)
+
+            before = {name: measure(fn, options['repeat']) for name, fn in queries}
+            if options['explain']:
+                self.explain("before", queries)
+            self.apply(indexes, add=True)
+            self.analyze()
+            after = {name: measure(fn, options['repeat']) for name, fn in queries}
+            if options['explain']:
+                self.explain("after", queries)
+
+        rows = []
+        for name, _ in queries:
+            b, a = median_ms(before[name]), median_ms(after[name])
+            rows.append([
+                name, f"{b:.3f}", f"{a:.3f}",
+                f"{percentile(before[name], 95) * 1000:.3f}", f"{percentile(after[name], 95) * 1000:.3f}",
+                f"{b / a:.1f}x" if a else "-",
+            ])
+        self.stdout.write(format_table(
+            ["query", "before p50 ms", "after p50 ms", "before p95 ms", "after p95 ms", "speedup"], rows,
+        ))
+
+    def composite_indexes(self):
+        return [
+            (Cart, list(Cart._meta.constraints)),
+            (Order, list(Order._meta.indexes)),
+            (Product, list(Product._meta.indexes)),
+        ]
+
+    def apply(self, indexes, add):
+        with connection.schema_editor() as editor:
+            for model, items in indexes:
+                for item in items:
+                    if isinstance(item, models.Index):
+                        (editor.add_index if add else editor.remove_index)(model, item)
+                    elif add:
+                        editor.add_constraint(model, item)
+                    else:
+                        # SQLite drops constraints by rebuilding the table from model._meta,
+                        # so hide the constraint from the model while it is removed
+                        declared = model._meta.constraints
+                        model._meta.constraints = [c for c in declared if c is not item]
+                        try:
+                            editor.remove_constraint(model, item)
+                        finally:
+                            model._meta.constraints = declared
+
+    def analyze(self):
+        # Give the planner fresh statistics after bulk loads / index changes
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+
+    def explain(self, label, queries):
+        self.stdout.write(f"\n-- plans {label} --")
+        for name, fn in queries:
+            self.stdout.write(f"{name}: {fn(explain=True)}")
+
+    def queries(self, rng, user_ids, carts):
+        def run(queryset, explain):
+            return queryset.explain() if explain else list(queryset)
+
+        def cart_lookup(explain=False):
+            user_id, product_id = rng.choice(carts)
+            return run(Cart.objects.filter(user=user_id, product_id=product_id)[:1], explain)
+
+        def order_history(explain=False):
+            return run(Order.objects.filter(user=rng.choice(user_ids)).order_by('-created_at')[:20], explain)
+
+        def category_price_range(explain=False):
+            low = rng.randint(100, 150000)
+            return run(Product.objects.filter(
+                category=rng.choice(CATEGORIES), price__gte=low, price__lte=low + 5000,
+            ).order_by('price')[:50], explain)
+
+        def catalog_deep_page(explain=False):
+            price = rng.randint(100, 200000)
+            return run(Product.objects.filter(
+                Q(price__gt=price) | Q(price=price, id__gt=0),
+            ).order_by('price', 'id')[:10], explain)
+
+        def name_icontains(explain=False):
+            # Not helped by a B-tree index; shown for reference
+            return run(Product.objects.filter(name__icontains=f"{rng.randint(0, 99999)}")[:10], explain)
+
+        return [
+            ("cart (user, product)", cart_lookup),
+            ("orders by user, newest", order_history),
+            ("category + price range", category_price_range),
+            ("keyset page (price, id)", catalog_deep_page),
+            ("name icontains", name_icontains),
+        ]
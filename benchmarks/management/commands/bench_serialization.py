@@ -0,0 +1,88 @@
+import random
+
+from django.core.management.base import BaseCommand
+from django.test import RequestFactory, override_settings
+from rest_framework.renderers import JSONRenderer
+
+from benchmarks.seed import seed_order_items, seed_orders, seed_products, seed_users
+from benchmarks.utils import format_table, measure, median_ms, percentile, scratch_database
+from ecommerce.renderers import FastJSONRenderer
+from order.models import Order
+from order.serializers import OrderSerializer, order_rows
+from products.models import Product
+from products.serializers import ProductSerializer, product_rows
+
+
+class Command(BaseCommand):
+    help = "Time ModelSerializer vs .values() row serialization, and DRF vs orjson rendering, on large list payloads"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=10_000, help="Products, and orders, in each payload")
+        parser.add_argument('--items-per-order', type=int, default=3)
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        request = RequestFactory().get('/api/products/')
+        context = {'request': request}
+
+        with scratch_database(), override_settings(ALLOWED_HOSTS=['testserver']):
+            self.stdout.write("Seeding...")
+            product_ids = seed_products(options['rows'], rng)
+            [user_id] = seed_users(1)
+            seed_orders([user_id], options['rows'], rng)
+            order_ids = list(Order.objects.values_list('id', flat=True))
+            seed_order_items(order_ids, product_ids, options['items_per_order'], rng)
+            user = Order.objects.select_related('user').first().user
+
+            products = Product.objects.order_by('price', 'id')
+            orders = Order.objects.filter(user=user).order_by('-created_at')
+            payloads = {
+                'products': {
+                    'serializer': lambda: ProductSerializer(products, many=True, context=context).data,
+                    'rows': lambda: self.rows(product_rows(context), products),
+                },
+                'orders': {
+                    'serializer': lambda: OrderSerializer(
+                        orders.prefetch_related('items__product'), many=True, context=context,
+                    ).data,
+                    'rows': lambda: self.rows(order_rows(user, context), orders),
+                },
+            }
+
+            results = []
+            for payload, builders in payloads.items():
+                expected = JSONRenderer().render(builders['serializer']())
+                for builder in ('serializer', 'rows'):
+                    data = builders[builder]()
+                    for renderer in (JSONRenderer(), FastJSONRenderer()):
+                        if renderer.render(data) != expected:
+                            raise AssertionError(f"{payload}: {builder} + {type(renderer).__name__} changed the output")
+                        build = builders[builder]
+                        results.append((
+                            payload, builder, type(renderer).__name__,
+                            measure(build, options['repeat']),
+                            measure(lambda: renderer.render(data), options['repeat']),
+                            len(expected),
+                        ))
+
+        rows = []
+        for payload, builder, renderer, build, render, size in results:
+            total = median_ms(build) + median_ms(render)
+            baseline = next(
+                median_ms(b) + median_ms(r) for p, bl, rn, b, r, _ in results
+                if p == payload and bl == 'serializer' and rn == 'JSONRenderer'
+            )
+            rows.append([
+                payload, builder, renderer, f"{median_ms(build):.1f}", f"{median_ms(render):.1f}",
+                f"{percentile(build, 95) * 1000 + percentile(render, 95) * 1000:.1f}",
+                f"{total:.1f}", f"{baseline / total:.1f}x", f"{size / 1024:.0f}",
+            ])
+        self.stdout.write(format_table(
+            ["payload", "build", "renderer", "build p50 ms", "render p50 ms", "p95 ms", "total ms", "speedup", "KiB"], rows,
+        ))
+
+    @staticmethod
+    def rows(serializer, queryset):
+        return serializer.many(queryset.values(*serializer.columns))
@@ -0,0 +1,82 @@
+"""Synthetic data generators shared by the benchmark commands"""
+import random
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+
+from cart.models import Cart
+from order.models import Order, OrderItem
+from products.models import Product
+
+BATCH_SIZE = 5000
+CATEGORIES = [key for key, _ in Product.CATEGORY_CHOICES]
+
+
+def _bulk_insert(model, rows, batch_size=BATCH_SIZE):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            model.objects.bulk_create(batch, batch_size=batch_size)
+            batch = []
+    if batch:
+        model.objects.bulk_create(batch, batch_size=batch_size)
+
+
+def seed_products(count, rng=random):
+    _bulk_insert(Product, (
+        Product(
+            name=f"Product {i}",
+            description=f"Synthetic product number {i}",
+            price=Decimal(rng.randint(100, 200000)),
+            stock=rng.randint(0, 500),
+            category=rng.choice(CATEGORIES),
+        )
+        for i in range(count)
+    ))
+    return list(Product.objects.values_list('id', flat=True))
+
+
+def seed_users(count, prefix='bench'):
+    password = make_password(None)  # Unusable; hashing once keeps seeding fast
+    _bulk_insert(User, (User(username=f"{prefix}{i}", password=password) for i in range(count)))
+    return list(User.objects.filter(username__startswith=prefix).values_list('id', flat=True))
+
+
+def seed_carts(user_ids, product_ids, per_user, rng=random):
+    """per_user distinct products in every user's cart"""
+    _bulk_insert(Cart, (
+        Cart(user_id=user_id, product_id=product_id, quantity=rng.randint(1, 5))
+        for user_id in user_ids
+        for product_id in rng.sample(product_ids, per_user)
+    ))
+
+
+def seed_orders(user_ids, count, rng=random, codes=None):
+    """`codes` (one per order) defaults to BN-0000000, BN-0000001, ..."""
+    codes = iter(codes) if codes is not None else (f"BN-{i:07d}" for i in range(count))
+    _bulk_insert(Order, (
+        Order(
+            user_id=rng.choice(user_ids),
+            order_code=next(codes),
+            total_amount=Decimal(rng.randint(100, 500000)),
+            mpesa_code="BENCH",
+            first_name="Bench",
+            last_name="User",
+            age=30,
+            phone_number="0700000000",
+            email="bench@example.com",
+            gender="Other",
+            location="Nairobi",
+        )
+        for i in range(count)
+    ))
+
+
+def seed_order_items(order_ids, product_ids, per_order, rng=random):
+    _bulk_insert(OrderItem, (
+        OrderItem(order_id=order_id, product_id=product_id, quantity=rng.randint(1, 3))
+        for order_id in order_ids
+        for product_id in rng.sample(product_ids, per_order)
+    ))
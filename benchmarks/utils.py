@@ -0,0 +1,48 @@
+import statistics
+import time
+from contextlib import contextmanager
+
+from django.db import connections
+
+
+@contextmanager
+def scratch_database(alias='default', verbosity=0):
+    """Run a benchmark against a throwaway copy of the schema, never the real DB"""
+    connection = connections[alias]
+    old_name = connection.settings_dict['NAME']
+    connection.creation.create_test_db(verbosity=verbosity, autoclobber=True, serialize=False)
+    try:
+        yield connection
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=verbosity)
+
+
+def measure(fn, repeat):
+    """Call fn() `repeat` times and return the wall time of each call in seconds"""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def percentile(samples, pct):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def median_ms(samples):
+    return statistics.median(samples) * 1000 if samples else 0.0
+
+
+def format_table(headers, rows):
+    """Plain-text table for command output"""
+    cells = [list(map(str, headers))] + [[str(c) for c in row] for row in rows]
+    widths = [max(len(row[i]) for row in cells) for i in range(len(headers))]
+    lines = ['  '.join(c.ljust(w) for c, w in zip(row, widths)) for row in cells]
+    lines.insert(1, '  '.join('-' * w for w in widths))
+    return '\n'.join(lines)
@@ -0,0 +1,14 @@
+from django.views.decorators.http import require_GET
+
+from ecommerce.async_views import authenticate, render_json, unauthorized
+
+from .summary import aget_cart_summary
+
+
+@require_GET
+async def summary(request):
+    """GET /api/async/cart/summary/ — CartViewSet.summary on the event loop"""
+    user_id = await authenticate(request)
+    if user_id is None:
+        return unauthorized()
+    return render_json(await aget_cart_summary(user_id))
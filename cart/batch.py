@@ -0,0 +1,64 @@
+from django.db import transaction
+
+from products.models import Product
+
+from .models import Cart
+from .summary import forget_cart_summary
+
+
+class UnknownProducts(Exception):
+    def __init__(self, product_ids):
+        self.product_ids = sorted(product_ids)
+        super().__init__(f"Products not found: {', '.join(map(str, self.product_ids))}")
+
+
+def upsert_quantities(user_id, quantities):
+    """Write `quantities` ({product_id: qty}) into the user's cart in at most two queries.
+
+    Positive quantities are inserted or overwritten with one conflict-aware
+    bulk insert on (user, product); zero or negative ones delete the row.
+    """
+    keep = {product_id: qty for product_id, qty in quantities.items() if qty > 0}
+    drop = [product_id for product_id, qty in quantities.items() if qty <= 0]
+    if keep:
+        Cart.objects.bulk_create(
+            [Cart(user_id=user_id, product_id=product_id, quantity=qty) for product_id, qty in keep.items()],
+            update_conflicts=True,
+            unique_fields=['user', 'product'],
+            update_fields=['quantity'],
+        )
+    if drop:
+        Cart.objects.filter(user_id=user_id, product_id__in=drop).delete()
+    forget_cart_summary(user_id)
+
+
+def apply_operations(user, operations):
+    """Apply batch operations to the user's cart in one transaction.
+
+    Each operation either sets `quantity` or adds `delta` (which may be
+    negative); they are applied in order, so several operations on the same
+    product compose. A resulting quantity of zero or less removes the line.
+    Raises UnknownProducts, without touching the cart, if any product_id
+    doesn't exist.
+    """
+    product_ids = {op['product_id'] for op in operations}
+    missing = product_ids - set(Product.objects.filter(id__in=product_ids).values_list('id', flat=True))
+    if missing:
+        raise UnknownProducts(missing)
+
+    with transaction.atomic():
+        # Only relative operations need the current quantities
+        relative = {op['product_id'] for op in operations if 'delta' in op}
+        quantities = dict(
+            Cart.objects.select_for_update()
+            .filter(user_id=user.id, product_id__in=relative)
+            .values_list('product_id', 'quantity')
+        ) if relative else {}
+
+        for op in operations:
+            if 'delta' in op:
+                quantities[op['product_id']] = max(quantities.get(op['product_id'], 0) + op['delta'], 0)
+            else:
+                quantities[op['product_id']] = op['quantity']
+
+        upsert_quantities(user.id, quantities)
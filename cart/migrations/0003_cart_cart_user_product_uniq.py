@@ -0,0 +1,39 @@
+# Generated by Django 5.1.5 on 2026-10-18 11:38
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def merge_duplicate_cart_rows(apps, schema_editor):
+    """Fold duplicate (user, product) rows into one so the constraint can be added"""
+    Cart = apps.get_model('cart', 'Cart')
+    carts = Cart.objects.using(schema_editor.connection.alias)
+    duplicates = (
+        carts.filter(user__isnull=False)
+        .values('user_id', 'product_id')
+        .annotate(rows=Count('id'), total=Sum('quantity'))
+        .filter(rows__gt=1)
+    )
+    for dup in duplicates:
+        rows = carts.filter(user_id=dup['user_id'], product_id=dup['product_id']).order_by('id')
+        keep = rows.first()
+        rows.exclude(id=keep.id).delete()
+        carts.filter(id=keep.id).update(quantity=dup['total'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cart', '0002_cart_product_cart_quantity'),
+        ('products', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_cart_rows, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='cart',
+            constraint=models.UniqueConstraint(fields=('user', 'product'), name='cart_user_product_uniq'),
+        ),
+    ]
@@ -9,5 +9,11 @@ class Cart(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     product = models.ForeignKey(Product, on_delete=models.CASCADE, default=1)
 
+    class Meta:
+        constraints = [
+            # ✅ One row per product per user; also serves the (user, product) lookups
+            models.UniqueConstraint(fields=['user', 'product'], name='cart_user_product_uniq'),
+        ]
+
     def __str__(self):
         return f"Cart (User: {self.user}, Product: {self.product}, Quantity: {self.quantity})"
@@ -6,7 +6,7 @@ from .models import Product, Cart
 class ProductSerializer(serializers.ModelSerializer):
     class Meta:
         model = Product
-        fields = '__all__' # ✅ Includes all Product fields
+        exclude = ['image_variants']  # ✅ All Product fields except the derivative bookkeeping
 
 class CartSerializer(serializers.ModelSerializer):
     product = ProductSerializer(read_only=True)  # ✅ Only for GET requests
@@ -19,3 +19,19 @@ class CartSerializer(serializers.ModelSerializer):
     class Meta:
         model = Cart
         fields = '__all__'  # ✅ Include all Cart fields + product_id
+
+
+class CartOperationSerializer(serializers.Serializer):
+    """One batch operation: set `quantity` outright, or adjust it by `delta`"""
+    product_id = serializers.IntegerField()
+    quantity = serializers.IntegerField(min_value=0, required=False)
+    delta = serializers.IntegerField(required=False)
+
+    def validate(self, attrs):
+        if ("quantity" in attrs) == ("delta" in attrs):
+            raise serializers.ValidationError("Give exactly one of 'quantity' or 'delta'.")
+        return attrs
+
+
+class CartBatchSerializer(serializers.Serializer):
+    operations = CartOperationSerializer(many=True, allow_empty=False, max_length=settings.CART_BATCH_MAX_OPERATIONS)
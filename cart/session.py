@@ -0,0 +1,65 @@
+"""Guest carts kept in the session, and folding them into Cart rows on login.
+
+The session holds only {product_id: quantity}; names and prices are read
+from the catalog when needed rather than copied into every session write.
+Sessions written by older code stored {"name", "price", "quantity"} per
+product, which is still read.
+"""
+from django.db import transaction
+
+from products.models import Product
+
+from .batch import upsert_quantities
+from .models import Cart
+
+SESSION_CART_KEY = "cart"
+
+
+class SessionCart:
+    def __init__(self, session):
+        self.session = session
+
+    def items(self):
+        """{product_id: quantity} for the guest cart"""
+        items = {}
+        for product_id, value in self.session.get(SESSION_CART_KEY, {}).items():
+            quantity = value["quantity"] if isinstance(value, dict) else value
+            items[int(product_id)] = int(quantity)
+        return items
+
+    def add(self, product_id, quantity):
+        items = self.items()
+        items[product_id] = items.get(product_id, 0) + quantity
+        self.session[SESSION_CART_KEY] = {str(pid): qty for pid, qty in items.items()}
+
+    def clear(self):
+        if SESSION_CART_KEY in self.session:
+            del self.session[SESSION_CART_KEY]
+
+
+def merge_session_cart(session, user):
+    """Add the guest cart's quantities to the user's Cart rows and empty it.
+
+    One read of the products, one locked read of the overlapping rows and a
+    single bulk upsert, however many lines the guest cart has. Products that
+    have since been deleted are dropped. Returns the number of lines merged.
+    """
+    cart = SessionCart(session)
+    items = cart.items()
+    if not items:
+        return 0
+
+    existing_products = set(Product.objects.filter(id__in=items).values_list("id", flat=True))
+    items = {product_id: qty for product_id, qty in items.items() if product_id in existing_products}
+
+    with transaction.atomic():
+        current = dict(
+            Cart.objects.select_for_update()
+            .filter(user=user, product_id__in=items)
+            .values_list("product_id", "quantity")
+        ) if items else {}
+        if items:
+            upsert_quantities(user.id, {pid: current.get(pid, 0) + qty for pid, qty in items.items()})
+
+    cart.clear()
+    return len(items)
@@ -0,0 +1,11 @@
+from django.contrib.auth.signals import user_logged_in
+from django.dispatch import receiver
+
+from .session import merge_session_cart
+
+
+@receiver(user_logged_in)
+def merge_guest_cart(sender, request, user, **kwargs):
+    """Session logins (admin, browsable API) keep what was added as a guest"""
+    if request is not None and hasattr(request, "session"):
+        merge_session_cart(request.session, user)
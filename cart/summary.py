@@ -0,0 +1,136 @@
+"""Per-user cart totals (item count, line count, subtotal), cached and invalidated.
+
+The totals are not maintained incrementally: a mutation only invalidates
+them (``forget_cart_summary``), and the next read re-aggregates the cart
+in one SQL query. Adding each mutation's delta instead would need the
+price of every line at the time, and would still go stale when a price
+changes, for every cart holding that product.
+
+The totals live in the "carts" cache region next to a per-cart revision
+counter. Every committed cart change bumps the revision; the totals are
+stored with the revision that was current before they were aggregated,
+and only count as a hit while it still is. A fill that raced with a
+change (aggregated just before or after it committed) is therefore never
+served, and a change is never counted twice. A miss is filled from a
+single SQL aggregate. Keys include the catalog version, so a product
+price change invalidates every cached subtotal.
+"""
+import time
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, DecimalField, F, Sum, Value
+from django.db.models.functions import Coalesce
+
+from ecommerce.cache import region
+from products.cache import aget_catalog_version, get_catalog_version
+
+from .models import Cart
+
+
+def _revision_key(user_id):
+    return f"summary:{user_id}:rev"
+
+
+def _keys_for(user_id, version):
+    return {"revision": _revision_key(user_id), "totals": f"summary:{user_id}:v{version}"}
+
+
+def _keys(user_id):
+    return _keys_for(user_id, get_catalog_version())
+
+
+def _new_revision():
+    # From the clock, so a revision counter lost to eviction never restarts at a number
+    # that stale totals were stored under
+    return time.time_ns() // 1000
+
+
+def _to_cents(amount):
+    return int((Decimal(amount) * 100).to_integral_value())
+
+
+TOTALS = {
+    "items": Coalesce(Sum("quantity"), 0),
+    "lines": Count("id"),
+    "subtotal": Coalesce(
+        Sum(F("quantity") * F("product__price"), output_field=DecimalField(max_digits=12, decimal_places=2)),
+        Value(Decimal("0.00")),
+    ),
+}
+
+
+def _counters(totals):
+    return {"items": totals["items"], "lines": totals["lines"], "cents": _to_cents(totals["subtotal"])}
+
+
+def aggregate_cart(user_id):
+    """Item count, line count and subtotal in one SQL aggregate"""
+    return _counters(Cart.objects.filter(user_id=user_id).aggregate(**TOTALS))
+
+
+def _as_response(counters):
+    return {
+        "item_count": counters["items"],
+        "line_count": counters["lines"],
+        "subtotal": f"{Decimal(counters['cents']) / 100:.2f}",
+    }
+
+
+def _fresh(cached, keys):
+    """The cached counters if they were aggregated at the current revision, else None"""
+    totals = cached.get(keys["totals"])
+    revision = cached.get(keys["revision"])
+    if totals is not None and revision is not None and totals["revision"] == revision:
+        return totals
+    return None
+
+
+def get_cart_summary(user_id):
+    keys = _keys(user_id)
+    carts = region("carts")
+    cached = carts.get_many(list(keys.values()))
+    totals = _fresh(cached, keys)
+    if totals is not None:
+        return _as_response(totals)
+
+    revision = cached.get(keys["revision"])
+    if revision is None:
+        carts.add(keys["revision"], _new_revision(), timeout=None)
+        revision = carts.get(keys["revision"])
+    counters = aggregate_cart(user_id)
+    carts.set(keys["totals"], {**counters, "revision": revision})
+    return _as_response(counters)
+
+
+async def aget_cart_summary(user_id):
+    """get_cart_summary for async views"""
+    keys = _keys_for(user_id, await aget_catalog_version())
+    carts = region("carts")
+    cached = await carts.aget_many(list(keys.values()))
+    totals = _fresh(cached, keys)
+    if totals is not None:
+        return _as_response(totals)
+
+    revision = cached.get(keys["revision"])
+    if revision is None:
+        await carts.aadd(keys["revision"], _new_revision(), timeout=None)
+        revision = await carts.aget(keys["revision"])
+    counters = _counters(await Cart.objects.filter(user_id=user_id).aaggregate(**TOTALS))
+    await carts.aset(keys["totals"], {**counters, "revision": revision})
+    return _as_response(counters)
+
+
+def cart_subtotal(cart_items):
+    """Subtotal of already-loaded cart rows (with their products)"""
+    return sum((item.product.price * item.quantity for item in cart_items), Decimal("0.00"))
+
+
+def forget_cart_summary(user_id):
+    """Invalidate the cached totals once the surrounding transaction commits (any cart change)"""
+    def bump():
+        try:
+            region("carts").incr(_revision_key(user_id))
+        except ValueError:
+            pass  # No revision: no totals are cached under one either
+    transaction.on_commit(bump)
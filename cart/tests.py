@@ -1,3 +1,286 @@
-from django.test import TestCase
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import AccessToken
+
+from ecommerce.testing import QueryCountMixin
+from products.models import Product
+
+from .models import Cart
+from .session import SESSION_CART_KEY, SessionCart, merge_session_cart
+from . import summary
+from .summary import aggregate_cart, forget_cart_summary
+
+
+class CartQueryCountTests(QueryCountMixin, APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="shopper", password="secret123")
+        self.client.force_authenticate(self.user)
+        self.products = [
+            Product.objects.create(name=f"Item {i}", price=100 + i, stock=10, category="Accessories")
+            for i in range(20)
+        ]
+        self.add_to_cart(self.products[:2])
+
+    def committed(self, call):
+        """Run `call` and then its on_commit hooks, like a request outside a test transaction"""
+        def run():
+            with self.captureOnCommitCallbacks(execute=True):
+                return call()
+        return run
+
+    def add_to_cart(self, products):
+        Cart.objects.bulk_create([Cart(user=self.user, product=p, quantity=1) for p in products])
+
+    def test_list(self):
+        response = self.assertConstantQueries(
+            lambda: self.client.get("/api/cart/"),
+            lambda: self.add_to_cart(self.products[2:]),
+            expected=1,
+        )
+        self.assertEqual(len(response.json()["cart"]), 20)
+
+    def test_update_quantity(self):
+        target = self.products[0]
+        self.assertConstantQueries(
+            self.committed(lambda: self.client.patch(f"/cart/{target.id}/update-quantity/", {"action": "add"})),
+            lambda: self.add_to_cart(self.products[2:]),
+            # Lookup, update and one aggregate for the returned totals (the change invalidated them)
+            expected=3,
+        )
+
+    def test_destroy(self):
+        self.assertConstantQueries(
+            self.committed(lambda: self.client.delete(f"/api/cart/{self.products[0].id}/")),
+            lambda: self.add_to_cart(self.products[2:] + [self.products[0]]),
+            # Lookup, delete and one aggregate for the returned totals (the change invalidated them)
+            expected=3,
+        )
+
+
+class CartSummaryTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="shopper", password="secret123")
+        self.client.force_authenticate(self.user)
+        self.shirt = Product.objects.create(name="Shirt", price="250.50", stock=10, category="Clothing")
+        self.mug = Product.objects.create(name="Mug", price="99.99", stock=10, category="Accessories")
+
+    def mutate(self, method, url, data=None):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = getattr(self.client, method)(url, data or {}, format="json")
+        self.assertLess(response.status_code, 400, response.content)
+        return response
+
+    def summary(self):
+        return self.client.get("/api/cart/summary/").json()
+
+    def test_empty_cart(self):
+        self.assertEqual(self.summary(), {"item_count": 0, "line_count": 0, "subtotal": "0.00"})
+
+    def test_totals_follow_mutations(self):
+        self.summary()  # Cache the empty totals: every change below must invalidate them
+        self.mutate("post", "/api/cart/", {"product_id": self.shirt.id, "quantity": 2})
+        self.mutate("post", "/api/cart/", {"product_id": self.mug.id})
+        self.mutate("post", "/api/cart/", {"product_id": self.mug.id})
+        self.mutate("patch", f"/cart/{self.shirt.id}/update-quantity/", {"action": "remove"})
+        self.assertEqual(self.summary(), {"item_count": 3, "line_count": 2, "subtotal": "450.48"})
+
+        self.mutate("delete", f"/api/cart/{self.mug.id}/")
+        self.assertEqual(self.summary(), {"item_count": 1, "line_count": 1, "subtotal": "250.50"})
+        self.assertEqual(aggregate_cart(self.user.id), {"items": 1, "lines": 1, "cents": 25050})
+
+    def test_new_line_starts_at_requested_quantity(self):
+        self.mutate("post", "/api/cart/", {"product_id": self.shirt.id, "quantity": 1})
+        self.assertEqual(Cart.objects.get(user=self.user).quantity, 1)
+
+    def test_miss_is_one_aggregate_and_hit_is_free(self):
+        Cart.objects.create(user=self.user, product=self.shirt, quantity=3)
+        with self.assertNumQueries(1):
+            first = self.summary()
+        with self.assertNumQueries(0):
+            second = self.summary()
+        self.assertEqual(first, second)
+        self.assertEqual(first["subtotal"], "751.50")
+
+    def test_change_racing_a_fill_is_not_lost_or_double_counted(self):
+        real_aggregate = summary.aggregate_cart
+
+        def change_after(aggregate_sees_change):
+            def aggregate(user_id):
+                # A concurrent request changes the cart (and commits) while this fill is in flight
+                if not aggregate_sees_change:
+                    counters = real_aggregate(user_id)
+                with self.captureOnCommitCallbacks(execute=True):
+                    Cart.objects.update_or_create(user=self.user, product=self.mug, defaults={"quantity": 1})
+                    if aggregate_sees_change:
+                        counters = real_aggregate(user_id)  # Read after the commit, before the invalidation
+                    forget_cart_summary(self.user.id)
+                return counters
+            return aggregate
+
+        for aggregate_sees_change in (False, True):
+            Cart.objects.filter(user=self.user).delete()
+            with mock.patch("cart.summary.aggregate_cart", change_after(aggregate_sees_change)):
+                self.summary()
+            self.assertEqual(self.summary()["item_count"], 1)
+
+    @override_settings(STATELESS_JWT=True)
+    def test_async_endpoint_matches(self):
+        Cart.objects.create(user=self.user, product=self.shirt, quantity=2)
+        Cart.objects.create(user=self.user, product=self.mug, quantity=1)
+        auth = {"HTTP_AUTHORIZATION": f"Bearer {AccessToken.for_user(self.user)}"}
+        with self.assertNumQueries(1):  # The aggregate on a miss; the token is checked without a query
+            async_ = self.client.get("/api/async/cart/summary/", **auth)
+        self.assertEqual(async_.content, self.client.get("/api/cart/summary/").content)
+        self.assertEqual(self.client.get("/api/async/cart/summary/").status_code, 401)
+
+    def test_price_change_invalidates_totals(self):
+        Cart.objects.create(user=self.user, product=self.shirt, quantity=2)
+        self.summary()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.shirt.price = Decimal("300.00")
+            self.shirt.save()
+        self.assertEqual(self.summary()["subtotal"], "600.00")
+
+
+class CartBatchTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="shopper", password="secret123")
+        self.client.force_authenticate(self.user)
+        self.products = [
+            Product.objects.create(name=f"Item {i}", price=100 + i, stock=10, category="Accessories")
+            for i in range(30)
+        ]
+
+    def batch(self, operations):
+        return self.client.post("/api/cart/batch/", {"operations": operations}, format="json")
+
+    def quantities(self):
+        return dict(Cart.objects.filter(user=self.user).values_list("product_id", "quantity"))
+
+    def test_set_adjust_and_remove(self):
+        a, b, c = self.products[:3]
+        Cart.objects.create(user=self.user, product=a, quantity=2)
+        Cart.objects.create(user=self.user, product=c, quantity=1)
+
+        response = self.batch([
+            {"product_id": a.id, "delta": 3},
+            {"product_id": b.id, "quantity": 4},
+            {"product_id": b.id, "delta": -1},
+            {"product_id": c.id, "delta": -1},
+        ])
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(self.quantities(), {a.id: 5, b.id: 3})
+        self.assertEqual(
+            sorted((item["product"]["id"], item["quantity"]) for item in response.json()["cart"]),
+            [(a.id, 5), (b.id, 3)],
+        )
+
+    def test_quantity_zero_removes_line(self):
+        Cart.objects.create(user=self.user, product=self.products[0], quantity=2)
+        self.batch([{"product_id": self.products[0].id, "quantity": 0}])
+        self.assertEqual(self.quantities(), {})
+
+    def test_unknown_product_leaves_cart_untouched(self):
+        Cart.objects.create(user=self.user, product=self.products[0], quantity=2)
+        response = self.batch([
+            {"product_id": self.products[0].id, "quantity": 9},
+            {"product_id": 999999, "quantity": 1},
+        ])
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.json()["product_ids"], [999999])
+        self.assertEqual(self.quantities(), {self.products[0].id: 2})
+
+    def test_operation_needs_exactly_one_of_quantity_or_delta(self):
+        for operation in ({"product_id": self.products[0].id}, {"product_id": self.products[0].id, "quantity": 1, "delta": 1}):
+            self.assertEqual(self.batch([operation]).status_code, 400)
+        self.assertEqual(self.batch([]).status_code, 400)
+
+    def test_query_count_does_not_grow_with_operations(self):
+        def run(products):
+            Cart.objects.create(user=self.user, product=products[0], quantity=1)
+            operations = [{"product_id": products[0].id, "delta": -1}]
+            operations += [{"product_id": p.id, "delta": 2} for p in products[1:]]
+            with CaptureQueriesContext(connection) as queries:
+                response = self.batch(operations)
+            self.assertEqual(response.status_code, 200)
+            return len(queries)
+
+        # Product check, locked read, upsert, delete and final cart, however many operations
+        self.assertEqual(run(self.products[:3]), run(self.products[3:30]))
+        self.assertEqual(len(self.quantities()), 2 + 26)
+
+    def test_cached_summary_is_dropped(self):
+        Cart.objects.create(user=self.user, product=self.products[0], quantity=1)
+        self.client.get("/api/cart/summary/")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.batch([{"product_id": self.products[0].id, "delta": 4}])
+        self.assertEqual(self.client.get("/api/cart/summary/").json()["item_count"], 5)
+
+
+class GuestCartTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="shopper", password="secret123")
+        self.shirt = Product.objects.create(name="Shirt", price="250.50", stock=10, category="Clothing")
+        self.mug = Product.objects.create(name="Mug", price="99.99", stock=10, category="Accessories")
+
+    def add_as_guest(self, product, quantity=1):
+        response = self.client.post("/api/cart/", {"product_id": product.id, "quantity": quantity}, format="json")
+        self.assertEqual(response.status_code, 201, response.content)
+
+    def session_cart(self):
+        return self.client.session.get(SESSION_CART_KEY, {})
+
+    def test_guest_cart_is_compact(self):
+        self.add_as_guest(self.shirt, 2)
+        self.add_as_guest(self.shirt)
+        self.add_as_guest(self.mug)
+        self.assertEqual(self.session_cart(), {str(self.shirt.id): 3, str(self.mug.id): 1})
+
+    def test_legacy_session_entries_are_read(self):
+        session = {SESSION_CART_KEY: {str(self.shirt.id): {"name": "Shirt", "price": "250.50", "quantity": 2}}}
+        cart = SessionCart(session)
+        cart.add(self.shirt.id, 1)
+        self.assertEqual(cart.items(), {self.shirt.id: 3})
+
+    @override_settings(SESSION_ENGINE="django.contrib.sessions.backends.cache")
+    def test_cache_sessions_do_not_write_to_the_database(self):
+        with CaptureQueriesContext(connection) as queries:
+            for _ in range(5):
+                self.add_as_guest(self.mug)
+        self.assertFalse([q["sql"] for q in queries if "django_session" in q["sql"]])
+        self.assertEqual(self.session_cart(), {str(self.mug.id): 5})
+
+    def test_jwt_login_merges_guest_cart(self):
+        Cart.objects.create(user=self.user, product=self.shirt, quantity=1)
+        self.add_as_guest(self.shirt, 2)
+        self.add_as_guest(self.mug)
+
+        response = self.client.post("/api/token/", {"username": "shopper", "password": "secret123"}, format="json")
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("access", response.json())
+        self.assertEqual(
+            dict(Cart.objects.filter(user=self.user).values_list("product_id", "quantity")),
+            {self.shirt.id: 3, self.mug.id: 1},
+        )
+        self.assertEqual(self.session_cart(), {})
+
+    def test_session_login_merges_guest_cart(self):
+        self.add_as_guest(self.mug, 4)
+        self.client.login(username="shopper", password="secret123")
+        self.assertEqual(Cart.objects.get(user=self.user, product=self.mug).quantity, 4)
+
+    def test_merge_skips_deleted_products(self):
+        session = {SESSION_CART_KEY: {str(self.mug.id): 1, "999999": 2}}
+        self.assertEqual(merge_session_cart(session, self.user), 1)
+        self.assertEqual(list(Cart.objects.filter(user=self.user).values_list("product_id", flat=True)), [self.mug.id])
@@ -1,6 +1,12 @@
+from ecommerce.authentication import STATELESS_AUTHENTICATION
+
 from .models import Cart, Product
 from rest_framework import viewsets, status
-from .serializers import CartSerializer
+from rest_framework.decorators import action
+from .batch import UnknownProducts, apply_operations
+from .serializers import CartBatchSerializer, CartSerializer
+from .session import SessionCart
+from .summary import forget_cart_summary, get_cart_summary
 from rest_framework.permissions import AllowAny
 from rest_framework.response import Response
 from rest_framework.views import APIView
@@ -9,20 +15,21 @@ from rest_framework.generics import DestroyAPIView
 
 class CartListView(APIView):
     """Retrieve all cart items"""
+    authentication_classes = STATELESS_AUTHENTICATION  # ✅ User from the token's claims, no query
     permission_classes = [permissions.IsAuthenticated]
 
     def get(self, request):
-        cart_items = Cart.objects.filter(user=request.user)
+        cart_items = Cart.objects.filter(user_id=request.user.id).select_related("product")
         serializer = CartSerializer(cart_items, many=True)
         return Response(serializer.data, status=status.HTTP_200_OK)
 
 class CartView(DestroyAPIView):
     queryset = Cart.objects.all()
     serializer_class = CartSerializer
+    authentication_classes = STATELESS_AUTHENTICATION
 
     def get_queryset(self):
-        user = self.request.user
-        return Cart.objects.filter(user=user)
+        return Cart.objects.filter(user_id=self.request.user.id).select_related("product")
 
     def delete(self, request, *args, **kwargs):
         item_id = kwargs.get("pk")  # Get item ID from URL
@@ -32,20 +39,22 @@ class CartView(DestroyAPIView):
             return Response({"error": "Item not found in cart"}, status=status.HTTP_404_NOT_FOUND)
 
         cart_item.delete()
+        forget_cart_summary(request.user.id)
         return Response({"message": "Item removed successfully"}, status=status.HTTP_204_NO_CONTENT)
 class CartViewSet(viewsets.ViewSet):
+    authentication_classes = STATELESS_AUTHENTICATION  # ✅ request.user is a TokenUser: filter by user_id
     permission_classes = [permissions.IsAuthenticated]  # Ensure auth required
 
-    def list(self, request):
-        print("🔹 Headers:", request.headers)
-        print("🔹 Request User:", request.user)
-        print("🔹 Authenticated:", request.user.is_authenticated)
+    def get_permissions(self):
+        if self.action == "create":
+            return [AllowAny()]  # Guests can fill a session cart
+        return super().get_permissions()
 
+    def list(self, request):
         if not request.user.is_authenticated:
             return Response({"error": "Authentication required"}, status=401)
 
-        cart_items = Cart.objects.filter(user=request.user)
-        print("🔹 Cart Items:", cart_items)
+        cart_items = Cart.objects.filter(user_id=request.user.id).select_related("product")
 
         serializer = CartSerializer(cart_items, many=True)
         return Response({"cart": serializer.data})
@@ -62,22 +71,45 @@ class CartViewSet(viewsets.ViewSet):
         if not product:
             return Response({"error": "Product not found"}, status=status.HTTP_404_NOT_FOUND)
 
+        quantity = int(quantity)
+
         # ✅ Handle authenticated and non-authenticated users
         if request.user.is_authenticated:
-            cart_item, created = Cart.objects.get_or_create(user=request.user, product=product)
-            cart_item.quantity += quantity
-            cart_item.save()
+            cart_item, created = Cart.objects.get_or_create(
+                user_id=request.user.id, product=product, defaults={"quantity": quantity},
+            )
+            if not created:
+                cart_item.quantity += quantity
+                cart_item.save()
+            forget_cart_summary(request.user.id)
         else:
-            cart = request.session.get("cart", {})
-            if str(product_id) in cart:
-                cart[str(product_id)]["quantity"] += quantity
-            else:
-                cart[str(product_id)] = {"name": product.name, "price": str(product.price), "quantity": quantity}
-
-            request.session["cart"] = cart
-            request.session.modified = True
+            # Guests: {product_id: quantity} in the session, merged into Cart rows at login
+            SessionCart(request.session).add(product.id, quantity)
 
         return Response({"message": "Item added to cart"}, status=status.HTTP_201_CREATED)
+
+    @action(detail=False, methods=["get"])
+    def summary(self, request):
+        """Item count, line count and subtotal without loading the cart"""
+        return Response(get_cart_summary(request.user.id))
+
+    @action(detail=False, methods=["post"])
+    def batch(self, request):
+        """Apply a list of {product_id, quantity | delta} operations and return the final cart"""
+        serializer = CartBatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        try:
+            apply_operations(request.user, serializer.validated_data["operations"])
+        except UnknownProducts as exc:
+            return Response(
+                {"error": "Product not found", "product_ids": exc.product_ids},
+                status=status.HTTP_404_NOT_FOUND,
+            )
+
+        cart_items = Cart.objects.filter(user_id=request.user.id).select_related("product")
+        return Response({"cart": CartSerializer(cart_items, many=True).data}, status=status.HTTP_200_OK)
+
     def update_quantity(self, request, pk=None):
         """Increase or decrease quantity based on action (add/remove)"""
         action = request.data.get("action")  # "add" or "remove"
@@ -85,7 +117,7 @@ class CartViewSet(viewsets.ViewSet):
         if action not in ["add", "remove"]:
             return Response({"error": "Invalid action. Use 'add' or 'remove'."}, status=status.HTTP_400_BAD_REQUEST)
 
-        cart_item = Cart.objects.filter(user=request.user, product_id=pk).first()
+        cart_item = Cart.objects.filter(user_id=request.user.id, product_id=pk).select_related("product").first()
         if not cart_item:
             return Response({"error": "Item not found in cart"}, status=status.HTTP_404_NOT_FOUND)
 
@@ -94,39 +126,35 @@ class CartViewSet(viewsets.ViewSet):
         if action == "add":
             cart_item.quantity += 1
             cart_item.save()
+            forget_cart_summary(request.user.id)
             message = f"Added 1 more '{product_name}' to cart"
         elif action == "remove":
             if cart_item.quantity > 1:
                 cart_item.quantity -= 1
                 cart_item.save()
+                forget_cart_summary(request.user.id)
                 message = f"1 '{product_name}' item removed from cart"
             else:
                 cart_item.delete()
+                forget_cart_summary(request.user.id)
                 message = f"Item '{product_name}' removed from cart completely"
 
         return Response(
-            {"message": message, "cart": self.get_cart_response(request)},
+            {"message": message, "summary": get_cart_summary(request.user.id)},
             status=status.HTTP_200_OK,
      )
 
     def destroy(self, request, pk=None):
         """Remove item from cart completely"""
-        cart_item = Cart.objects.filter(user=request.user, product_id=pk).first()
+        cart_item = Cart.objects.filter(user_id=request.user.id, product_id=pk).select_related("product").first()
         if not cart_item:
             return Response({"error": "Item not found in cart"}, status=status.HTTP_404_NOT_FOUND)
 
         product_name = cart_item.product.name  # Get the product name before deletion
         cart_item.delete()
+        forget_cart_summary(request.user.id)
 
         return Response(
-            {"message": f"Item '{product_name}' removed from cart completely", "cart": self.get_cart_response(request)},
+            {"message": f"Item '{product_name}' removed from cart completely", "summary": get_cart_summary(request.user.id)},
             status=status.HTTP_200_OK,
         )
-
-    def get_cart_response(self, request):
-        """Helper function to return the current cart"""
-        if request.user.is_authenticated:
-            cart_items = Cart.objects.filter(user=request.user)
-            return CartSerializer(cart_items, many=True).data
-        else:
-            return request.session.get("cart", [])
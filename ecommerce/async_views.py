@@ -0,0 +1,66 @@
+"""Helpers for the plain-Django async views.
+
+DRF views, authenticators and permissions are sync-only, so the async
+endpoints are ordinary Django coroutines. These helpers keep their
+responses identical to the DRF versions of the same endpoints.
+"""
+from django.contrib.auth import get_user_model
+from django.http import HttpResponse
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+from .authentication import ais_revoked, stateless_users
+from .renderers import FastJSONRenderer
+
+
+def _raw_token(request):
+    parts = request.headers.get("Authorization", "").split()
+    if len(parts) == 2 and parts[0] in api_settings.AUTH_HEADER_TYPES:
+        return parts[1]
+    return None
+
+
+async def authenticate(request, allow_session=False):
+    """Id of the user behind a valid, unrevoked Bearer access token, or None.
+
+    Stateless like STATELESS_AUTHENTICATION: the token is validated in
+    CPU and checked against the revocation list in the cache, with no
+    query unless STATELESS_JWT is off (then the user must still be
+    active). ``allow_session`` also accepts a logged-in session cookie,
+    for clients that cannot set headers (EventSource).
+    """
+    raw = _raw_token(request)
+    if raw is None:
+        if allow_session:
+            user = await request.auser()
+            return user.pk if user.is_authenticated else None
+        return None
+    try:
+        token = AccessToken(raw)
+        user_id = token[api_settings.USER_ID_CLAIM]
+    except (InvalidToken, TokenError, KeyError):
+        return None
+    if await ais_revoked(token):
+        return None
+    if not stateless_users():
+        active = get_user_model().objects.filter(**{api_settings.USER_ID_FIELD: user_id}, is_active=True)
+        if not await active.aexists():
+            return None
+    return user_id
+
+
+def render_json(data, status=200):
+    """JSON rendered exactly as DRF's JSONRenderer renders it"""
+    return HttpResponse(FastJSONRenderer().render(data), status=status, content_type="application/json")
+
+
+def not_found(model):
+    return render_json({"detail": f"No {model._meta.object_name} matches the given query."}, status=404)
+
+
+def unauthorized():
+    # Same response DRF's JWTAuthentication gives an anonymous request
+    response = render_json({"detail": "Authentication credentials were not provided."}, status=401)
+    response["WWW-Authenticate"] = f'{api_settings.AUTH_HEADER_TYPES[0]} realm="api"'
+    return response
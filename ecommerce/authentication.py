@@ -0,0 +1,111 @@
+"""JWT authentication with a stateless fast path and token revocation.
+
+Views pick their authenticator chain with ``authentication_classes``;
+DRF tries them in order and stops at the first that recognises the
+request:
+
+* the REST_FRAMEWORK default loads the ``User`` row for every request,
+  for views that need a real user (admin checks, ``is_staff``)
+* ``STATELESS_AUTHENTICATION`` builds a ``TokenUser`` from the access
+  token's claims, with no query, for the hot authenticated cart and order
+  endpoints. Those filter by ``user_id=request.user.id`` and never touch
+  ``request.user`` as a model instance.
+
+Both honour the revocation list in the "auth" cache region: logging out
+revokes the token's ``jti`` until it would have expired anyway, and
+deactivating a user revokes everything issued to them before that
+moment. Checking costs one cache ``get_many`` per request.
+
+The revocation list is only the sole guard when every worker shares it
+and it survives restarts, i.e. with ``CACHE_URL``. ``STATELESS_JWT``
+(on exactly then by default) decides: when off, the stateless
+authenticator loads the ``User`` row like the default one, so a
+deactivated user is refused by every worker.
+"""
+import time
+
+from django.conf import settings
+from rest_framework.authentication import SessionAuthentication
+from rest_framework_simplejwt import authentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.serializers import TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .cache import region
+
+
+def revocations():
+    return region("auth")
+
+
+def stateless_users():
+    """Whether a valid, unrevoked token is enough without loading its User (see STATELESS_JWT)"""
+    return getattr(settings, "STATELESS_JWT", False)
+
+
+def _keys(token):
+    return f"jti:{token[api_settings.JTI_CLAIM]}", f"user:{token[api_settings.USER_ID_CLAIM]}"
+
+
+def revoke(token):
+    """Reject `token` (access or refresh) from now until it expires"""
+    remaining = int(token["exp"] - time.time())
+    if remaining > 0:
+        revocations().set(_keys(token)[0], True, remaining)
+
+
+def revoke_user(user_id):
+    """Reject every token issued to `user_id` up to now"""
+    lifetime = max(api_settings.ACCESS_TOKEN_LIFETIME, api_settings.REFRESH_TOKEN_LIFETIME)
+    revocations().set(f"user:{user_id}", int(time.time()), int(lifetime.total_seconds()))
+
+
+def _revoked(token, found):
+    jti_key, user_key = _keys(token)
+    if jti_key in found:
+        return True
+    revoked_before = found.get(user_key)
+    return revoked_before is not None and token.get("iat", 0) <= revoked_before
+
+
+def is_revoked(token):
+    return _revoked(token, revocations().get_many(_keys(token)))
+
+
+async def ais_revoked(token):
+    return _revoked(token, await revocations().aget_many(_keys(token)))
+
+
+class RevocationCheckMixin:
+    def get_validated_token(self, raw_token):
+        token = super().get_validated_token(raw_token)
+        if is_revoked(token):
+            raise InvalidToken("Token has been revoked")
+        return token
+
+
+class JWTAuthentication(RevocationCheckMixin, authentication.JWTAuthentication):
+    """simplejwt's authenticator (one user query per request) plus the revocation check"""
+
+
+class StatelessJWTAuthentication(RevocationCheckMixin, authentication.JWTStatelessUserAuthentication):
+    """request.user is a TokenUser built from the token's claims: no query (with STATELESS_JWT)"""
+
+    def get_user(self, validated_token):
+        if stateless_users():
+            return super().get_user(validated_token)
+        # Revocations are per process: the User row is what every worker agrees on
+        return authentication.JWTAuthentication.get_user(self, validated_token)
+
+
+class RevocableTokenRefreshSerializer(TokenRefreshSerializer):
+    """Refuses to mint access tokens from a revoked refresh token"""
+
+    def validate(self, attrs):
+        if is_revoked(RefreshToken(attrs["refresh"])):
+            raise InvalidToken("Token has been revoked")
+        return super().validate(attrs)
+
+
+STATELESS_AUTHENTICATION = [StatelessJWTAuthentication, SessionAuthentication]
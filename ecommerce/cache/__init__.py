@@ -0,0 +1,220 @@
+"""Named cache regions shared by the product, cart and order modules.
+
+A region is a namespace in one of the CACHES aliases with its own default
+TTL, configured in ``settings.CACHE_REGIONS``::
+
+    from ecommerce.cache import region
+
+    catalog = region("catalog")
+    data = catalog.get_or_set(key, build_page)  # single-flight on a miss
+
+``get_or_set`` lets exactly one caller recompute a missing value: threads
+in the same process wait on a per-key lock and other processes wait on a
+short-lived lock key in the shared cache. Every region counts hits,
+misses, computations and stampedes avoided; ``cache_metrics()`` returns
+the counters.
+"""
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+
+MISSING = object()
+
+_regions = {}
+_regions_lock = threading.Lock()
+
+
+class _KeyedLocks:
+    """One lock per key, dropped once nobody holds or waits on it"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._locks = {}
+
+    def acquire(self, key):
+        with self._lock:
+            lock, users = self._locks.get(key, (None, 0))
+            if lock is None:
+                lock = threading.Lock()
+            self._locks[key] = (lock, users + 1)
+        lock.acquire()
+        return lock
+
+    def release(self, key, lock):
+        lock.release()
+        with self._lock:
+            _, users = self._locks[key]
+            if users <= 1:
+                del self._locks[key]
+            else:
+                self._locks[key] = (lock, users - 1)
+
+
+class CacheRegion:
+    lock_timeout = 10  # Seconds another process may spend recomputing before we give up waiting
+    poll_interval = 0.02
+
+    def __init__(self, name, alias='default', timeout=DEFAULT_TIMEOUT):
+        self.name = name
+        self.alias = alias
+        self.timeout = timeout
+        self.stats = Counter()
+        self._stats_lock = threading.Lock()
+        self._flights = _KeyedLocks()
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def key(self, key):
+        return f"{self.name}:{key}"
+
+    def _count(self, stat, n=1):
+        with self._stats_lock:
+            self.stats[stat] += n
+
+    def _timeout(self, timeout):
+        return self.timeout if timeout is DEFAULT_TIMEOUT else timeout
+
+    def get(self, key, default=None):
+        value = self.cache.get(self.key(key), MISSING)
+        if value is MISSING:
+            self._count('misses')
+            return default
+        self._count('hits')
+        return value
+
+    def get_many(self, keys):
+        found = self.cache.get_many([self.key(k) for k in keys])
+        prefix = len(self.name) + 1
+        values = {k[prefix:]: v for k, v in found.items()}
+        self._count('hits', len(values))
+        self._count('misses', len(keys) - len(values))
+        return values
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT):
+        self._count('sets')
+        self.cache.set(self.key(key), value, self._timeout(timeout))
+
+    def set_many(self, mapping, timeout=DEFAULT_TIMEOUT):
+        self._count('sets', len(mapping))
+        self.cache.set_many({self.key(k): v for k, v in mapping.items()}, self._timeout(timeout))
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT):
+        return self.cache.add(self.key(key), value, self._timeout(timeout))
+
+    def delete(self, key):
+        self._count('deletes')
+        return self.cache.delete(self.key(key))
+
+    def delete_many(self, keys):
+        self._count('deletes', len(keys))
+        self.cache.delete_many([self.key(k) for k in keys])
+
+    def incr(self, key, delta=1):
+        return self.cache.incr(self.key(key), delta)
+
+    def get_or_set(self, key, compute, timeout=DEFAULT_TIMEOUT):
+        """Return the cached value, or compute it once no matter how many callers miss together"""
+        value = self.get(key, MISSING)
+        if value is not MISSING:
+            return value
+
+        full_key = self.key(key)
+        lock = self._flights.acquire(full_key)
+        try:
+            # Another thread in this process may have filled it while we waited
+            value = self.cache.get(full_key, MISSING)
+            if value is not MISSING:
+                self._count('coalesced')
+                return value
+
+            lock_key = f"{full_key}:lock"
+            if not self.cache.add(lock_key, 1, self.lock_timeout):
+                value = self._wait_for(full_key, lock_key)
+                if value is not MISSING:
+                    self._count('coalesced')
+                    return value
+            try:
+                self._count('computes')
+                value = compute()
+                self.set(key, value, timeout)
+            finally:
+                self.cache.delete(lock_key)
+            return value
+        finally:
+            self._flights.release(full_key, lock)
+
+    # Async variants for async views; the backend decides whether they block a thread
+    async def aget(self, key, default=None):
+        value = await self.cache.aget(self.key(key), MISSING)
+        if value is MISSING:
+            self._count('misses')
+            return default
+        self._count('hits')
+        return value
+
+    async def aget_many(self, keys):
+        found = await self.cache.aget_many([self.key(k) for k in keys])
+        prefix = len(self.name) + 1
+        values = {k[prefix:]: v for k, v in found.items()}
+        self._count('hits', len(values))
+        self._count('misses', len(keys) - len(values))
+        return values
+
+    async def aset(self, key, value, timeout=DEFAULT_TIMEOUT):
+        self._count('sets')
+        await self.cache.aset(self.key(key), value, self._timeout(timeout))
+
+    async def aset_many(self, mapping, timeout=DEFAULT_TIMEOUT):
+        self._count('sets', len(mapping))
+        await self.cache.aset_many({self.key(k): v for k, v in mapping.items()}, self._timeout(timeout))
+
+    async def aadd(self, key, value, timeout=DEFAULT_TIMEOUT):
+        return await self.cache.aadd(self.key(key), value, self._timeout(timeout))
+
+    def _wait_for(self, full_key, lock_key):
+        """Another process is recomputing: poll until its value lands or its lock lapses"""
+        deadline = time.monotonic() + self.lock_timeout
+        while time.monotonic() < deadline:
+            time.sleep(self.poll_interval)
+            value = self.cache.get(full_key, MISSING)
+            if value is not MISSING:
+                return value
+            if not self.cache.has_key(lock_key):
+                break
+        return MISSING
+
+    def metrics(self):
+        with self._stats_lock:
+            stats = dict(self.stats)
+        lookups = stats.get('hits', 0) + stats.get('misses', 0)
+        stats['hit_ratio'] = stats.get('hits', 0) / lookups if lookups else 0.0
+        return stats
+
+
+def region(name):
+    """The shared CacheRegion called `name`, configured from settings.CACHE_REGIONS"""
+    try:
+        return _regions[name]
+    except KeyError:
+        pass
+    with _regions_lock:
+        if name not in _regions:
+            config = getattr(settings, 'CACHE_REGIONS', {}).get(name, {})
+            _regions[name] = CacheRegion(
+                name, alias=config.get('ALIAS', 'default'), timeout=config.get('TIMEOUT', DEFAULT_TIMEOUT),
+            )
+        return _regions[name]
+
+
+def cache_metrics():
+    """{region: counters} for every region used so far in this process"""
+    from .backends import LRUCache
+    metrics = {name: r.metrics() for name, r in sorted(_regions.items())}
+    metrics['_lru'] = {'evictions': LRUCache.evictions}
+    return metrics
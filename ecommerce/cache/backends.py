@@ -0,0 +1,177 @@
+"""Cache backends for CACHES: a bounded in-process LRU and a Redis-protocol client"""
+import pickle
+import queue
+import time
+from urllib.parse import urlparse
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.core.cache.backends.locmem import LocMemCache
+
+from .resp import INCR_IF_EXISTS, RespConnection, glob_escape
+
+
+class LRUCache(LocMemCache):
+    """LocMemCache that evicts exactly the least recently used entries.
+
+    LocMemCache already keeps keys in recency order but throws away a
+    whole 1/CULL_FREQUENCY slice when full, which empties hot regions in
+    bursts. This drops expired keys first, then only as many LRU keys as
+    needed, and counts evictions for the metrics.
+    """
+    evictions = 0
+
+    def _set(self, key, value, timeout=DEFAULT_TIMEOUT):
+        if key not in self._cache and len(self._cache) >= self._max_entries:
+            self._cull()
+        self._cache[key] = value
+        self._cache.move_to_end(key, last=False)
+        self._expire_info[key] = self.get_backend_timeout(timeout)
+
+    def _cull(self):
+        now = time.time()
+        for key in [k for k, exp in self._expire_info.items() if exp is not None and exp <= now]:
+            self._delete(key)
+        while len(self._cache) >= self._max_entries:
+            key, _ = self._cache.popitem()  # Least recently used sits at the end
+            del self._expire_info[key]
+            LRUCache.evictions += 1
+
+
+class RespCache(BaseCache):
+    """Minimal Redis-protocol (RESP2) cache backend with a connection pool.
+
+    LOCATION is a redis:// URL. It speaks plain RESP, so a real Redis, a
+    compatible server, or the in-process ``LocalRespServer`` stand-in can
+    serve it. Integers are stored raw so INCRBY works; anything else is
+    pickled.
+    """
+    pickle_protocol = pickle.HIGHEST_PROTOCOL
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        url = urlparse(location)
+        self._host = url.hostname or '127.0.0.1'
+        self._port = url.port or 6379
+        self._db = int(url.path.lstrip('/') or 0)
+        options = params.get('OPTIONS', {})
+        self._socket_timeout = float(options.get('SOCKET_TIMEOUT', 1.0))
+        self._pool = queue.LifoQueue(maxsize=int(options.get('POOL_SIZE', 32)))
+
+    # -- connection pool --------------------------------------------------
+
+    def _execute(self, *args):
+        try:
+            conn = self._pool.get_nowait()
+        except queue.Empty:
+            conn = RespConnection(self._host, self._port, self._db, self._socket_timeout)
+        try:
+            reply = conn.execute(*args)
+        except (OSError, ConnectionError):
+            conn.close()
+            raise
+        try:
+            self._pool.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+        return reply
+
+    def close(self, **kwargs):
+        while True:
+            try:
+                self._pool.get_nowait().close()
+            except queue.Empty:
+                break
+
+    # -- serialization ----------------------------------------------------
+
+    def _dumps(self, value):
+        if type(value) is int:
+            return str(value).encode()
+        return pickle.dumps(value, self.pickle_protocol)
+
+    def _loads(self, data):
+        try:
+            return int(data)
+        except ValueError:
+            return pickle.loads(data)
+
+    def get_backend_timeout(self, timeout=DEFAULT_TIMEOUT):
+        """Relative expiry in milliseconds, or None for no expiry"""
+        if timeout == DEFAULT_TIMEOUT:
+            timeout = self.default_timeout
+        return None if timeout is None else max(0, int(timeout * 1000))
+
+    def _set_args(self, key, value, timeout):
+        args = ['SET', key, self._dumps(value)]
+        ms = self.get_backend_timeout(timeout)
+        if ms is not None:
+            args += ['PX', max(ms, 1)]
+        return args
+
+    # -- cache API --------------------------------------------------------
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        if self.get_backend_timeout(timeout) == 0:
+            return False
+        return self._execute(*self._set_args(key, value, timeout), 'NX') == 'OK'
+
+    def get(self, key, default=None, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        data = self._execute('GET', key)
+        return default if data is None else self._loads(data)
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        if self.get_backend_timeout(timeout) == 0:
+            self._execute('DEL', key)
+            return
+        self._execute(*self._set_args(key, value, timeout))
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        ms = self.get_backend_timeout(timeout)
+        if ms is None:
+            return bool(self._execute('PERSIST', key)) or self.has_key(key)
+        return bool(self._execute('PEXPIRE', key, max(ms, 1)))
+
+    def delete(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        return bool(self._execute('DEL', key))
+
+    def get_many(self, keys, version=None):
+        if not keys:
+            return {}
+        mapping = {self.make_and_validate_key(k, version=version): k for k in keys}
+        values = self._execute('MGET', *mapping)
+        return {mapping[k]: self._loads(v) for k, v in zip(mapping, values) if v is not None}
+
+    def delete_many(self, keys, version=None):
+        if keys:
+            self._execute('DEL', *[self.make_and_validate_key(k, version=version) for k in keys])
+
+    def has_key(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        return bool(self._execute('EXISTS', key))
+
+    def incr(self, key, delta=1, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        value = self._execute('EVAL', INCR_IF_EXISTS, 1, key, delta)
+        if value is None:
+            raise ValueError("Key '%s' not found." % key)
+        return value
+
+    def clear(self):
+        """Delete the keys under this alias's KEY_PREFIX only.
+
+        Aliases share one database, so FLUSHDB would also drop the sessions,
+        revocations and throttles kept under the "sessions" alias.
+        """
+        pattern = glob_escape(self.key_prefix) + ':*'
+        cursor = 0
+        while True:
+            cursor, keys = self._execute('SCAN', cursor, 'MATCH', pattern, 'COUNT', 1000)
+            if keys:
+                self._execute('DEL', *keys)
+            if int(cursor) == 0:
+                break
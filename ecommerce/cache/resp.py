@@ -0,0 +1,249 @@
+"""Just enough of the Redis protocol (RESP2) for the cache backend and its stand-in server"""
+import re
+import socket
+import socketserver
+import threading
+import time
+
+
+# INCRBY creates missing keys (without an expiry); cache.incr() must raise instead, in one round trip
+INCR_IF_EXISTS = (
+    "if redis.call('EXISTS', KEYS[1]) == 1 then return redis.call('INCRBY', KEYS[1], ARGV[1]) end return false"
+)
+
+
+class RespError(Exception):
+    pass
+
+
+def glob_escape(text):
+    """`text` as a literal in a SCAN MATCH pattern"""
+    return re.sub(r'([\\*?\[\]])', r'\\\1', text)
+
+
+def encode_command(args):
+    parts = [b'*%d\r\n' % len(args)]
+    for arg in args:
+        if not isinstance(arg, bytes):
+            arg = str(arg).encode()
+        parts.append(b'$%d\r\n%s\r\n' % (len(arg), arg))
+    return b''.join(parts)
+
+
+def read_reply(stream):
+    line = stream.readline()
+    if not line:
+        raise ConnectionError("Connection closed by server")
+    prefix, rest = line[:1], line[1:-2]
+    if prefix == b'+':
+        return rest.decode()
+    if prefix == b'-':
+        raise RespError(rest.decode())
+    if prefix == b':':
+        return int(rest)
+    if prefix == b'$':
+        length = int(rest)
+        return None if length == -1 else stream.read(length + 2)[:-2]
+    if prefix == b'*':
+        length = int(rest)
+        return None if length == -1 else [read_reply(stream) for _ in range(length)]
+    raise RespError(f"Unknown reply type {prefix!r}")
+
+
+class RespConnection:
+    def __init__(self, host, port, db=0, timeout=1.0):
+        self.sock = socket.create_connection((host, port), timeout=timeout)
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.stream = self.sock.makefile('rb')
+        if db:
+            self.execute('SELECT', db)
+
+    def execute(self, *args):
+        self.sock.sendall(encode_command(args))
+        return read_reply(self.stream)
+
+    def close(self):
+        try:
+            self.stream.close()
+            self.sock.close()
+        except OSError:
+            pass
+
+
+_GLOB = {'*': '.*', '?': '.'}  # SCAN MATCH wildcards; a backslash escapes the next character
+
+
+class _Store:
+    """Key/value data with millisecond expiry, guarded by one lock"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.data = {}
+        self.expires = {}
+
+    def alive(self, key):
+        expires = self.expires.get(key)
+        if expires is not None and expires <= time.monotonic():
+            self.data.pop(key, None)
+            self.expires.pop(key, None)
+        return key in self.data
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        while True:
+            try:
+                command = read_reply(self.rfile)
+            except (ConnectionError, OSError, ValueError):
+                return
+            try:
+                reply = self.server.dispatch([c if isinstance(c, bytes) else str(c).encode() for c in command])
+            except RespError as exc:
+                self.wfile.write(b'-%s\r\n' % str(exc).encode())
+                continue
+            self.wfile.write(_encode_reply(reply))
+
+
+def _encode_reply(reply):
+    if reply is None:
+        return b'$-1\r\n'
+    if isinstance(reply, bool):
+        return b':%d\r\n' % int(reply)
+    if isinstance(reply, int):
+        return b':%d\r\n' % reply
+    if isinstance(reply, str):
+        return b'+%s\r\n' % reply.encode()
+    if isinstance(reply, bytes):
+        return b'$%d\r\n%s\r\n' % (len(reply), reply)
+    return b'*%d\r\n' % len(reply) + b''.join(_encode_reply(r) for r in reply)
+
+
+class LocalRespServer(socketserver.ThreadingTCPServer):
+    """In-process stand-in for Redis that speaks the commands RespCache uses.
+
+    For tests and local development only: one shared keyspace (SELECT is
+    accepted and ignored), no persistence. EVAL runs only the scripts
+    RespCache sends, as Python; SCAN returns every match in one call.
+
+        with LocalRespServer() as server:
+            CACHES = {"default": {"BACKEND": "...RespCache", "LOCATION": server.url}}
+    """
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, host='127.0.0.1', port=0):
+        super().__init__((host, port), _Handler)
+        self.store = _Store()
+        self.thread = None
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"redis://{host}:{port}/0"
+
+    def start(self):
+        self.thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def dispatch(self, command):
+        name, args = command[0].decode().upper(), command[1:]
+        handler = getattr(self, f'cmd_{name.lower()}', None)
+        if handler is None:
+            raise RespError(f"ERR unknown command '{name}'")
+        with self.store.lock:
+            return handler(*args)
+
+    def cmd_ping(self, *args):
+        return 'PONG'
+
+    def cmd_select(self, db):
+        return 'OK'
+
+    def cmd_get(self, key):
+        return self.store.data[key] if self.store.alive(key) else None
+
+    def cmd_mget(self, *keys):
+        return [self.cmd_get(key) for key in keys]
+
+    def cmd_set(self, key, value, *options):
+        options = [o.decode().upper() for o in options]
+        expires = None
+        for unit, scale in (('PX', 1000), ('EX', 1)):
+            if unit in options:
+                expires = time.monotonic() + int(options[options.index(unit) + 1]) / scale
+        exists = self.store.alive(key)
+        if ('NX' in options and exists) or ('XX' in options and not exists):
+            return None
+        self.store.data[key] = value
+        if expires is None:
+            self.store.expires.pop(key, None)
+        else:
+            self.store.expires[key] = expires
+        return 'OK'
+
+    def cmd_del(self, *keys):
+        removed = 0
+        for key in keys:
+            if self.store.alive(key):
+                removed += 1
+            self.store.data.pop(key, None)
+            self.store.expires.pop(key, None)
+        return removed
+
+    def cmd_exists(self, *keys):
+        return sum(1 for key in keys if self.store.alive(key))
+
+    def cmd_incrby(self, key, delta):
+        try:
+            current = int(self.store.data[key]) if self.store.alive(key) else 0
+        except ValueError:
+            raise RespError("ERR value is not an integer or out of range")
+        self.store.data[key] = str(current + int(delta)).encode()
+        return current + int(delta)
+
+    def cmd_incr(self, key):
+        return self.cmd_incrby(key, b'1')
+
+    def cmd_eval(self, script, numkeys, *args):
+        keys, argv = args[:int(numkeys)], args[int(numkeys):]
+        if script.decode() == INCR_IF_EXISTS:
+            return self.cmd_incrby(keys[0], argv[0]) if self.store.alive(keys[0]) else None
+        raise RespError("ERR unsupported script")
+
+    def cmd_scan(self, cursor, *options):
+        options = [o.decode() for o in options]
+        pattern = options[options.index('MATCH') + 1] if 'MATCH' in options else '*'
+        regex = ''.join(_GLOB.get(part, re.escape(part[-1])) for part in re.findall(r'\\?.', pattern))
+        keys = [key for key in list(self.store.data) if self.store.alive(key)]
+        return [b'0', [key for key in keys if re.fullmatch(regex, key.decode(), re.DOTALL)]]
+
+    def cmd_pexpire(self, key, ms):
+        if not self.store.alive(key):
+            return 0
+        self.store.expires[key] = time.monotonic() + int(ms) / 1000
+        return 1
+
+    def cmd_persist(self, key):
+        return int(self.store.alive(key) and self.store.expires.pop(key, None) is not None)
+
+    def cmd_pttl(self, key):
+        if not self.store.alive(key):
+            return -2
+        expires = self.store.expires.get(key)
+        return -1 if expires is None else int((expires - time.monotonic()) * 1000)
+
+    def cmd_flushdb(self, *args):
+        self.store.data.clear()
+        self.store.expires.clear()
+        return 'OK'
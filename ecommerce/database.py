@@ -0,0 +1,85 @@
+"""``DATABASES['default']`` from the environment: SQLite for development, PostgreSQL in production.
+
+    DATABASE_URL=postgres://shop:secret@db:5432/shop?sslmode=require
+    DATABASE_URL=sqlite:////var/lib/shop/db.sqlite3
+    (unset)                                   # SQLite at BASE_DIR/db3.sqlite3
+
+PostgreSQL keeps each worker's connection open between requests for
+``DB_CONN_MAX_AGE`` seconds, checking it is still alive before reuse so a
+restarted server or dropped connection costs a reconnect, not a failed
+request. ``DB_POOL_SIZE`` > 0 uses psycopg 3's connection pool instead
+(Django's ``pool`` option; needs ``psycopg[pool]``). Query parameters in
+the URL become connection options.
+
+SQLite is tuned for a web server's many short transactions:
+
+* WAL journal: readers never block the writer or each other
+* ``synchronous=NORMAL``: no fsync per commit (a power cut can lose the
+  last commits, never corrupt the file)
+* ``BEGIN IMMEDIATE``: a transaction takes the write lock when it starts,
+  so two transactions that read and then write wait for each other
+  instead of one failing with "database is locked"
+* a 20 second busy timeout, so writers queue rather than error
+
+Writes are still serialized; ``manage.py bench_db_writes`` measures how
+much that costs against PostgreSQL.
+"""
+from urllib.parse import parse_qsl, unquote, urlsplit
+
+from django.core.exceptions import ImproperlyConfigured
+
+SQLITE_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-20000",  # 20 MB page cache per connection
+    "PRAGMA mmap_size=134217728",  # Read through a 128 MB memory map
+)
+SQLITE_BUSY_TIMEOUT = 20
+POSTGRES_SCHEMES = ("postgres", "postgresql", "pgsql")
+
+
+def sqlite_config(path, tuned=True):
+    config = {'ENGINE': 'django.db.backends.sqlite3', 'NAME': path}
+    if tuned:
+        config['OPTIONS'] = {
+            'init_command': ";".join(SQLITE_PRAGMAS),
+            'transaction_mode': 'IMMEDIATE',
+            'timeout': SQLITE_BUSY_TIMEOUT,
+        }
+    return config
+
+
+def postgres_config(parts, conn_max_age=60, pool_size=0):
+    options = dict(parse_qsl(parts.query))
+    config = {
+        'ENGINE': 'django.db.backends.postgresql',
+        'NAME': unquote(parts.path.lstrip('/')),
+        'USER': unquote(parts.username or ''),
+        'PASSWORD': unquote(parts.password or ''),
+        'HOST': parts.hostname or '',
+        'PORT': str(parts.port or ''),
+        'CONN_HEALTH_CHECKS': True,
+    }
+    if pool_size:
+        # The pool hands out and health-checks connections itself; Django requires CONN_MAX_AGE = 0 with it
+        options['pool'] = {'min_size': min(2, pool_size), 'max_size': pool_size, 'timeout': 10}
+        config['CONN_MAX_AGE'] = 0
+    else:
+        config['CONN_MAX_AGE'] = conn_max_age
+    if options:
+        config['OPTIONS'] = options
+    return config
+
+
+def database_config(url, sqlite_path, conn_max_age=60, pool_size=0):
+    """The DATABASES entry for `url` (a DATABASE_URL), or tuned SQLite at `sqlite_path` if empty"""
+    if not url:
+        return sqlite_config(sqlite_path)
+    parts = urlsplit(url)
+    if parts.scheme == 'sqlite':
+        # sqlite:///relative.db, sqlite:////absolute/path.db
+        return sqlite_config(parts.path[1:] or sqlite_path)
+    if parts.scheme in POSTGRES_SCHEMES:
+        return postgres_config(parts, conn_max_age, pool_size)
+    raise ImproperlyConfigured(f"Unsupported DATABASE_URL scheme {parts.scheme!r}: use postgres:// or sqlite://")
@@ -0,0 +1,15 @@
+"""Media serving for development, with the cache policy a CDN would apply"""
+from django.conf import settings
+from django.views.static import serve
+
+from products.images import DERIVED_DIR
+
+IMMUTABLE = "public, max-age=31536000, immutable"
+
+
+def serve_media(request, path):
+    response = serve(request, path, document_root=settings.MEDIA_ROOT)
+    if path.startswith(DERIVED_DIR + "/"):
+        # Content-hashed names: the bytes behind a URL never change
+        response["Cache-Control"] = IMMUTABLE
+    return response
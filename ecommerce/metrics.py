@@ -0,0 +1,248 @@
+"""Per-route request metrics, served at ``/metrics`` in Prometheus text format.
+
+``MetricsMiddleware`` times every request and records, per route (the
+URL name, e.g. ``product-list``), method and status:
+
+* ``http_request_duration_seconds``: time to build the response
+* ``http_request_db_queries`` / ``http_request_db_seconds``: queries run
+  and time spent in them, counted by an execute wrapper on every
+  database connection
+* ``http_response_size_bytes``: body size (streaming responses excluded)
+
+The cache region counters from ``ecommerce.cache.cache_metrics()`` are
+exported alongside. With ``METRICS_QUERY_HEADER`` on, every response also
+carries its query count in ``X-DB-Queries`` (``bench_api`` reads it).
+
+Requests slower than ``SLOW_REQUEST_MS`` are logged to the
+``ecommerce.requests`` logger as one ``key=value`` line, with the same
+fields in the record's ``extra``.
+
+Metrics are kept per process, like the cache counters: with several
+workers, scrape each one (or aggregate in Prometheus).
+"""
+import bisect
+import contextvars
+import hmac
+import logging
+import threading
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.http import HttpResponse, HttpResponseForbidden
+
+from .cache import cache_metrics
+
+logger = logging.getLogger("ecommerce.requests")
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576)
+
+
+class Histogram:
+    def __init__(self, name, help, buckets, labels):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(buckets)
+        self.labels = labels
+        self._series = {}  # label values -> [count per bucket..., +Inf count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [0] * (len(self.buckets) + 2)
+            series[index] += 1
+            series[-1] += value
+
+    def clear(self):
+        with self._lock:
+            self._series.clear()
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = sorted((labels, list(values)) for labels, values in self._series.items())
+        for label_values, values in series:
+            labels = ",".join(f'{name}="{_escape(value)}"' for name, value in zip(self.labels, label_values))
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), values):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f"{self.name}_sum{{{labels}}} {_number(values[-1])}")
+            lines.append(f"{self.name}_count{{{labels}}} {cumulative}")
+        return lines
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+ROUTE_LABELS = ("route", "method", "status")
+
+REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds", "Time to build the response.", DURATION_BUCKETS, ROUTE_LABELS,
+)
+DB_QUERIES = Histogram("http_request_db_queries", "Database queries per request.", QUERY_BUCKETS, ROUTE_LABELS)
+DB_TIME = Histogram(
+    "http_request_db_seconds", "Time per request spent in database queries.", DURATION_BUCKETS, ROUTE_LABELS,
+)
+RESPONSE_SIZE = Histogram(
+    "http_response_size_bytes", "Response body size (non-streaming responses).", SIZE_BUCKETS, ROUTE_LABELS,
+)
+HISTOGRAMS = (REQUEST_DURATION, DB_QUERIES, DB_TIME, RESPONSE_SIZE)
+
+
+def clear():
+    """Forget every recorded request (the cache counters are left alone)"""
+    for histogram in HISTOGRAMS:
+        histogram.clear()
+
+
+def render():
+    """Everything recorded so far, in Prometheus text exposition format"""
+    lines = []
+    for histogram in HISTOGRAMS:
+        lines.extend(histogram.render())
+
+    regions = cache_metrics()
+    evictions = regions.pop("_lru", {}).get("evictions", 0)
+    lines += ["# HELP cache_region_events_total Cache region lookups, sets and computations.",
+              "# TYPE cache_region_events_total counter"]
+    for name, stats in regions.items():
+        for event, count in sorted(stats.items()):
+            if event != "hit_ratio":
+                lines.append(f'cache_region_events_total{{region="{_escape(name)}",event="{event}"}} {count}')
+    lines += ["# HELP cache_lru_evictions_total Entries evicted from in-process LRU caches.",
+              "# TYPE cache_lru_evictions_total counter",
+              f"cache_lru_evictions_total {evictions}"]
+    return "\n".join(lines) + "\n"
+
+
+class RequestStats:
+    __slots__ = ("queries", "db_time")
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+
+
+# The request being served in this thread or task; sync_to_async copies the context, so
+# queries run from async views count towards their request too
+_current = contextvars.ContextVar("request_stats", default=None)
+
+
+def _count_query(execute, sql, params, many, context):
+    stats = _current.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.queries += 1
+        stats.db_time += time.perf_counter() - start
+
+
+def _install(connection, **kwargs):
+    if _count_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_count_query)
+
+
+def install_query_counter():
+    """Count queries on every connection: those opened from now on and those already open"""
+    connection_created.connect(lambda sender, connection, **kwargs: _install(connection), weak=False,
+                               dispatch_uid="ecommerce.metrics")
+    for connection in connections.all(initialized_only=True):
+        _install(connection)
+
+
+def route_of(request):
+    match = getattr(request, "resolver_match", None)
+    return match.view_name if match is not None else "unmatched"
+
+
+def observe(request, response, duration, stats):
+    route = route_of(request)
+    if route == "metrics":
+        return
+    if getattr(settings, "METRICS_QUERY_HEADER", False):
+        response["X-DB-Queries"] = str(stats.queries)
+    labels = (route, request.method, str(response.status_code))
+    REQUEST_DURATION.observe(duration, *labels)
+    DB_QUERIES.observe(stats.queries, *labels)
+    DB_TIME.observe(stats.db_time, *labels)
+    size = None if response.streaming else len(response.content)
+    if size is not None:
+        RESPONSE_SIZE.observe(size, *labels)
+
+    if duration * 1000 >= getattr(settings, "SLOW_REQUEST_MS", 1000):
+        fields = {
+            "method": request.method,
+            "path": request.path,
+            "route": route,
+            "status": response.status_code,
+            "duration_ms": round(duration * 1000),
+            "queries": stats.queries,
+            "db_ms": round(stats.db_time * 1000),
+            "bytes": size,
+        }
+        logger.warning(
+            "slow_request %s", " ".join(f"{key}={value}" for key, value in fields.items()), extra=fields,
+        )
+
+
+class MetricsMiddleware:
+    """Records every request's latency, queries and response size; list it first in MIDDLEWARE"""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+        install_query_counter()
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        stats = RequestStats()
+        token = _current.set(stats)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        observe(request, response, time.perf_counter() - start, stats)
+        return response
+
+    async def __acall__(self, request):
+        stats = RequestStats()
+        token = _current.set(stats)
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        observe(request, response, time.perf_counter() - start, stats)
+        return response
+
+
+def metrics_view(request):
+    """Prometheus scrape target: for METRICS_ALLOWED_ADDRESSES, or with ``Authorization: Bearer $METRICS_TOKEN``"""
+    token = getattr(settings, "METRICS_TOKEN", "")
+    supplied = request.headers.get("Authorization", "").removeprefix("Bearer ")
+    allowed = getattr(settings, "METRICS_ALLOWED_ADDRESSES", ())
+    if not (token and hmac.compare_digest(supplied, token)) and request.META.get("REMOTE_ADDR") not in allowed:
+        return HttpResponseForbidden()
+    return HttpResponse(render(), content_type=CONTENT_TYPE)
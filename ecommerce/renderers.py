@@ -0,0 +1,62 @@
+"""JSON rendering shared by the DRF views and the plain-Django async views"""
+import math
+
+from rest_framework.renderers import JSONRenderer
+
+try:
+    import orjson
+except ImportError:  # Optional: without it FastJSONRenderer is DRF's JSONRenderer
+    orjson = None
+
+# orjson writes these two as raw UTF-8; DRF escapes them for JavaScript-embedded JSON
+_LINE_SEPARATORS = ((b'\xe2\x80\xa8', b'\\u2028'), (b'\xe2\x80\xa9', b'\\u2029'))
+
+
+def _has_non_finite(data):
+    """Whether the dicts, lists and tuples in `data` hold a NaN or infinite float"""
+    stack = [data]
+    while stack:
+        value = stack.pop()
+        if isinstance(value, float):
+            if not math.isfinite(value):
+                return True
+        elif isinstance(value, dict):
+            stack.extend(value.values())
+        elif isinstance(value, (list, tuple)):
+            stack.extend(value)
+    return False
+
+
+class FastJSONRenderer(JSONRenderer):
+    """JSONRenderer's exact bytes, encoded by orjson when it is installed.
+
+    Dates, Decimals, lazy strings and the like still go through DRF's
+    encoder, so they render as before. Requests for indented output,
+    non-default UNICODE_JSON/COMPACT_JSON settings and anything orjson
+    refuses (non-string keys, huge ints) fall back to the stdlib encoder.
+    So do NaN and infinite floats, which orjson writes as null: DRF raises
+    for them under STRICT_JSON and writes them as JavaScript otherwise.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if (orjson is None or self.ensure_ascii or not self.compact
+                or self.get_indent(accepted_media_type, renderer_context or {}) is not None):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        try:
+            ret = orjson.dumps(
+                data,
+                default=self.encoder_class().default,
+                option=orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS,
+            )
+        except TypeError:
+            return super().render(data, accepted_media_type, renderer_context)
+        if b'null' in ret and _has_non_finite(data):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        for raw, escaped in _LINE_SEPARATORS:
+            if raw in ret:
+                ret = ret.replace(raw, escaped)
+        return ret
@@ -0,0 +1,139 @@
+"""Read-only fast path for list endpoints: serializer output from ``.values()`` rows.
+
+``RowSerializer`` compiles a DRF serializer's fields once into per-field
+extractors over ``.values()`` dicts, so listing N rows costs N dict
+builds instead of N model instances walked through every field's
+``get_attribute``/``to_representation``::
+
+    rows = RowSerializer(ProductSerializer(context=context), overrides={
+        'image': Column('image', fn=lambda name: ...),
+    })
+    data = rows.many(queryset.values(*rows.columns))
+
+The output is the serializer's own: same keys, same order, same values.
+Plain model fields and nested (non-many) serializers compile
+automatically; method fields and many=True relations need an override.
+"""
+import decimal
+from operator import itemgetter
+
+from django.core.exceptions import FieldDoesNotExist, ImproperlyConfigured
+from django.core.files.storage import default_storage
+from rest_framework import relations, serializers
+from rest_framework.settings import api_settings
+
+# Fields whose to_representation returns a database value unchanged
+PASSTHROUGH_FIELDS = (
+    serializers.BooleanField, serializers.CharField, serializers.ChoiceField, serializers.IntegerField,
+    serializers.JSONField, serializers.ReadOnlyField, relations.PrimaryKeyRelatedField,
+)
+
+
+class Column:
+    """Override for one field: ``fn(*values)`` of the named ``.values()`` columns"""
+
+    def __init__(self, *columns, fn):
+        self.columns = columns
+        self.fn = fn
+
+
+class RowSerializer:
+    def __init__(self, serializer, overrides=None, prefix=''):
+        overrides = overrides or {}
+        self.columns = []
+        self.extractors = []
+        for name, field in serializer.fields.items():
+            if field.write_only:
+                continue
+            if name in overrides:
+                extract = self._compile_override(overrides[name], prefix)
+            else:
+                extract = self._compile_field(serializer, name, field, prefix)
+            self.extractors.append((name, extract))
+
+    def _use(self, column):
+        if column not in self.columns:
+            self.columns.append(column)
+        return column
+
+    def _compile_override(self, override, prefix):
+        columns = [self._use(prefix + column) for column in override.columns]
+        fn = override.fn
+        if len(columns) == 1:
+            column = columns[0]
+            return lambda row: fn(row[column])
+        return lambda row: fn(*[row[column] for column in columns])
+
+    def _compile_field(self, serializer, name, field, prefix):
+        if field.source == '*' or isinstance(field, (serializers.SerializerMethodField, serializers.ListSerializer)):
+            raise ImproperlyConfigured(
+                f"{type(serializer).__name__}.{name} needs a Column override for the RowSerializer fast path"
+            )
+        source = prefix + field.source.replace('.', '__')
+
+        if isinstance(field, serializers.BaseSerializer):
+            nested = RowSerializer(field, prefix=source + '__')
+            columns = [self._use(column) for column in nested.columns]
+
+            def extract(row):
+                # A null foreign key renders as None, like the serializer's None check
+                if all(row[column] is None for column in columns):
+                    return None
+                return nested.to_representation(row)
+            return extract
+
+        column = self._use(source)
+        if isinstance(field, PASSTHROUGH_FIELDS):
+            return itemgetter(column)
+        if isinstance(field, serializers.FileField):
+            convert = self._file_url(serializer, field)
+        elif isinstance(field, serializers.DecimalField):
+            convert = self._decimal_string(field)
+        else:
+            convert = field.to_representation
+
+        def extract(row):
+            value = row[column]
+            return None if value is None else convert(value)
+        return extract
+
+    @staticmethod
+    def _decimal_string(field):
+        """DecimalField.to_representation with the quantize exponent and context built once"""
+        coerce_to_string = getattr(field, 'coerce_to_string', api_settings.COERCE_DECIMAL_TO_STRING)
+        if field.decimal_places is None or field.localize or not coerce_to_string or field.normalize_output:
+            return field.to_representation
+        exponent = decimal.Decimal('.1') ** field.decimal_places
+        context = decimal.getcontext().copy()
+        if field.max_digits is not None:
+            context.prec = field.max_digits
+        rounding = field.rounding
+
+        def convert(value):
+            if not isinstance(value, decimal.Decimal):
+                return field.to_representation(value)
+            return '{:f}'.format(value.quantize(exponent, rounding=rounding, context=context))
+        return convert
+
+    @staticmethod
+    def _file_url(serializer, field):
+        """FileField.to_representation from the stored name instead of a FieldFile"""
+        try:
+            storage = serializer.Meta.model._meta.get_field(field.source).storage
+        except (AttributeError, FieldDoesNotExist):
+            storage = default_storage
+        request = field.context.get('request')
+
+        def convert(name):
+            if not name:
+                return None
+            url = storage.url(name)
+            return request.build_absolute_uri(url) if request is not None else url
+        return convert
+
+    def to_representation(self, row):
+        return {name: extract(row) for name, extract in self.extractors}
+
+    def many(self, rows):
+        to_representation = self.to_representation
+        return [to_representation(row) for row in rows]
@@ -0,0 +1,20 @@
+"""Shared helpers for the apps' test suites"""
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+
+class QueryCountMixin:
+    """Check that an endpoint's query count does not grow with the number of rows"""
+
+    def assertConstantQueries(self, call, grow, expected):
+        """Run `call`, add rows with `grow`, run `call` again; both must cost `expected` queries"""
+        with CaptureQueriesContext(connection) as small:
+            call()
+        grow()
+        with CaptureQueriesContext(connection) as large:
+            response = call()
+
+        sql = "\n".join(q["sql"] for q in large.captured_queries)
+        self.assertEqual(len(small), len(large), f"Query count grew with row count:\n{sql}")
+        self.assertEqual(len(large), expected, f"Unexpected query count:\n{sql}")
+        return response
@@ -0,0 +1,262 @@
+import datetime
+import threading
+import time
+import uuid
+from decimal import Decimal
+from unittest import mock
+
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils.translation import gettext_lazy
+from rest_framework.renderers import JSONRenderer
+
+from products.models import Product
+
+from . import metrics
+from .cache import CacheRegion
+from .database import database_config
+from .renderers import FastJSONRenderer
+from .streaming import negotiate_encoding
+from .cache.backends import LRUCache
+from .cache.resp import LocalRespServer
+
+
+class LRUCacheTests(SimpleTestCase):
+    def test_evicts_least_recently_used(self):
+        cache = LRUCache('lru-test', {'OPTIONS': {'MAX_ENTRIES': 3}})
+        cache.clear()
+        for key in 'abc':
+            cache.set(key, key)
+        cache.get('a')  # "b" is now the least recently used
+        cache.set('d', 'd')
+        self.assertEqual(sorted(k for k in 'abcd' if cache.has_key(k)), ['a', 'c', 'd'])
+
+
+class RespCacheTests(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = LocalRespServer().start()
+        cls.settings = override_settings(CACHES={
+            'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+            'resp': {'BACKEND': 'ecommerce.cache.backends.RespCache', 'LOCATION': cls.server.url},
+            'resp-sessions': {'BACKEND': 'ecommerce.cache.backends.RespCache', 'LOCATION': cls.server.url,
+                              'KEY_PREFIX': 'session'},
+        })
+        cls.settings.enable()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.settings.disable()
+        cls.server.stop()
+        super().tearDownClass()
+
+    def setUp(self):
+        self.cache = caches['resp']
+        self.cache.clear()
+
+    def test_round_trip(self):
+        self.cache.set('product', {'id': 1, 'price': '10.00'})
+        self.assertEqual(self.cache.get('product'), {'id': 1, 'price': '10.00'})
+        self.assertIsNone(self.cache.get('missing'))
+        self.assertEqual(self.cache.get_many(['product', 'missing']), {'product': {'id': 1, 'price': '10.00'}})
+        self.assertTrue(self.cache.delete('product'))
+        self.assertFalse(self.cache.has_key('product'))
+
+    def test_add_incr_and_expiry(self):
+        self.assertTrue(self.cache.add('version', 1))
+        self.assertFalse(self.cache.add('version', 5))
+        self.assertEqual(self.cache.incr('version'), 2)
+        with self.assertRaises(ValueError):
+            self.cache.incr('nope')
+        self.assertFalse(self.cache.has_key('nope'))
+
+        # Incrementing keeps the key's expiry
+        self.cache.set('hits', 1, timeout=60)
+        self.assertEqual(self.cache.incr('hits', 5), 6)
+        self.assertGreater(self.cache._execute('PTTL', self.cache.make_key('hits')), 0)
+
+        self.cache.set('short', 'lived', timeout=0.05)
+        time.sleep(0.1)
+        self.assertIsNone(self.cache.get('short'))
+
+    def test_clear_keeps_other_aliases(self):
+        sessions = caches['resp-sessions']
+        self.cache.set('product', 1)
+        sessions.set('product', 2)
+        self.cache.clear()
+        self.assertIsNone(self.cache.get('product'))
+        self.assertEqual(sessions.get('product'), 2)
+        sessions.clear()
+        self.assertFalse(sessions.has_key('product'))
+
+    def test_region_over_resp(self):
+        carts = CacheRegion('carts', alias='resp', timeout=60)
+        self.assertEqual(carts.get_or_set('user:1', lambda: {'count': 2}), {'count': 2})
+        self.assertEqual(carts.get('user:1'), {'count': 2})
+        self.assertEqual(carts.metrics()['computes'], 1)
+
+
+class SingleFlightTests(SimpleTestCase):
+    def test_concurrent_misses_compute_once(self):
+        catalog = CacheRegion('single-flight-test', timeout=60)
+        catalog.cache.clear()
+        calls = []
+        start = threading.Barrier(10)
+
+        def compute():
+            calls.append(1)
+            time.sleep(0.05)
+            return 'page'
+
+        def worker():
+            start.wait()
+            self.assertEqual(catalog.get_or_set('page:1', compute), 'page')
+
+        threads = [threading.Thread(target=worker) for _ in range(10)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(catalog.metrics()['coalesced'], 9)
+
+
+class FastJSONRendererTests(SimpleTestCase):
+    def assertSameBytes(self, data, accepted_media_type=None):
+        self.assertEqual(
+            FastJSONRenderer().render(data, accepted_media_type),
+            JSONRenderer().render(data, accepted_media_type),
+        )
+
+    def test_matches_drf_byte_for_byte(self):
+        self.assertSameBytes({
+            "text": "Line\u2028sep\u2029 \"quoted\" \\ tab\t ctrl\x01 ✓ 🚀",
+            "numbers": [0, -1, 2 ** 62, 1.5, True, None],
+            "decimal": Decimal("12.50"),
+            "when": datetime.datetime(2024, 5, 1, 12, 30, 15, 123456, tzinfo=datetime.timezone.utc),
+            "day": datetime.date(2024, 5, 1),
+            "uuid": uuid.UUID(int=1),
+            "lazy": gettext_lazy("Pending"),
+            "nested": {"tuple": (1, 2), "empty": {}},
+        })
+
+    def test_falls_back_where_orjson_differs(self):
+        self.assertSameBytes({1: "int key"})
+        self.assertSameBytes({"big": 2 ** 70})
+        self.assertSameBytes({"a": [1]}, "application/json; indent=4")
+        self.assertEqual(FastJSONRenderer().render(None), b"")
+
+    def test_non_finite_floats_follow_strict_json(self):
+        for value in (float("nan"), float("inf"), -float("inf")):
+            with self.assertRaises(ValueError):
+                FastJSONRenderer().render({"nested": [None, value]})
+        with mock.patch.object(JSONRenderer, "strict", False):
+            self.assertSameBytes({"nested": [None, float("nan"), float("inf")]})
+
+
+class NegotiateEncodingTests(SimpleTestCase):
+    def test_negotiation(self):
+        self.assertEqual(negotiate_encoding("gzip, deflate"), "gzip")
+        self.assertEqual(negotiate_encoding("*"), negotiate_encoding("br, gzip"))
+        self.assertIsNone(negotiate_encoding(""))
+        self.assertIsNone(negotiate_encoding("gzip;q=0, identity"))
+        self.assertIsNone(negotiate_encoding("deflate"))
+
+
+class MetricsTests(TestCase):
+    def setUp(self):
+        metrics.clear()
+        caches["default"].clear()
+        Product.objects.create(name="Smart TV", price=30000, stock=5, category="Entertainment")
+
+    def scrape(self, **extra):
+        response = self.client.get("/metrics", **extra)
+        self.assertEqual(response.status_code, 200)
+        return response.content.decode()
+
+    def test_records_latency_queries_and_size_per_route(self):
+        self.client.get("/api/products/")
+        self.client.get("/api/products/")
+        body = self.scrape()
+
+        labels = 'route="product-list",method="GET",status="200"'
+        self.assertIn(f"http_request_duration_seconds_count{{{labels}}} 2", body)
+        self.assertIn(f'http_request_duration_seconds_bucket{{{labels},le="+Inf"}} 2', body)
+        self.assertRegex(body, rf"http_request_db_queries_sum{{{labels}}} [1-9]")
+        self.assertIn(f"http_response_size_bytes_count{{{labels}}} 2", body)
+        self.assertIn("# TYPE cache_region_events_total counter", body)
+        self.assertNotIn('route="metrics"', body)
+
+    def test_counts_queries_of_async_views(self):
+        self.client.get("/api/async/products/")
+        self.assertRegex(
+            self.scrape(), r'http_request_db_queries_sum{route="async-product-list",method="GET",status="200"} [1-9]',
+        )
+
+    @override_settings(METRICS_QUERY_HEADER=True)
+    def test_query_count_header(self):
+        response = self.client.get("/api/products/")
+        self.assertEqual(response["X-DB-Queries"], "2")  # Catalog version, then the page
+        self.assertEqual(self.client.get("/api/products/")["X-DB-Queries"], "0")
+
+    @override_settings(SLOW_REQUEST_MS=0)
+    def test_logs_slow_requests(self):
+        with self.assertLogs("ecommerce.requests", "WARNING") as logs:
+            self.client.get("/api/products/")
+        self.assertIn("route=product-list status=200", logs.output[0])
+        self.assertEqual(logs.records[0].route, "product-list")
+
+    @override_settings(METRICS_TOKEN="s3cret")
+    def test_remote_scrapes_need_the_token(self):
+        self.assertEqual(self.client.get("/metrics", REMOTE_ADDR="10.0.0.5").status_code, 403)
+        self.scrape(REMOTE_ADDR="10.0.0.5", HTTP_AUTHORIZATION="Bearer s3cret")
+
+    @override_settings(METRICS_TOKEN="s3cret", METRICS_ALLOWED_ADDRESSES=[])
+    def test_loopback_needs_the_token_unless_allowed(self):
+        # e.g. in production, where a reverse proxy on the same host forwards every request from 127.0.0.1
+        self.assertEqual(self.client.get("/metrics", REMOTE_ADDR="127.0.0.1").status_code, 403)
+        self.scrape(REMOTE_ADDR="127.0.0.1", HTTP_AUTHORIZATION="Bearer s3cret")
+        with override_settings(METRICS_TOKEN=""):
+            self.assertEqual(self.client.get("/metrics", HTTP_AUTHORIZATION="Bearer ").status_code, 403)
+
+
+class DatabaseConfigTests(SimpleTestCase):
+    def test_sqlite_by_default_tuned_for_concurrency(self):
+        config = database_config("", sqlite_path="/srv/db.sqlite3")
+        self.assertEqual(config["NAME"], "/srv/db.sqlite3")
+        self.assertEqual(config["OPTIONS"]["transaction_mode"], "IMMEDIATE")
+        self.assertIn("PRAGMA journal_mode=WAL", config["OPTIONS"]["init_command"])
+        self.assertEqual(database_config("sqlite:////tmp/x.db", sqlite_path="unused")["NAME"], "/tmp/x.db")
+
+    def test_postgres_with_persistent_connections(self):
+        config = database_config("postgres://shop:p%40ss@db:6432/shop?sslmode=require", sqlite_path="unused")
+        self.assertEqual(config["ENGINE"], "django.db.backends.postgresql")
+        self.assertEqual(
+            (config["NAME"], config["USER"], config["PASSWORD"], config["HOST"], config["PORT"]),
+            ("shop", "shop", "p@ss", "db", "6432"),
+        )
+        self.assertEqual(config["CONN_MAX_AGE"], 60)
+        self.assertTrue(config["CONN_HEALTH_CHECKS"])
+        self.assertEqual(config["OPTIONS"], {"sslmode": "require"})
+
+    def test_postgres_pool(self):
+        config = database_config("postgresql://db/shop", sqlite_path="unused", pool_size=20)
+        self.assertEqual(config["CONN_MAX_AGE"], 0)
+        self.assertEqual(config["OPTIONS"]["pool"]["max_size"], 20)
+
+    def test_unknown_scheme(self):
+        with self.assertRaises(ImproperlyConfigured):
+            database_config("mysql://db/shop", sqlite_path="unused")
+
+
+class SqlitePragmaTests(TestCase):
+    def test_connections_run_the_tuning_pragmas(self):
+        if connection.vendor != "sqlite":
+            self.skipTest("SQLite profile only")
+        with connection.cursor() as cursor:
+            cursor.execute("PRAGMA synchronous")
+            self.assertEqual(cursor.fetchone()[0], 1)  # NORMAL
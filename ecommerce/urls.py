@@ -2,27 +2,36 @@ from django.conf import settings  # Import settings
 from django.contrib import admin
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
+from rest_framework_simplejwt.views import TokenRefreshView
+from accounts.views import CartMergingTokenObtainPairView
 from django.conf.urls.static import static
+from ecommerce.media import serve_media
+from ecommerce.metrics import metrics_view
 from cart import views
 from cart.views import CartViewSet, CartListView, CartView
 from products.views import ProductViewSet  
 from order.views import OrderViewSet
+from reports.views import ReportViewSet
 from cart.views import CartView
+from cart import async_views as cart_async
+from order import async_views as order_async
+from products import async_views as products_async
 
 # ✅ Define Router
 router = DefaultRouter()
 router.register(r'products', ProductViewSet, basename='product')
 router.register(r'cart', CartViewSet, basename='cart')
 router.register(r'order', OrderViewSet, basename='order')
+router.register(r'reports', ReportViewSet, basename='report')
 
 urlpatterns = [
     path('api/', include(router.urls)),
     path('admin/', admin.site.urls),
+    path('metrics', metrics_view, name='metrics'),  # Prometheus scrape target
     path('', include(router.urls)),
 
     # 🔥 AUTHENTICATION ENDPOINTS
-    path('api/token/', TokenObtainPairView.as_view(), name='token_obtain_pair'),  # Login
+    path('api/token/', CartMergingTokenObtainPairView.as_view(), name='token_obtain_pair'),  # Login (merges the guest cart)
     path('api/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),  # Refresh Token
 
     path("api/", include("accounts.urls")),  # Include accounts URLs
@@ -30,6 +39,14 @@ urlpatterns = [
     # 🔥 PRODUCT ENDPOINTS (Handled by router)
     path('api/', include('products.urls')),  # ✅ Include the new route 
 
+    # ⚡ ASYNC READ ENDPOINTS (same responses as their DRF counterparts; best served under ASGI)
+    path('api/async/products/', products_async.product_list, name='async-product-list'),
+    path('api/async/products/<int:pk>/', products_async.product_detail, name='async-product-detail'),
+    path('api/async/order/<int:pk>/track/', order_async.track, name='async-order-track'),
+    path('api/async/order/events/', order_async.events, name='async-order-events'),
+    path('api/async/order/events/ticket/', order_async.events_ticket, name='async-order-events-ticket'),
+    path('api/async/cart/summary/', cart_async.summary, name='async-cart-summary'),
+
     # 🔥 CART & ORDERS ENDPOINTS
     path('cart/', CartListView.as_view(), name='cart-list'),
     path('cart/<int:pk>/update-quantity/', CartViewSet.as_view({'patch': 'update_quantity'}), name='update-quantity'),
@@ -46,4 +63,5 @@ urlpatterns = [
 ]
 # ✅ Serve media files in development
 if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
\ No newline at end of file
+    # Derivatives get an immutable Cache-Control header; in production the CDN/web server serves media
+    urlpatterns += static(settings.MEDIA_URL, view=serve_media)
\ No newline at end of file
@@ -11,7 +11,7 @@ function App() {
 
   useEffect(() => {
     axios.get("http://127.0.0.1:8000/api/products/")
-      .then((res) => setProducts(res.data))
+      .then((res) => setProducts(res.data.results))
       .catch((err) => console.error("Error fetching data:", err));
   }, []);
 
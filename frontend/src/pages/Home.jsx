@@ -1,11 +1,15 @@
 import React, { useEffect, useState } from "react";
 import { Link, useNavigate } from "react-router-dom";
 import { loginUser } from "../services/authService";
-import { fetchCart } from "../services/cartService";
+import { fetchCartSummary } from "../services/cartService";
+import { getProducts } from "../services/productService";
 import { registerUser } from "../services/api";
 import api from "../services/api"; // Adjust the path based on your project structure
 import "./Home.css";
 
+// Grid is 1/2/3/4 columns at the sm/md/lg breakpoints
+const GRID_IMAGE_SIZES = "(min-width: 1024px) 25vw, (min-width: 768px) 33vw, (min-width: 640px) 50vw, 100vw";
+
 const Home = () => {
   const BASE_MEDIA_URL = "http://127.0.0.1:8000"; 
   const navigate = useNavigate();
@@ -37,8 +41,7 @@ const Home = () => {
   useEffect(() => {
     console.log("🛒 Products Data:", products); // Log only when products update
 
-    fetch("http://127.0.0.1:8000/api/products/")
-      .then((response) => response.json())
+    getProducts()
       .then((data) => {
         const updatedData = data.map((product) => ({
           ...product,
@@ -57,6 +60,13 @@ const Home = () => {
 
 }, []);
 
+  // ✅ Cart badge count from the totals endpoint
+  useEffect(() => {
+    if (isLoggedIn) {
+      fetchCartSummary().then((summary) => setCartCount(summary.item_count));
+    }
+  }, [isLoggedIn]);
+
 const handleAdd = async (product) => {
   if (isAdding) return; // Prevent multiple clicks
 
@@ -79,9 +89,14 @@ const handleAdd = async (product) => {
 
       console.log("✅ Item added to cart:", response.data);
 
-      // ✅ Instead of manually updating state, fetch the latest cart from backend
-      const updatedCart = await fetchCart();
-      setCart(updatedCart);
+      setCart((prevCart) => ({
+          ...prevCart,
+          [product.id]: { quantity: (prevCart[product.id]?.quantity || 0) + 1 },
+      }));
+
+      // ✅ The badge only needs the totals, not the whole cart
+      const summary = await fetchCartSummary();
+      setCartCount(summary.item_count);
 
       alert("✅ Item added to cart!");
   } catch (error) {
@@ -129,6 +144,8 @@ const handleRemove = async (productId) => {
           delete newCart[productId]; // Completely remove from state
           return newCart;
       });
+      const summary = await fetchCartSummary();
+      setCartCount(summary.item_count);
   } catch (error) {
       console.error("🚨 Error removing item:", error);
   } finally {
@@ -313,9 +330,9 @@ useEffect(() => {
           className="relative flex items-center space-x-2 text-white hover:underline"
         >
           <span className="text-white text-2xl">🛒 Cart</span>
-          {Object.values(cart).reduce((total, qty) => total + qty, 0) > 0 && (
+          {cartCount > 0 && (
             <span className="absolute -top-2 -right-4 bg-red-500 text-white px-2 py-1 text-xs font-bold rounded-full">
-              {Object.values(cart).reduce((total, qty) => total + qty, 0)}
+              {cartCount}
             </span>
           )}
         </Link>
@@ -404,11 +421,20 @@ useEffect(() => {
                   >
                     {/* 🖼️ Image Section */}
                     {product.image ? (
-                      <img
-                        src={product.image}
-                        alt={product.name}
-                        className="w-full h-40 object-cover rounded mb-2"
-                      />
+                      <picture>
+                        {/* ✅ Resized WebP/JPEG copies; the browser picks the smallest that fits */}
+                        {product.image_srcset?.webp && (
+                          <source type="image/webp" srcSet={product.image_srcset.webp} sizes={GRID_IMAGE_SIZES} />
+                        )}
+                        <img
+                          src={product.image}
+                          srcSet={product.image_srcset?.jpeg}
+                          sizes={GRID_IMAGE_SIZES}
+                          alt={product.name}
+                          loading="lazy"
+                          className="w-full h-40 object-cover rounded mb-2"
+                        />
+                      </picture>
                     ) : (
                       <div className="w-full h-40 bg-gray-200 text-black flex items-center justify-center rounded mb-2">
                         🖼️ No Image
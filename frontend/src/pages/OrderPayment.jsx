@@ -1,6 +1,7 @@
 import { useState, useEffect } from "react";
 import axios from "axios";
 import { useNavigate } from "react-router-dom"; 
+import { fetchCartSummary } from "../services/cartService";
 
 const OrderPayment = () => {
   const navigate = useNavigate(); 
@@ -22,28 +23,32 @@ const OrderPayment = () => {
   const [error, setError] = useState(null);
   const [totalCost, setTotalCost] = useState(0);
   const [finalTotal, setFinalTotal] = useState(0);
+  const [heldUntil, setHeldUntil] = useState(null);
 
   useEffect(() => {
     const storedCart = JSON.parse(localStorage.getItem("cart"));
     if (storedCart) {
       setCart(storedCart);
-      calculateTotal(storedCart);
+    }
+    // ✅ Subtotal comes from the server, in one aggregate query
+    fetchCartSummary().then((summary) => setTotalCost(Number(summary.subtotal)));
+
+    // ✅ Hold the cart's stock while the buyer pays; the order uses the hold up
+    const token = localStorage.getItem("authToken");
+    if (token) {
+      axios
+        .post("http://127.0.0.1:8000/cart/api/reservations/", {}, {
+          headers: { Authorization: `Bearer ${token}` },
+        })
+        .then((response) => setHeldUntil(new Date(response.data.expires_at)))
+        .catch((err) => setError(err.response?.data?.error || "Some items are no longer available"));
     }
   }, []);
 
-  useEffect(() => {
-    calculateTotal(cart);
-  }, [cart]);
-
   useEffect(() => {
     setFinalTotal(formData.delivery ? totalCost + 1000 : totalCost);
   }, [formData.delivery, totalCost]);
 
-  const calculateTotal = (cartItems) => {
-    let total = cartItems.reduce((sum, item) => sum + item.product.price * item.quantity, 0);
-    setTotalCost(total);
-  };
-  
   const handleChange = (e) => {
     setFormData({ ...formData, [e.target.name]: e.target.value });
   }
@@ -133,6 +138,11 @@ const OrderPayment = () => {
 
         <h2 className="text-2xl font-semibold mb-4 text-blue-400 text-center">Order Payment</h2>
         {message && <p className="text-green-400 text-center">{message}</p>}
+        {heldUntil && !message && (
+          <p className="text-gray-300 text-center">
+            Your items are reserved until {heldUntil.toLocaleTimeString()}
+          </p>
+        )}
         {error && <p className="text-red-400 text-center">{error}</p>}
 
         {/* Cart Details */}
@@ -3,6 +3,7 @@ import axios from "axios";
 import moment from "moment";
 
 const API_URL = "http://127.0.0.1:8000/cart/api/orders/";
+const EVENTS_URL = "http://127.0.0.1:8000/api/async/order/events/";
 
 const axiosInstance = axios.create({
   baseURL: API_URL,
@@ -34,6 +35,27 @@ const OrderTracking = () => {
     fetchAllOrders();
   }, []);
 
+  // ✅ Status changes are pushed by the server instead of re-fetching orders
+  useEffect(() => {
+    const token = localStorage.getItem("authToken");
+    if (!token) return;
+
+    const source = new EventSource(`${EVENTS_URL}?token=${encodeURIComponent(token)}`);
+    const applyStatuses = (updates) => {
+      const statuses = new Map(updates.map((update) => [update.order_id, update.status]));
+      const apply = (list) =>
+        list.map((order) => (statuses.has(order.id) ? { ...order, status: statuses.get(order.id) } : order));
+      setOrders(apply);
+      setFilteredOrders(apply);
+    };
+
+    // Sent on every (re)connect, so changes missed while disconnected are caught up
+    source.addEventListener("snapshot", (event) => applyStatuses(JSON.parse(event.data)));
+    source.addEventListener("status", (event) => applyStatuses([JSON.parse(event.data)]));
+
+    return () => source.close();
+  }, []);
+
   
   const fetchAllOrders = async () => {
     try {
@@ -86,8 +108,7 @@ const OrderTracking = () => {
   const cancelOrder = async (id) => {
     try {
       await axiosInstance.post(`/${id}/cancel/`);
-      alert("🚫 Order canceled successfully!");
-      fetchAllOrders();
+      alert("🚫 Order canceled successfully!");  // The new status arrives on the event stream
     } catch (error) {
       console.error("Error canceling order", error);
     }
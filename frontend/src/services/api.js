@@ -120,6 +120,16 @@ export const loginUser = async (username, password) => {
 export const logoutUser = () => {
   console.log("🚪 Logging out...");
 
+  // ✅ Revoke both JWTs server-side (they stay valid until expiry otherwise)
+  const token = localStorage.getItem("authToken");
+  if (token) {
+    axios
+      .post(`${API_URL}/logout/`, { refresh: localStorage.getItem("refreshToken") }, {
+        headers: { Authorization: `Bearer ${token}` },
+      })
+      .catch(() => {});
+  }
+
   // ✅ Clear localStorage
   localStorage.removeItem("authToken");
   localStorage.removeItem("refreshToken");
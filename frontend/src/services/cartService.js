@@ -41,6 +41,20 @@ export const fetchCart = async () => {
   }
 };
 
+// Item count, line count and subtotal, without loading the whole cart
+export const fetchCartSummary = async () => {
+  try {
+    const token = localStorage.getItem("authToken");
+    const response = await axios.get(`${API_BASE_URL}api/cart/summary/`, {
+      headers: { Authorization: `Bearer ${token}` },
+    });
+    return response.data;
+  } catch (error) {
+    console.error("🚨 Error fetching cart summary:", error.response?.data || error);
+    return { item_count: 0, line_count: 0, subtotal: "0.00" };
+  }
+};
+
 export const removeItem = async (id) => {
   try {
     const token = localStorage.getItem("token");
@@ -86,4 +100,20 @@ export const updateQuantity = async (id, quantity) => {
     return false;
   }
 };
-  
\ No newline at end of file
+  
+// Apply several changes in one round trip.
+// operations: [{ product_id, quantity }] to set, or [{ product_id, delta }] to adjust
+export const batchUpdateCart = async (operations) => {
+  try {
+    const token = localStorage.getItem("authToken");
+    const response = await axios.post(
+      `${API_BASE_URL}api/cart/batch/`,
+      { operations },
+      { headers: { Authorization: `Bearer ${token}` } }
+    );
+    return response.data.cart;
+  } catch (error) {
+    console.error("🚨 Error updating cart:", error.response?.data || error);
+    return null;
+  }
+};
@@ -2,10 +2,22 @@ import axios from "axios";
 
 const API_URL = "http://127.0.0.1:8000/api/products/";
 
+// Fetch a single page; `url` is a `next`/`previous` link from a previous page
+export const getProductsPage = async (url = `${API_URL}?pagination=cursor&page_size=100`) => {
+  const response = await axios.get(url);
+  return response.data;
+};
+
+// Walk the keyset cursor until the whole catalog is loaded
 export const getProducts = async () => {
   try {
-    const response = await axios.get(API_URL);
-    return response.data;
+    let page = await getProductsPage();
+    const products = [...page.results];
+    while (page.next) {
+      page = await getProductsPage(page.next);
+      products.push(...page.results);
+    }
+    return products;
   } catch (error) {
     console.error("Error fetching products:", error);
     return [];
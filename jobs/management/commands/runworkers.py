@@ -0,0 +1,61 @@
+import multiprocessing
+import signal
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+# Nothing here may import models at module level: spawned children unpickle
+# _worker_process by importing this module before Django is set up.
+
+
+def _worker_process(options):
+    import django
+    django.setup()
+    _run_worker(options)
+
+
+def _run_worker(options):
+    from jobs.worker import Worker
+
+    worker = Worker(poll_interval=options['poll_interval'], lease=options['lease'], prune_after=options['prune_after'])
+    signal.signal(signal.SIGTERM, worker.stop)
+    signal.signal(signal.SIGINT, worker.stop)
+    worker.run(burst=options['burst'], max_jobs=options['max_jobs'])
+    return worker.processed
+
+
+class Command(BaseCommand):
+    help = "Run background job workers"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=1, help="Worker processes to start")
+        parser.add_argument('--poll-interval', type=float, default=1.0, help="Seconds to sleep when idle")
+        parser.add_argument('--lease', type=int, default=300, help="Seconds before a locked job is presumed abandoned")
+        parser.add_argument('--prune-after', type=int, default=7 * 24 * 3600,
+                            help="Seconds to keep done and failed jobs (0 keeps them forever)")
+        parser.add_argument('--burst', action='store_true', help="Exit once no job is ready")
+        parser.add_argument('--max-jobs', type=int, default=None, help="Exit after this many jobs (per process)")
+
+    def handle(self, *args, **options):
+        options = {key: options[key] for key in ('processes', 'poll_interval', 'lease', 'prune_after', 'burst', 'max_jobs')}
+        if options['processes'] <= 1:
+            processed = _run_worker(options)
+            self.stdout.write(f"Processed {processed} job(s)")
+            return
+
+        connections.close_all()  # Don't share DB sockets with the children
+        context = multiprocessing.get_context('spawn')
+        workers = [context.Process(target=_worker_process, args=(options,), daemon=False) for _ in range(options['processes'])]
+        for process in workers:
+            process.start()
+        self.stdout.write(f"Started {len(workers)} worker processes")
+
+        def forward(signum, frame):
+            for process in workers:
+                if process.is_alive():
+                    process.terminate()  # SIGTERM: each worker finishes its current job
+        signal.signal(signal.SIGTERM, forward)
+        signal.signal(signal.SIGINT, forward)
+
+        for process in workers:
+            process.join()
@@ -0,0 +1,93 @@
+"""Database-backed queue operations.
+
+Jobs are rows in jobs_job. A job enqueued inside a transaction is only
+visible to workers once that transaction commits, and disappears with it
+on rollback, so side effects are queued atomically with the data they're
+about. Workers claim a job with a conditional UPDATE on its status, which
+is race-free on every backend (no SKIP LOCKED needed, so SQLite works).
+"""
+import datetime
+
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Job
+
+CLAIM_CANDIDATES = 10  # Ready jobs tried per claim before concluding others won them all
+PRUNE_BATCH = 1000  # Finished jobs deleted per statement, so pruning never holds a long lock
+
+
+def enqueue(task_name, kwargs, priority=0, max_attempts=3, delay=0):
+    return Job.objects.create(
+        task=task_name,
+        kwargs=kwargs,
+        priority=priority,
+        max_attempts=max_attempts,
+        run_at=timezone.now() + datetime.timedelta(seconds=delay),
+    )
+
+
+def claim(worker_name, now=None):
+    """Lock the highest-priority ready job for `worker_name`, or return None"""
+    now = now or timezone.now()
+    ready = (
+        Job.objects.filter(status=Job.QUEUED, run_at__lte=now)
+        .order_by('-priority', 'run_at', 'id')
+        .values_list('id', flat=True)
+    )
+    for job_id in ready[:CLAIM_CANDIDATES]:
+        claimed = Job.objects.filter(id=job_id, status=Job.QUEUED).update(
+            status=Job.RUNNING, locked_by=worker_name, locked_at=now, attempts=F('attempts') + 1,
+        )
+        if claimed:
+            return Job.objects.get(id=job_id)
+    return None
+
+
+def complete(job):
+    Job.objects.filter(id=job.id).update(
+        status=Job.DONE, locked_by='', locked_at=None, finished_at=timezone.now(), last_error='',
+    )
+
+
+def fail(job, error, retry_in):
+    """Put the job back with a delay, or mark it failed once its attempts are used up"""
+    now = timezone.now()
+    if job.attempts < job.max_attempts:
+        changes = {'status': Job.QUEUED, 'run_at': now + datetime.timedelta(seconds=retry_in)}
+    else:
+        changes = {'status': Job.FAILED, 'finished_at': now}
+    Job.objects.filter(id=job.id).update(locked_by='', locked_at=None, last_error=error, **changes)
+
+
+def release_stale(lease, now=None):
+    """Requeue jobs whose worker died mid-run (locked longer than `lease` seconds)"""
+    now = now or timezone.now()
+    stale = Job.objects.filter(status=Job.RUNNING, locked_at__lt=now - datetime.timedelta(seconds=lease))
+    error = "Worker lease expired"
+    failed = stale.filter(attempts__gte=F('max_attempts')).update(
+        status=Job.FAILED, locked_by='', locked_at=None, finished_at=now, last_error=error,
+    )
+    requeued = stale.update(status=Job.QUEUED, locked_by='', locked_at=None, run_at=now, last_error=error)
+    return requeued + failed
+
+
+def queued_between(task_name, start, end):
+    """Whether a job for `task_name` is already queued to run between `start` and `end`"""
+    return Job.objects.filter(task=task_name, status=Job.QUEUED, run_at__range=(start, end)).exists()
+
+
+def prune(older_than, now=None):
+    """Delete done and failed jobs finished more than `older_than` seconds ago; returns how many"""
+    now = now or timezone.now()
+    finished = Job.objects.filter(
+        status__in=[Job.DONE, Job.FAILED], finished_at__lt=now - datetime.timedelta(seconds=older_than),
+    )
+    count = 0
+    while True:
+        ids = list(finished.values_list('id', flat=True)[:PRUNE_BATCH])
+        if ids:
+            Job.objects.filter(id__in=ids).delete()
+        count += len(ids)
+        if len(ids) < PRUNE_BATCH:
+            return count
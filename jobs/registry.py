@@ -0,0 +1,64 @@
+"""Task registration: `@task` turns a function into something workers can run.
+
+    @task(priority=10)
+    def send_receipt(order_id):
+        ...
+
+    send_receipt.enqueue(order_id=order.id)
+
+Arguments are passed as keyword arguments and stored as JSON, so pass ids
+rather than model instances.
+"""
+from django.conf import settings
+from django.db import transaction
+
+from .queue import enqueue
+
+_tasks = {}
+
+
+class UnknownTask(LookupError):
+    pass
+
+
+class Task:
+    def __init__(self, func, name, priority, max_attempts, retry_delay):
+        self.func = func
+        self.name = name
+        self.priority = priority
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay  # Seconds; doubled for each further attempt
+        self.__doc__ = func.__doc__
+
+    def __call__(self, **kwargs):
+        return self.func(**kwargs)
+
+    def enqueue(self, priority=None, delay=0, **kwargs):
+        if settings.JOBS_EAGER:
+            # No workers (local development): run after commit, in this process
+            transaction.on_commit(lambda: self.func(**kwargs))
+            return None
+        return enqueue(
+            self.name, kwargs,
+            priority=self.priority if priority is None else priority,
+            max_attempts=self.max_attempts,
+            delay=delay,
+        )
+
+    def backoff(self, attempts):
+        return self.retry_delay * 2 ** (attempts - 1)
+
+
+def task(name=None, priority=0, max_attempts=3, retry_delay=30):
+    def register(func):
+        task_name = name or f"{func.__module__}.{func.__name__}"
+        _tasks[task_name] = Task(func, task_name, priority, max_attempts, retry_delay)
+        return _tasks[task_name]
+    return register
+
+
+def get_task(name):
+    try:
+        return _tasks[name]
+    except KeyError:
+        raise UnknownTask(name) from None
@@ -0,0 +1,141 @@
+import datetime
+import threading
+
+from django.core.management import call_command
+from django.db import OperationalError, connection, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from . import queue
+from .models import Job
+from .registry import task
+from .worker import Worker, run_pending
+
+calls = []
+
+
+@task(name="jobs.tests.record")
+def record(value):
+    calls.append(value)
+
+
+@task(name="jobs.tests.flaky", max_attempts=2, retry_delay=10)
+def flaky():
+    raise RuntimeError("boom")
+
+
+class QueueTests(TestCase):
+    def setUp(self):
+        calls.clear()
+
+    def test_higher_priority_runs_first(self):
+        record.enqueue(value="low")
+        record.enqueue(value="high", priority=5)
+        record.enqueue(value="default")
+        self.assertEqual(run_pending(), 3)
+        self.assertEqual(calls, ["high", "low", "default"])
+        self.assertEqual(set(Job.objects.values_list("status", flat=True)), {Job.DONE})
+
+    def test_delayed_job_waits(self):
+        record.enqueue(value="later", delay=60)
+        self.assertEqual(run_pending(), 0)
+        self.assertIsNotNone(queue.claim("w", now=timezone.now() + datetime.timedelta(seconds=61)))
+
+    def test_failures_retry_with_backoff_then_fail(self):
+        job = flaky.enqueue()
+        with self.assertLogs("jobs.worker", "ERROR"):
+            run_pending()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.QUEUED, 1))
+        self.assertGreater(job.run_at, timezone.now() + datetime.timedelta(seconds=9))
+        self.assertIn("RuntimeError: boom", job.last_error)
+
+        Job.objects.filter(id=job.id).update(run_at=timezone.now())
+        with self.assertLogs("jobs.worker", "ERROR"):
+            run_pending()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.FAILED, 2))
+
+    def test_unknown_task_fails_without_retry(self):
+        queue.enqueue("jobs.tests.missing", {})
+        with self.assertLogs("jobs.worker", "ERROR"):
+            run_pending()
+        self.assertEqual(Job.objects.get().status, Job.FAILED)
+
+    def test_abandoned_job_is_requeued(self):
+        record.enqueue(value="orphan")
+        job = queue.claim("dead-worker")
+        Job.objects.filter(id=job.id).update(locked_at=timezone.now() - datetime.timedelta(seconds=600))
+
+        self.assertEqual(queue.release_stale(lease=300), 1)
+        self.assertEqual(run_pending(), 1)
+        self.assertEqual(calls, ["orphan"])
+
+    def test_finished_jobs_are_pruned(self):
+        now = timezone.now()
+        long_ago, recently = now - datetime.timedelta(days=8), now - datetime.timedelta(days=1)
+        for status, finished_at in [(Job.DONE, long_ago), (Job.FAILED, long_ago), (Job.DONE, recently),
+                                    (Job.FAILED, recently), (Job.QUEUED, None), (Job.RUNNING, None)]:
+            Job.objects.create(task="jobs.tests.record", status=status, finished_at=finished_at)
+
+        self.assertEqual(queue.prune(older_than=7 * 24 * 3600, now=now), 2)
+        self.assertEqual(sorted(Job.objects.values_list("status", flat=True)),
+                         sorted([Job.DONE, Job.FAILED, Job.QUEUED, Job.RUNNING]))
+
+    def test_rolled_back_enqueue_is_discarded(self):
+        try:
+            with transaction.atomic():
+                record.enqueue(value="never")
+                raise RuntimeError
+        except RuntimeError:
+            pass
+        self.assertFalse(Job.objects.exists())
+
+    @override_settings(JOBS_EAGER=True)
+    def test_eager_mode_runs_after_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertIsNone(record.enqueue(value="now"))
+        self.assertEqual(calls, ["now"])
+        self.assertFalse(Job.objects.exists())
+
+    def test_runworkers_burst(self):
+        record.enqueue(value="a")
+        record.enqueue(value="b")
+        Job.objects.create(task="jobs.tests.record", status=Job.DONE,
+                           finished_at=timezone.now() - datetime.timedelta(days=8))
+        call_command("runworkers", "--burst", stdout=open("/dev/null", "w"))
+        self.assertEqual(sorted(calls), ["a", "b"])
+        self.assertEqual(Job.objects.count(), 2)  # Prunes what finished over a week ago
+
+
+class ConcurrentClaimTests(TransactionTestCase):
+    """Several workers polling at once must never run a job twice"""
+
+    def test_each_job_claimed_once(self):
+        calls.clear()
+        for i in range(40):
+            record.enqueue(value=i)
+
+        start = threading.Barrier(4)
+
+        def work(n):
+            worker = Worker(name=f"w{n}", poll_interval=0.01)
+            start.wait()
+            try:
+                while True:
+                    try:
+                        if not worker.run_once():
+                            break
+                    except OperationalError:
+                        continue  # SQLite lock contention: try again
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=work, args=(n,)) for n in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(sorted(calls), list(range(40)))
+        self.assertEqual(Job.objects.filter(status=Job.DONE).count(), 40)
@@ -0,0 +1,99 @@
+import logging
+import os
+import socket
+import time
+import traceback
+
+from django.db import OperationalError, close_old_connections
+
+from . import queue
+from .registry import UnknownTask, get_task
+
+logger = logging.getLogger(__name__)
+
+
+def _record(update, *args, attempts=5, delay=0.05):
+    """Write a job's outcome, riding out brief lock contention.
+
+    The task has already run, so losing this write would leave the job
+    "running" until its lease expires and it runs a second time.
+    """
+    for attempt in range(attempts):
+        try:
+            return update(*args)
+        except OperationalError:
+            if attempt == attempts - 1:
+                raise
+            time.sleep(delay * 2 ** attempt)
+
+
+class Worker:
+    """Claims and runs jobs one at a time until stopped (or, in burst mode, until idle)"""
+
+    def __init__(self, name=None, poll_interval=1.0, lease=300, prune_after=None):
+        self.name = name or f"{socket.gethostname()}:{os.getpid()}"
+        self.poll_interval = poll_interval
+        self.lease = lease  # Seconds a job may stay locked before it's presumed abandoned
+        self.prune_after = prune_after  # Seconds finished jobs are kept; None keeps them forever
+        self.stopping = False
+        self.processed = 0
+
+    def stop(self, *args):
+        """Finish the current job, then exit (usable as a signal handler)"""
+        self.stopping = True
+
+    def run_once(self):
+        """Run one ready job; False if there was none"""
+        job = queue.claim(self.name)
+        if job is None:
+            return False
+        self.execute(job)
+        return True
+
+    def execute(self, job):
+        try:
+            task = get_task(job.task)
+        except UnknownTask:
+            logger.error("Job %s: unknown task %r", job.id, job.task)
+            job.max_attempts = job.attempts  # Not retryable
+            _record(queue.fail, job, f"Unknown task {job.task!r}", 0)
+            return
+
+        started = time.perf_counter()
+        try:
+            task(**job.kwargs)
+        except Exception:
+            logger.exception("Job %s (%s) failed, attempt %s/%s", job.id, job.task, job.attempts, job.max_attempts)
+            _record(queue.fail, job, traceback.format_exc(), task.backoff(job.attempts))
+        else:
+            _record(queue.complete, job)
+            logger.info("Job %s (%s) done in %.3fs", job.id, job.task, time.perf_counter() - started)
+        finally:
+            self.processed += 1
+
+    def run(self, burst=False, max_jobs=None):
+        last_sweep = 0.0
+        while not self.stopping and (max_jobs is None or self.processed < max_jobs):
+            close_old_connections()
+            try:
+                if time.monotonic() - last_sweep > self.lease / 2:
+                    queue.release_stale(self.lease)
+                    if self.prune_after:
+                        queue.prune(self.prune_after)
+                    last_sweep = time.monotonic()
+                worked = self.run_once()
+            except OperationalError:
+                # e.g. SQLite "database is locked" under write contention: back off and retry
+                logger.warning("Worker %s: database busy, retrying", self.name, exc_info=True)
+                time.sleep(self.poll_interval)
+                continue
+            if not worked:
+                if burst:
+                    break
+                time.sleep(self.poll_interval)
+        return self.processed
+
+
+def run_pending(max_jobs=None):
+    """Run every job that's ready now in this process; returns how many ran"""
+    return Worker(name=f"inline:{os.getpid()}").run(burst=True, max_jobs=max_jobs)
@@ -1,13 +1,18 @@
+from django.conf import settings
 from django.contrib import admin
 from .models import Order, OrderItem
 from django.utils.html import format_html
+from ecommerce.streaming import export_response
+from .exports import order_export_rows
 
 class OrderItemInline(admin.TabularInline):
     model = OrderItem
     extra = 1  # Number of empty fields to show by default in the inline form
+    autocomplete_fields = ('product',)  # Don't render every product into each row's <select>
 
 class OrderAdmin(admin.ModelAdmin):
     list_display = ('order_code', 'user', 'status', 'total_amount', 'delivery', 'created_at')
+    list_select_related = ('user',)
     list_filter = ('status', 'created_at', 'delivery')
     search_fields = ('order_code', 'user__username', 'user__email', 'status')
 
@@ -18,6 +23,7 @@ class OrderAdmin(admin.ModelAdmin):
 
     # Inline to manage OrderItems on the same page
     inlines = [OrderItemInline]
+    actions = ['export_json', 'export_ndjson']
 
     # Include user details in the order detail page
     # Include all fields in fieldsets
@@ -33,12 +39,26 @@ class OrderAdmin(admin.ModelAdmin):
         }),
     )
 
+    def export(self, request, queryset, fmt):
+        """✅ Streamed in chunks and compressed on the fly; "Select all" exports every match"""
+        rows = order_export_rows(queryset, chunk_size=getattr(settings, 'EXPORT_CHUNK_SIZE', 2000))
+        return export_response(request, rows, fmt, filename="orders")
+
+    @admin.action(description="Export selected orders (JSON)")
+    def export_json(self, request, queryset):
+        return self.export(request, queryset, "json")
+
+    @admin.action(description="Export selected orders (NDJSON)")
+    def export_ndjson(self, request, queryset):
+        return self.export(request, queryset, "ndjson")
+
 # Register the Order model with the admin panel
 admin.site.register(Order, OrderAdmin)
 
 # Register the OrderItem model to be managed in the admin panel
 class OrderItemAdmin(admin.ModelAdmin):
     list_display = ('order', 'product', 'quantity')
+    list_select_related = ('order', 'product')
     search_fields = ('order__order_code', 'product__name')
 
 admin.site.register(OrderItem, OrderItemAdmin)
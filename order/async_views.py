@@ -0,0 +1,136 @@
+import asyncio
+import time
+
+from django.conf import settings
+from django.core import signing
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET, require_POST
+
+from ecommerce.async_views import authenticate, not_found, render_json, unauthorized
+from ecommerce.renderers import FastJSONRenderer
+
+from .events import get_broker
+from .models import Order
+
+KEEPALIVE = b": keepalive\n\n"  # Comment line; keeps proxies from timing out an idle stream
+RETRY = b"retry: 3000\n\n"  # EventSource reconnect delay in milliseconds
+TICKET_SALT = "order.events.ticket"
+
+
+@require_GET
+async def track(request, pk):
+    """GET /api/async/order/<pk>/track/ — OrderViewSet.track on the event loop, for status polling"""
+    user_id = await authenticate(request)
+    if user_id is None:
+        return unauthorized()
+    order = await Order.objects.filter(pk=pk, user_id=user_id).values('id', 'status').afirst()
+    if order is None:
+        return not_found(Order)
+    return render_json({"order_id": order['id'], "status": order['status']})
+
+
+def _sse(event, data, event_id=None):
+    lines = [f"id: {event_id}"] if event_id else []
+    lines += [f"event: {event}", f"data: {FastJSONRenderer().render(data).decode()}"]
+    return ("\n".join(lines) + "\n\n").encode()
+
+
+def _stream_settings():
+    return (
+        getattr(settings, 'ORDER_EVENTS_HEARTBEAT', 15),
+        getattr(settings, 'ORDER_EVENTS_STREAM_SECONDS', 300),
+    )
+
+
+def _stream(subscription, opening):
+    """Blocking event stream for WSGI servers: holds one thread, but no queries"""
+    heartbeat, lifetime = _stream_settings()
+    deadline = time.monotonic() + lifetime
+    try:
+        yield opening
+        while time.monotonic() < deadline:
+            event = subscription.get(timeout=min(heartbeat, max(deadline - time.monotonic(), 0)))
+            yield KEEPALIVE if event is None else _sse('status', event['data'], event['id'])
+    finally:
+        subscription.close()
+
+
+async def _astream(subscription, opening):
+    """The same stream on the event loop, for ASGI servers"""
+    heartbeat, lifetime = _stream_settings()
+    deadline = time.monotonic() + lifetime
+    try:
+        yield opening
+        while time.monotonic() < deadline:
+            event = await subscription.aget(timeout=min(heartbeat, max(deadline - time.monotonic(), 0)))
+            yield KEEPALIVE if event is None else _sse('status', event['data'], event['id'])
+    finally:
+        subscription.close()
+
+
+def stream_user(ticket):
+    """The user id a stream ticket was issued to, or None if it is forged or expired"""
+    try:
+        return signing.loads(ticket, salt=TICKET_SALT, max_age=getattr(settings, 'ORDER_EVENTS_TICKET_SECONDS', 30))
+    except signing.BadSignature:
+        return None
+
+
+@csrf_exempt  # Bearer token only: no cookie to forge a request with
+@require_POST
+async def events_ticket(request):
+    """POST /api/async/order/events/ticket/ — a short-lived ticket for opening the event stream.
+
+    EventSource can't send an Authorization header, and an access token in
+    the URL would land in access logs and browser history for its whole
+    lifetime. The ticket opens only the event stream, and only for
+    ORDER_EVENTS_TICKET_SECONDS: fetch a new one for every (re)connect.
+    """
+    user_id = await authenticate(request)
+    if user_id is None:
+        return unauthorized()
+    return render_json({
+        "ticket": signing.dumps(user_id, salt=TICKET_SALT),
+        "expires_in": getattr(settings, 'ORDER_EVENTS_TICKET_SECONDS', 30),
+    })
+
+
+@require_GET
+async def events(request):
+    """GET /api/async/order/events/ — server-sent events for the user's order status changes.
+
+    Opens with a ``snapshot`` of every order's status, then pushes one
+    ``status`` event per transition. Streams end after
+    ORDER_EVENTS_STREAM_SECONDS and EventSource reconnects for a fresh
+    snapshot, so nothing is missed while disconnected.
+
+    Authenticated by a Bearer token, the session cookie, or ``?ticket=``
+    from ``events_ticket``; ticket clients reconnect with a new ticket.
+    """
+    ticket = request.GET.get('ticket')
+    user_id = stream_user(ticket) if ticket else await authenticate(request, allow_session=True)
+    if user_id is None:
+        return unauthorized()
+
+    asgi = isinstance(request, ASGIRequest)
+    # Subscribe before reading the snapshot so a change in between is not lost
+    subscription = get_broker().subscribe(user_id, loop=asyncio.get_running_loop() if asgi else None)
+    try:
+        snapshot = [
+            order async for order in
+            Order.objects.filter(user_id=user_id).order_by('-created_at').values('id', 'order_code', 'status')
+        ]
+    except BaseException:
+        subscription.close()
+        raise
+    opening = RETRY + _sse('snapshot', [
+        {'order_id': order['id'], 'order_code': order['order_code'], 'status': order['status']} for order in snapshot
+    ])
+
+    stream = _astream(subscription, opening) if asgi else _stream(subscription, opening)
+    response = StreamingHttpResponse(stream, content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"  # Keep nginx from holding events back
+    return response
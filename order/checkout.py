@@ -0,0 +1,78 @@
+from django.db import transaction
+
+from cart.models import Cart
+from cart.summary import cart_subtotal, forget_cart_summary
+from products.models import Product
+from products.reservations import consume, user_holds
+
+from .models import DELIVERY_FEE, Order, OrderItem
+from .signals import order_items_created
+from .tasks import send_order_confirmation
+
+
+class CheckoutError(Exception):
+    """The cart can't be turned into an order"""
+    message = "Failed to place order"
+
+    def __init__(self, message=None):
+        super().__init__(message or self.message)
+        self.message = message or self.message
+
+
+class EmptyCart(CheckoutError):
+    message = "Cart is empty"
+
+
+class OutOfStock(CheckoutError):
+    def __init__(self, products):
+        self.products = products
+        names = ", ".join(p.name for p in products)
+        super().__init__(f"Not enough stock for {names}")
+
+
+def checkout(user, order_data):
+    """Turn the user's cart into an order in a fixed number of queries.
+
+    `user` only needs an ``id``: a User or a stateless TokenUser.
+
+    Loads the cart with its products, takes stock off conditionally
+    (using up the user's checkout holds, see products.reservations),
+    creates the order and its items, clears the ordered cart rows and queues
+    the confirmation email, all in one transaction. Raises EmptyCart /
+    OutOfStock without side effects.
+    """
+    cart_items = list(Cart.objects.filter(user_id=user.id).select_related('product'))
+    if not cart_items:
+        raise EmptyCart()
+
+    quantities = {}
+    for item in cart_items:
+        quantities[item.product_id] = quantities.get(item.product_id, 0) + item.quantity
+
+    order_data = {key: value for key, value in order_data.items() if key not in ('user', 'total_amount')}
+    total_amount = cart_subtotal(cart_items) + (DELIVERY_FEE if order_data.get('delivery') else 0)
+
+    try:
+        with transaction.atomic():
+            if not consume(user, quantities):
+                raise OutOfStock([])  # Rolls back the rows that were decremented
+
+            order = Order.objects.create(user_id=user.id, total_amount=total_amount, **order_data)
+            items = OrderItem.objects.bulk_create([
+                OrderItem(order=order, product=item.product, quantity=item.quantity) for item in cart_items
+            ])
+            order_items_created.send(sender=Order, order=order, items=items)
+            Cart.objects.filter(id__in=[item.id for item in cart_items]).delete()
+            forget_cart_summary(user.id)
+            # Side effects run on a worker; the job commits (or rolls back) with the order
+            send_order_confirmation.enqueue(order_id=order.id)
+    except OutOfStock:
+        # Failure path only: find out which products fell short for the error message
+        held = dict(user_holds(user).values_list('product_id', 'quantity'))
+        short = [
+            product for product in Product.objects.filter(id__in=quantities)
+            if product.stock - product.reserved + held.get(product.id, 0) < quantities[product.id]
+        ]
+        raise OutOfStock(short or [item.product for item in cart_items])
+
+    return order
@@ -0,0 +1,159 @@
+"""Order codes: ``EH-`` + a zero-padded sequence number + a Luhn check digit.
+
+Numbers come from blocks handed out by the ``OrderCodeBlock`` table (a
+hi/lo allocator): each process reserves ``ORDER_CODE_BLOCK_SIZE``
+numbers at a time and then numbers orders from memory, so codes cost no
+queries between blocks, never collide, and grow roughly with time, which
+keeps inserts at the right edge of the unique index::
+
+    from order.codes import next_order_code
+
+    next_order_code()  # "EH-000001230": number 123, check digit 0
+
+Blocks are reserved on a connection of the allocator's own, in
+autocommit, so a block row is committed before any of its numbers is
+used: rolling back the order that needed it can't free the range for
+another process. SQLite is the exception inside a transaction, where a
+second connection would wait on the caller's own write lock; there the
+block is reserved in the caller's transaction and only counts once it
+commits (until then the allocator re-checks that its row is still there
+before using it).
+"""
+import threading
+import uuid
+
+from django.apps import apps
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, IntegrityError, connections, transaction
+from django.utils import timezone
+
+PREFIX = "EH-"
+DIGITS = 8  # Sequence digits before the check digit; wider numbers still work, just longer
+
+
+def check_digit(number):
+    """Luhn check digit of `number`: catches any single mistyped digit and most swaps"""
+    total = 0
+    for position, digit in enumerate(reversed(str(number))):
+        value = int(digit)
+        if position % 2 == 0:
+            value *= 2
+            if value > 9:
+                value -= 9
+        total += value
+    return (10 - total % 10) % 10
+
+
+def format_code(number):
+    return f"{PREFIX}{number:0{DIGITS}d}{check_digit(number)}"
+
+
+def is_valid_code(code):
+    """True for a well-formed code whose check digit matches (no database lookup)"""
+    digits = code[len(PREFIX):] if code.startswith(PREFIX) else ""
+    if len(digits) <= DIGITS or not digits.isdigit():
+        return False
+    return check_digit(int(digits[:-1])) == int(digits[-1])
+
+
+class BlockAllocator:
+    """Hands out numbers from a reserved block, reserving the next block when it runs out"""
+
+    def __init__(self, block_size=None, using=None):
+        self.block_size = block_size
+        self.using = using
+        self.token = uuid.uuid4().hex  # Tells this allocator's block rows apart from a re-reserved range
+        # Reentrant: outside a transaction on_commit runs _confirm at once, under next_number's lock
+        self._lock = threading.RLock()
+        self._next = self._end = 0
+        self._block = None  # Start of the current block
+        self._confirmed = False  # Its row has committed
+        self._connection = None  # Separate from the callers', see _reserve_committed
+
+    def next_number(self):
+        with self._lock:
+            if self._block is not None and not self._confirmed and not self._block_exists():
+                self._block = None  # Reserved in a transaction that rolled back
+            if self._block is None or self._next >= self._end:
+                self._reserve()
+            number = self._next
+            self._next += 1
+            return number
+
+    def _model(self):
+        return apps.get_model('order', 'OrderCodeBlock')
+
+    def _block_exists(self):
+        return self._model().objects.using(self.using).filter(start=self._block, owner=self.token).exists()
+
+    def _reserve(self):
+        size = self.block_size or getattr(settings, 'ORDER_CODE_BLOCK_SIZE', 100)
+        caller = connections[self.using or DEFAULT_DB_ALIAS]
+        if caller.vendor == 'sqlite' and caller.in_atomic_block:
+            self._reserve_in_transaction(size)
+        else:
+            start = self._reserve_committed(size)
+            self._block, self._next, self._end = start, start, start + size
+            self._confirmed = True
+
+    def _reserve_committed(self, size):
+        """Insert the next free block on the allocator's autocommit connection; returns its start"""
+        if self._connection is None:
+            self._connection = connections.create_connection(self.using or DEFAULT_DB_ALIAS)
+            self._connection.inc_thread_sharing()  # Used by whichever thread needs a block, under _lock
+        db = self._connection
+        db.close_if_unusable_or_obsolete()
+
+        model = self._model()
+        quote = db.ops.quote_name
+        table = quote(model._meta.db_table)
+        fields = [model._meta.get_field(name) for name in ('start', 'end', 'owner', 'created_at')]
+        columns = ", ".join(quote(field.column) for field in fields)
+        while True:
+            with db.cursor() as cursor:
+                cursor.execute(f"SELECT MAX({quote(fields[1].column)}) FROM {table}")
+                start = cursor.fetchone()[0] or 1
+                values = (start, start + size, self.token, timezone.now())
+                try:
+                    cursor.execute(
+                        f"INSERT INTO {table} ({columns}) VALUES (%s, %s, %s, %s)",
+                        [field.get_db_prep_save(value, db) for field, value in zip(fields, values)],
+                    )
+                    return start
+                except IntegrityError:
+                    continue  # Another process took this block first
+
+    def _reserve_in_transaction(self, size):
+        model = self._model()
+        while True:
+            last = model.objects.using(self.using).order_by('-start').values_list('end', flat=True).first()
+            start = last or 1
+            try:
+                # A savepoint, so a lost race can retry
+                with transaction.atomic(using=self.using):
+                    model.objects.using(self.using).create(start=start, end=start + size, owner=self.token)
+                break
+            except IntegrityError:
+                continue  # Another process took this block first
+
+        self._block, self._next, self._end = start, start, start + size
+        self._confirmed = False
+        transaction.on_commit(lambda: self._confirm(start), using=self.using)
+
+    def _confirm(self, start):
+        with self._lock:
+            if self._block == start:
+                self._confirmed = True
+
+    def reset(self):
+        """Forget the current block (its unused numbers are skipped)"""
+        with self._lock:
+            self._block = None
+            self._confirmed = False
+
+
+allocator = BlockAllocator()
+
+
+def next_order_code():
+    return format_code(allocator.next_number())
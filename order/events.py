@@ -0,0 +1,226 @@
+"""Order status pub/sub behind the tracking stream.
+
+Status changes are published once their transaction commits (see
+order.signals) and fanned out to every open stream of the order's owner,
+so a tracking page costs no queries between actual changes::
+
+    from order.events import get_broker
+
+    with get_broker().subscribe(user_id) as subscription:
+        event = subscription.get(timeout=15)  # None on timeout
+
+Subscribers in this process are served from memory. ``ORDER_EVENTS_CHANNEL``
+names the class that carries events to other processes: ``LocalChannel``
+(single process) or ``CacheChannel`` (through a shared cache region).
+"""
+import asyncio
+import itertools
+import logging
+import queue
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+from ecommerce.cache import region
+
+logger = logging.getLogger(__name__)
+
+
+class Subscription:
+    """One open stream's mailbox; blocking and asyncio consumers alike"""
+    max_pending = 100  # A stream this far behind drops events rather than grow without bound
+
+    def __init__(self, broker, user_id, loop=None):
+        self.broker = broker
+        self.user_id = user_id
+        self.loop = loop
+        if loop is None:
+            self._queue = queue.Queue(self.max_pending)
+        else:
+            self._queue = asyncio.Queue(self.max_pending)
+
+    def deliver(self, event):
+        # Called from whichever thread published
+        if self.loop is None:
+            self._put(event)
+        else:
+            try:
+                self.loop.call_soon_threadsafe(self._put, event)
+            except RuntimeError:
+                pass  # Loop already closed; the stream is going away
+
+    def _put(self, event):
+        try:
+            self._queue.put_nowait(event)
+        except (queue.Full, asyncio.QueueFull):
+            logger.warning("Dropped order event for slow subscriber of user %s", self.user_id)
+
+    def get(self, timeout=None):
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    async def aget(self, timeout=None):
+        try:
+            return await asyncio.wait_for(self._queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class LocalChannel:
+    """No cross-process delivery: every stream must be served by the publishing process"""
+
+    def __init__(self, broker):
+        self.broker = broker
+
+    def publish(self, event):
+        pass
+
+    def start(self):
+        pass
+
+
+class CacheChannel:
+    """Cross-process delivery through the "order_events" cache region.
+
+    Publishing appends the event under a sequence number; each process that
+    has subscribers runs one thread polling that sequence, so the cache sees
+    one cheap read per process per interval however many streams are open.
+    A number is taken before its event is written, so the poller stops at
+    the first number without an event and retries it on the next tick,
+    giving up on it (a publisher that died in between) after ``gap_timeout``.
+    A sequence that goes backwards (the counter was evicted or the cache
+    flushed) is followed from its new value.
+    """
+    gap_timeout = 5.0  # Seconds
+
+    def __init__(self, broker, poll_interval=None):
+        self.broker = broker
+        self.poll_interval = poll_interval or getattr(settings, 'ORDER_EVENTS_POLL_INTERVAL', 0.5)
+        self.region = region('order_events')
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def _sequence(self):
+        return self.region.get('seq') or 0
+
+    def publish(self, event):
+        self.region.add('seq', 0, timeout=None)
+        seq = self.region.incr('seq')
+        self.region.set(f"event:{seq}", event)
+
+    def start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._poll, name='order-events', daemon=True)
+                self._thread.start()
+
+    def _poll(self):
+        seen = self._sequence()
+        gap_since = None  # When seen + 1 was first found numbered but without its event
+        while True:
+            self.broker.stopped.wait(self.poll_interval)
+            if self.broker.stopped.is_set():
+                return
+            try:
+                latest = self._sequence()
+                if latest < seen:
+                    # The counter was evicted or the cache flushed: numbering starts over
+                    logger.warning("Order event sequence went back from %s to %s; following it", seen, latest)
+                    seen, gap_since = latest, None
+                    continue
+                if latest == seen:
+                    continue
+                events = self.region.get_many([f"event:{seq}" for seq in range(seen + 1, latest + 1)])
+            except Exception:
+                logger.exception("Polling order events failed")
+                continue
+            for seq in range(seen + 1, latest + 1):
+                event = events.get(f"event:{seq}")
+                if event is None:
+                    now = time.monotonic()
+                    gap_since = gap_since or now
+                    if now - gap_since < self.gap_timeout:
+                        break  # Not written yet: retry from here next tick
+                    logger.warning("Order event %s was never written; skipping it", seq)
+                elif event['origin'] != self.broker.origin:
+                    self.broker.deliver(event)
+                gap_since = None
+                seen = seq
+
+
+class Broker:
+    def __init__(self, channel_class=LocalChannel):
+        self.origin = uuid.uuid4().hex  # Tells this process's own events apart on the channel
+        self.channel = channel_class(self)
+        self.stopped = threading.Event()
+        self._ids = itertools.count(1)
+        self._subscribers = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, user_id, loop=None):
+        """A Subscription to `user_id`'s events; pass the running loop to consume with aget()"""
+        subscription = Subscription(self, user_id, loop)
+        with self._lock:
+            self._subscribers.setdefault(user_id, set()).add(subscription)
+        self.channel.start()
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.user_id)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[subscription.user_id]
+
+    def subscriber_count(self):
+        with self._lock:
+            return sum(len(subscribers) for subscribers in self._subscribers.values())
+
+    def publish(self, user_id, data):
+        """Send `data` to every stream of `user_id`, in this process and through the channel"""
+        event = {'id': f"{self.origin[:8]}-{next(self._ids)}", 'origin': self.origin, 'user_id': user_id, 'data': data}
+        self.deliver(event)
+        try:
+            self.channel.publish(event)
+        except Exception:
+            # Streams in other processes catch up from their snapshot on reconnect
+            logger.exception("Publishing order event %s failed", event['id'])
+
+    def deliver(self, event):
+        with self._lock:
+            subscribers = list(self._subscribers.get(event['user_id'], ()))
+        for subscription in subscribers:
+            subscription.deliver(event)
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    """The process-wide Broker, on the channel named by settings.ORDER_EVENTS_CHANNEL"""
+    global _broker
+    if _broker is None:
+        with _broker_lock:
+            if _broker is None:
+                _broker = Broker(import_string(getattr(settings, 'ORDER_EVENTS_CHANNEL', 'order.events.LocalChannel')))
+    return _broker
+
+
+def status_event(order, previous):
+    return {'order_id': order.id, 'order_code': order.order_code, 'status': order.status, 'previous': previous}
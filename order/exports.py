@@ -0,0 +1,33 @@
+"""Order exports: each order row with its items, merged while streaming"""
+from .models import OrderItem
+
+ORDER_FIELDS = (
+    'id', 'order_code', 'user_id', 'status', 'total_amount', 'delivery', 'delivery_fee', 'created_at',
+    'first_name', 'last_name', 'age', 'phone_number', 'email', 'gender', 'location', 'mpesa_code',
+)
+ITEM_FIELDS = ('product_id', 'product__name', 'quantity')
+
+
+def order_export_rows(orders, chunk_size=2000):
+    """Yield {order fields..., "items": [...]} for `orders` in id order.
+
+    Orders and their items are two sorted iterators walked side by side,
+    so memory stays at one chunk of each however many orders match.
+    """
+    orders = orders.order_by('id')
+    items = (
+        OrderItem.objects.filter(order__in=orders.values('id'))
+        .order_by('order_id', 'id')
+        .values('order_id', *ITEM_FIELDS)
+        .iterator(chunk_size=chunk_size)
+    )
+    item = next(items, None)
+    for order in orders.values(*ORDER_FIELDS).iterator(chunk_size=chunk_size):
+        order['items'] = []
+        while item is not None and item['order_id'] <= order['id']:
+            if item['order_id'] == order['id']:
+                order['items'].append({
+                    'product_id': item['product_id'], 'name': item['product__name'], 'quantity': item['quantity'],
+                })
+            item = next(items, None)
+        yield order
@@ -0,0 +1,27 @@
+# Generated by Django 5.1.5 on 2026-10-18 12:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('order', '0003_order_order_user_created_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderCodeBlock',
+            fields=[
+                ('start', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('end', models.BigIntegerField()),
+                ('owner', models.CharField(max_length=32)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='order',
+            name='order_code',
+            field=models.CharField(blank=True, max_length=16, unique=True),
+        ),
+    ]
@@ -1,7 +1,10 @@
 from django.db import models
 from django.contrib.auth.models import User
 from products.models import Product
-import random
+
+from .codes import next_order_code
+
+DELIVERY_FEE = 1000  # Flat fee added when delivery is selected
 
 class Order(models.Model):
     ORDER_STATUS_CHOICES = [
@@ -11,9 +14,10 @@ class Order(models.Model):
         ('Delivered', 'Delivered'),
         ('Cancelled', 'Cancelled'),
     ]
+    TRACKED_FIELDS = ('status', 'total_amount', 'delivery_fee', 'created_at')  # Loaded values kept by from_db
 
     user = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True)
-    order_code = models.CharField(max_length=10, unique=True, blank=True)
+    order_code = models.CharField(max_length=16, unique=True, blank=True)
     total_amount = models.DecimalField(max_digits=10, decimal_places=2)
     mpesa_code = models.CharField(max_length=10)
     delivery = models.BooleanField(default=False)
@@ -30,16 +34,41 @@ class Order(models.Model):
     gender = models.CharField(max_length=10, choices=[('Male', 'Male'), ('Female', 'Female'),('Other', 'Other')])
     location = models.CharField(max_length=255)
 
+    class Meta:
+        indexes = [
+            # ✅ "My orders, newest first"
+            models.Index(fields=['user', '-created_at'], name='order_user_created_idx'),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # ✅ Lets order.signals publish only real status transitions
+        instance._loaded_status = instance.__dict__.get('status')
+        # ✅ Lets reports.signals move the order's rollup numbers when these change
+        instance._loaded_values = {name: instance.__dict__.get(name) for name in Order.TRACKED_FIELDS}
+        return instance
+
     def save(self, *args, **kwargs):
         if not self.order_code:
-            self.order_code = f"EH-{random.randint(1000000, 9999999)}"
+            self.order_code = next_order_code()
         if self.delivery:
-            self.delivery_fee = 1000
+            self.delivery_fee = DELIVERY_FEE
         super().save(*args, **kwargs)
 
     def __str__(self):
         return f"Order {self.order_code} - {self.user}"
 
+class OrderCodeBlock(models.Model):
+    """A range of order numbers [start, end) reserved by one process, see order.codes"""
+    start = models.BigIntegerField(primary_key=True)
+    end = models.BigIntegerField()
+    owner = models.CharField(max_length=32)  # The reserving allocator's token
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Order codes {self.start}-{self.end - 1}"
+
 class OrderItem(models.Model):
     order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name="items")
     product = models.ForeignKey(Product, on_delete=models.CASCADE)
@@ -1,6 +1,7 @@
 from rest_framework import serializers
+from ecommerce.serializers import Column, RowSerializer
 from .models import Order, OrderItem
-from cart.models import Cart
+from .checkout import CheckoutError, checkout
 from products.models import Product  # Import Product if needed
 
 class ProductSerializer(serializers.ModelSerializer):
@@ -8,8 +9,6 @@ class ProductSerializer(serializers.ModelSerializer):
         model = Product
         fields = ['id', 'name', 'image', 'price']  # Include image field
 
-DELIVERY_FEE = 1000  # Set delivery fee
-
 class OrderItemSerializer(serializers.ModelSerializer):
     product = ProductSerializer()
     class Meta:
@@ -34,27 +33,19 @@ class OrderSerializer(serializers.ModelSerializer):
         }
 
     def create(self, validated_data):
-        user = self.context["request"].user
-        cart_items = Cart.objects.filter(user=user)
-
-        if not cart_items.exists():
-            raise serializers.ValidationError({"error": "Cart is empty"})
-
-        # ✅ 1. Calculate cart total
-        total_cart_amount = sum(item.product.price * item.quantity for item in cart_items)
-
-        # ✅ 2. Check if delivery is selected & add delivery fee
-        delivery_selected = self.context["request"].data.get("delivery", False)
-        final_total_amount = total_cart_amount + (DELIVERY_FEE if delivery_selected else 0)
-
-        # ✅ 3. Create order with the final total amount
-        order = Order.objects.create(user=user, total_amount=final_total_amount, **validated_data)
-
-        # ✅ 4. Save order items
-        for cart_item in cart_items:
-            OrderItem.objects.create(order=order, product=cart_item.product, quantity=cart_item.quantity)
-
-        # ✅ 5. Clear cart
-        cart_items.delete()
-
-        return order
+        """✅ Place the order through the checkout pipeline (stock, items, cart cleanup)"""
+        try:
+            return checkout(self.context["request"].user, validated_data)
+        except CheckoutError as exc:
+            raise serializers.ValidationError({"error": exc.message})
+
+
+def order_rows(user, context):
+    """OrderSerializer over .values() rows for `user`'s orders, items fetched in one query"""
+    items = RowSerializer(OrderItemSerializer(context=context))
+    items_by_order = {}
+    for row in OrderItem.objects.filter(order__user_id=user.id).order_by('id').values('order_id', *items.columns):
+        items_by_order.setdefault(row['order_id'], []).append(items.to_representation(row))
+    return RowSerializer(OrderSerializer(context=context), overrides={
+        'items': Column('id', fn=lambda order_id: items_by_order.get(order_id, [])),
+    })
@@ -0,0 +1,26 @@
+from django.db import transaction
+from django.db.models.signals import post_save
+from django.dispatch import Signal, receiver
+
+from .events import get_broker, status_event
+from .models import Order
+
+# Sent inside the transaction that made the change, so receivers' writes commit with it
+order_status_changed = Signal()  # order, previous: an existing order's status changed
+order_items_created = Signal()  # order, items: items bulk-created for an order (no post_save)
+
+
+@receiver(post_save, sender=Order)
+def order_saved(sender, instance, created, **kwargs):
+    """Push status transitions (API update/cancel, admin, workers) to the owner's tracking streams"""
+    previous = None if created else getattr(instance, '_loaded_status', None)
+    if instance.status == previous:
+        return
+    instance._loaded_status = instance.status
+    if previous is not None:
+        order_status_changed.send(sender=Order, order=instance, previous=previous)
+    if instance.user_id is None:
+        return
+    event = status_event(instance, previous)
+    user_id = instance.user_id
+    transaction.on_commit(lambda: get_broker().publish(user_id, event))
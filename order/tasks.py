@@ -0,0 +1,30 @@
+from django.core.mail import send_mail
+
+from jobs.registry import task
+
+from .models import Order
+
+
+@task(priority=10, max_attempts=5)
+def send_order_confirmation(order_id):
+    """Email the customer their order code, items and total"""
+    order = Order.objects.prefetch_related('items__product').filter(pk=order_id).first()
+    if order is None or not order.email:
+        return
+
+    lines = [f"{item.quantity} x {item.product.name} @ Ksh {item.product.price}" for item in order.items.all()]
+    if order.delivery:
+        lines.append(f"Delivery: Ksh {order.delivery_fee}")
+    send_mail(
+        subject=f"Order {order.order_code} received",
+        message="\n".join([
+            f"Hi {order.first_name},",
+            "",
+            f"We've received your order {order.order_code}.",
+            "",
+            *lines,
+            f"Total: Ksh {order.total_amount}",
+        ]),
+        from_email=None,
+        recipient_list=[order.email],
+    )
@@ -1,3 +1,573 @@
-from django.test import TestCase
+import gzip
+import json
+import threading
+import time
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core import mail
+from django.db import OperationalError, connection, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import AccessToken
+
+from cart.models import Cart
+
+from ecommerce.testing import QueryCountMixin
+from jobs.models import Job
+from jobs.worker import run_pending
+from products.models import Product, StockHold
+
+from .checkout import OutOfStock, checkout
+from .codes import BlockAllocator, allocator, check_digit, format_code, is_valid_code
+from .events import Broker, CacheChannel, get_broker
+from .models import Order, OrderCodeBlock, OrderItem
+
+
+CUSTOMER = {
+    "mpesa_code": "QWERTY1234", "first_name": "Jane", "last_name": "Doe", "age": 30,
+    "phone_number": "0712345678", "email": "jane@example.com", "gender": "Female", "location": "Nairobi",
+}
+
+
+def make_order(user, products, **extra):
+    order = Order.objects.create(user=user, total_amount=0, **CUSTOMER, **extra)
+    OrderItem.objects.bulk_create([OrderItem(order=order, product=p, quantity=1) for p in products])
+    return order
+
+
+class OrderQueryCountTests(QueryCountMixin, APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="shopper", password="secret123")
+        self.client.force_authenticate(self.user)
+        self.products = [
+            Product.objects.create(name=f"Item {i}", price=100 + i, stock=10, category="Accessories")
+            for i in range(5)
+        ]
+        self.order = make_order(self.user, self.products[:1])
+
+    def add_orders(self, count):
+        for _ in range(count):
+            make_order(self.user, self.products)
+
+    def test_list(self):
+        response = self.assertConstantQueries(
+            lambda: self.client.get("/api/order/"),
+            lambda: self.add_orders(50),
+            # Orders, then all their items joined to products (fast list path)
+            expected=2,
+        )
+        self.assertEqual(len(response.json()), 51)
+
+    @override_settings(FAST_LIST_SERIALIZATION=False)
+    def test_list_with_serializers(self):
+        self.assertConstantQueries(
+            lambda: self.client.get("/api/order/"),
+            lambda: self.add_orders(50),
+            # Orders, their items, the items' products
+            expected=3,
+        )
+
+    def test_fast_list_matches_serializers(self):
+        self.add_orders(3)
+        Order.objects.filter(id=self.order.id).update(status="Shipping", delivery=True, delivery_fee=1000)
+        Product.objects.filter(id=self.products[0].id).update(image="product_images/radio.png")
+        make_order(User.objects.create_user(username="other"), self.products)  # Not listed
+
+        fast = self.client.get("/api/order/")
+        with self.settings(FAST_LIST_SERIALIZATION=False):
+            slow = self.client.get("/api/order/")
+        self.assertEqual(fast.content, slow.content)
+        self.assertEqual(len(fast.json()), 4)
+        self.assertEqual(fast.json()[-1]["items"][0]["product"]["image"], "http://testserver/media/product_images/radio.png")
+
+    def test_retrieve(self):
+        self.assertConstantQueries(
+            lambda: self.client.get(f"/api/order/{self.order.id}/"),
+            lambda: OrderItem.objects.bulk_create([OrderItem(order=self.order, product=p) for p in self.products]),
+            expected=3,
+        )
+
+    def test_track(self):
+        self.assertConstantQueries(
+            lambda: self.client.get(f"/api/order/{self.order.id}/track/"),
+            lambda: self.add_orders(5),
+            expected=1,
+        )
+
+
+class CheckoutTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="shopper", password="secret123")
+        self.client.force_authenticate(self.user)
+        self.products = [
+            Product.objects.create(name=f"Item {i}", price=100, stock=5, category="Accessories") for i in range(10)
+        ]
+        # A committed order-code block, as any process has after its first order
+        with self.captureOnCommitCallbacks(execute=True):
+            allocator.reset()
+            allocator.next_number()
+
+    def fill_cart(self, products, quantity=1):
+        Cart.objects.bulk_create([Cart(user=self.user, product=p, quantity=quantity) for p in products])
+
+    def test_checkout_uses_constant_queries(self):
+        def call():
+            response = self.client.post("/cart/cart/orders/", {**CUSTOMER, "delivery": True})
+            self.assertEqual(response.status_code, 201, response.content)
+
+        # Cart+products, checkout holds, stock UPDATE, order INSERT, items INSERT, cart DELETE,
+        # job INSERT, reports delta INSERTs for the order and its items, plus savepoint bookkeeping
+        for cart_size in (1, 10):
+            self.fill_cart(self.products[:cart_size])
+            with self.assertNumQueries(11):
+                call()
+
+        self.assertFalse(Cart.objects.filter(user=self.user).exists())
+        self.assertEqual(Product.objects.get(id=self.products[0].id).stock, 3)
+        self.assertEqual(Product.objects.get(id=self.products[9].id).stock, 4)
+        latest = Order.objects.latest("id")
+        self.assertEqual(latest.total_amount, 10 * 100 + 1000)
+        self.assertEqual(latest.items.count(), 10)
+
+    def test_checkout_refreshes_cached_catalog_stock(self):
+        self.fill_cart(self.products[:1], quantity=2)
+        response = self.client.get("/api/products/")
+        etag = response["ETag"]
+        self.assertEqual(response.json()["results"][0]["stock"], 5)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(self.client.post("/cart/cart/orders/", CUSTOMER).status_code, 201)
+
+        response = self.client.get("/api/products/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        stock = {row["id"]: row["stock"] for row in response.json()["results"]}
+        self.assertEqual(stock[self.products[0].id], 3)
+
+    def test_out_of_stock_rolls_back_everything(self):
+        self.fill_cart(self.products[:2])
+        Cart.objects.filter(product=self.products[1]).update(quantity=6)
+
+        response = self.client.post("/cart/cart/orders/", CUSTOMER)
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("Item 1", response.json()["error"])
+        self.assertEqual(Product.objects.get(id=self.products[0].id).stock, 5)
+        self.assertEqual(Cart.objects.filter(user=self.user).count(), 2)
+        self.assertFalse(Order.objects.exists())
+        self.assertFalse(Job.objects.exists())
+
+    def test_confirmation_email_is_sent_by_a_worker(self):
+        self.fill_cart(self.products[:2])
+        response = self.client.post("/cart/cart/orders/", CUSTOMER)
+        self.assertEqual(response.status_code, 201)
+
+        # Queued with the order, not sent on the request path
+        self.assertEqual(list(Job.objects.values_list("task", flat=True)), ["order.tasks.send_order_confirmation"])
+        self.assertEqual(mail.outbox, [])
+
+        self.assertEqual(run_pending(), 1)
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertIn(response.json()["order_code"], mail.outbox[0].subject)
+        self.assertEqual(mail.outbox[0].to, [CUSTOMER["email"]])
+
+
+class StockHoldCheckoutTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="shopper", password="secret123")
+        self.client.force_authenticate(self.user)
+        self.product = Product.objects.create(name="Flash sale TV", price=100, stock=3, category="Entertainment")
+        Cart.objects.create(user=self.user, product=self.product, quantity=2)
+
+    def test_order_uses_up_the_hold(self):
+        response = self.client.post("/cart/api/reservations/")
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(response.json()["holds"], [{"product_id": self.product.id, "quantity": 2}])
+
+        # Someone else can't take the held units...
+        rival = User.objects.create_user(username="rival")
+        Cart.objects.create(user=rival, product=self.product, quantity=2)
+        with self.assertRaises(OutOfStock):
+            checkout(rival, dict(CUSTOMER))
+
+        # ...while the holder's order takes stock off exactly once
+        response = self.client.post("/cart/cart/orders/", CUSTOMER)
+        self.assertEqual(response.status_code, 201, response.content)
+        self.product.refresh_from_db()
+        self.assertEqual((self.product.stock, self.product.reserved), (1, 0))
+        self.assertFalse(StockHold.objects.exists())
+
+    def test_update_stock_holds_instead_of_deducting(self):
+        self.assertEqual(self.client.post("/cart/api/update-stock/").status_code, 200)
+        self.product.refresh_from_db()
+        self.assertEqual((self.product.stock, self.product.reserved), (3, 2))
+        self.assertTrue(Cart.objects.filter(user=self.user).exists())
+
+        self.assertEqual(self.client.delete("/cart/api/reservations/").status_code, 204)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.reserved, 0)
+
+    def test_reserving_more_than_available_fails(self):
+        Cart.objects.filter(user=self.user).update(quantity=4)
+        response = self.client.post("/cart/api/reservations/")
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("Flash sale TV", response.json()["error"])
+
+
+class OrderCodeTests(TestCase):
+    def test_codes_are_sequential_with_check_digit(self):
+        codes = [Order.objects.create(user=None, total_amount=0, **CUSTOMER).order_code for _ in range(3)]
+        self.assertEqual(codes, sorted(codes))
+        self.assertTrue(all(is_valid_code(code) for code in codes))
+        self.assertEqual(format_code(123), "EH-000001230")
+
+    def test_check_digit_catches_typos(self):
+        code = format_code(4096)
+        typo = code[:-3] + str((int(code[-3]) + 1) % 10) + code[-2:]
+        swap = code[:-3] + code[-2] + code[-3] + code[-1]
+        self.assertFalse(is_valid_code(typo))
+        self.assertFalse(is_valid_code(swap))
+        self.assertFalse(is_valid_code("EH-1234567"))
+        self.assertEqual(check_digit(7992739871), 3)
+
+    def test_blocks_are_reserved_without_per_order_queries(self):
+        codes = BlockAllocator(block_size=50)
+        with self.captureOnCommitCallbacks(execute=True):
+            first = codes.next_number()
+        with self.assertNumQueries(0):
+            numbers = [codes.next_number() for _ in range(49)]
+        self.assertEqual(numbers, list(range(first + 1, first + 50)))
+        self.assertEqual(OrderCodeBlock.objects.count(), 1)
+
+        codes.next_number()  # Block used up: the next one starts where it ended
+        self.assertEqual(OrderCodeBlock.objects.order_by("start").last().start, first + 50)
+
+    def test_processes_never_share_a_block(self):
+        one, two = BlockAllocator(block_size=10), BlockAllocator(block_size=10)
+        numbers = [codes.next_number() for codes in (one, two, one, two) for _ in range(6)]
+        self.assertEqual(len(numbers), len(set(numbers)))
+
+    def test_rolled_back_block_is_not_reused(self):
+        codes = BlockAllocator(block_size=10)
+        try:
+            with transaction.atomic():
+                rolled_back = codes.next_number()
+                raise RuntimeError
+        except RuntimeError:
+            pass
+        other = BlockAllocator(block_size=10).next_number()  # Free to take the same range again
+        self.assertEqual(other, rolled_back)
+        self.assertNotIn(codes.next_number(), range(other, other + 10))
+
+
+class OrderCodeAutocommitTests(TransactionTestCase):
+    def test_blocks_are_committed_on_the_allocators_own_connection(self):
+        codes = BlockAllocator(block_size=5)
+        with self.assertNumQueries(0):  # Not even the reservation runs on the caller's connection
+            first = codes.next_number()
+            self.assertEqual(codes.next_number(), first + 1)
+        self.assertTrue(OrderCodeBlock.objects.filter(start=first, owner=codes.token).exists())
+
+    def test_block_outlives_the_transaction_that_used_it(self):
+        codes = BlockAllocator(block_size=5)
+        first = codes.next_number()
+        try:
+            with transaction.atomic():
+                codes.next_number()
+                raise RuntimeError
+        except RuntimeError:
+            pass
+        # The range stays taken: another process starts after it, this one carries on in it
+        self.assertEqual(BlockAllocator(block_size=5).next_number(), first + 5)
+        self.assertEqual(codes.next_number(), first + 2)
+
+
+class ConcurrentCheckoutTests(TransactionTestCase):
+    """Many buyers race for the same SKU; stock must never go below zero"""
+    buyers = 25
+    stock = 10
+
+    def test_no_oversell(self):
+        product = Product.objects.create(name="Flash sale TV", price=100, stock=self.stock, category="Entertainment")
+        users = [User.objects.create(username=f"buyer{i}") for i in range(self.buyers)]
+        Cart.objects.bulk_create([Cart(user=user, product=product, quantity=1) for user in users])
+
+        start = threading.Barrier(self.buyers)
+        results = []
+
+        def buy(user):
+            start.wait()
+            try:
+                while True:
+                    try:
+                        checkout(user, dict(CUSTOMER))
+                        results.append("ok")
+                        return
+                    except OutOfStock:
+                        results.append("sold out")
+                        return
+                    except OperationalError:
+                        continue  # SQLite lock contention: the client retries
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=buy, args=(user,)) for user in users]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        product.refresh_from_db()
+        self.assertEqual(results.count("ok"), self.stock)
+        self.assertEqual(results.count("sold out"), self.buyers - self.stock)
+        self.assertEqual(product.stock, 0)
+        self.assertEqual(OrderItem.objects.filter(product=product).count(), self.stock)
+
+
+class AsyncTrackTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="shopper", password="secret123")
+        self.order = make_order(self.user, [])
+        self.auth = {"HTTP_AUTHORIZATION": f"Bearer {AccessToken.for_user(self.user)}"}
+
+    @override_settings(STATELESS_JWT=True)
+    def test_matches_drf(self):
+        sync = self.client.get(f"/api/order/{self.order.id}/track/", **self.auth)
+        with self.assertNumQueries(1):  # Just the order: the token is checked without a query
+            async_ = self.client.get(f"/api/async/order/{self.order.id}/track/", **self.auth)
+        self.assertEqual(async_.status_code, 200)
+        self.assertEqual(async_.content, sync.content)
+
+    def test_other_users_order_is_not_found(self):
+        other = make_order(User.objects.create_user(username="other", password="secret123"), [])
+        response = self.client.get(f"/api/async/order/{other.id}/track/", **self.auth)
+        self.assertEqual(response.status_code, 404)
+
+    def test_requires_a_valid_token(self):
+        for headers in ({}, {"HTTP_AUTHORIZATION": "Bearer not-a-token"}):
+            anonymous = self.client.get(f"/api/order/{self.order.id}/track/", **headers)
+            response = self.client.get(f"/api/async/order/{self.order.id}/track/", **headers)
+            self.assertEqual(response.status_code, 401)
+            self.assertEqual(response["WWW-Authenticate"], anonymous["WWW-Authenticate"])
+
+
+def sse_fields(chunk):
+    """{field: value} of one server-sent event"""
+    return dict(line.split(": ", 1) for line in chunk.decode().strip().splitlines())
+
+
+@override_settings(ORDER_EVENTS_HEARTBEAT=0.05)
+class OrderEventStreamTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="shopper", password="secret123")
+        self.order = make_order(self.user, [])
+        self.token = str(AccessToken.for_user(self.user))
+
+    def ticket(self):
+        response = self.client.post("/api/async/order/events/ticket/", HTTP_AUTHORIZATION=f"Bearer {self.token}")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["expires_in"], 30)
+        return response.json()["ticket"]
+
+    def open_stream(self):
+        response = self.client.get("/api/async/order/events/", {"ticket": self.ticket()})
+        self.addCleanup(response.close)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        return response, iter(response.streaming_content)
+
+    def test_snapshot_then_pushed_transitions(self):
+        response, stream = self.open_stream()
+        opening = next(stream)
+        self.assertTrue(opening.startswith(b"retry: 3000\n\n"))
+        snapshot = sse_fields(opening.split(b"\n\n", 1)[1])
+        self.assertEqual(snapshot["event"], "snapshot")
+        self.assertEqual(json.loads(snapshot["data"]), [
+            {"order_id": self.order.id, "order_code": self.order.order_code, "status": "Pending"},
+        ])
+
+        # Idle streams send keepalives without touching the database
+        with self.assertNumQueries(0):
+            self.assertEqual(next(stream), b": keepalive\n\n")
+
+        self.client.force_authenticate(self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.put(f"/api/order/{self.order.id}/", {"status": "Processing"})
+        event = sse_fields(next(stream))
+        self.assertEqual(event["event"], "status")
+        self.assertEqual(json.loads(event["data"]), {
+            "order_id": self.order.id, "order_code": self.order.order_code,
+            "status": "Processing", "previous": "Pending",
+        })
+
+    def test_closing_the_stream_unsubscribes(self):
+        before = get_broker().subscriber_count()
+        response, stream = self.open_stream()
+        next(stream)
+        self.assertEqual(get_broker().subscriber_count(), before + 1)
+        response.close()
+        self.assertEqual(get_broker().subscriber_count(), before)
+
+    def test_header_token_also_works(self):
+        response = self.client.get("/api/async/order/events/", HTTP_AUTHORIZATION=f"Bearer {self.token}")
+        self.addCleanup(response.close)
+        self.assertEqual(response.status_code, 200)
+
+    def test_session_cookie_also_works(self):
+        self.client.force_login(self.user)
+        response = self.client.get("/api/async/order/events/")
+        self.addCleanup(response.close)
+        self.assertEqual(response.status_code, 200)
+
+    def test_requires_a_valid_ticket(self):
+        # The access token itself is never accepted in the URL
+        for params in ({}, {"token": self.token}, {"ticket": self.token}, {"ticket": "not-a-ticket"}):
+            response = self.client.get("/api/async/order/events/", params)
+            self.assertEqual(response.status_code, 401)
+
+    def test_tickets_expire(self):
+        ticket = self.ticket()
+        with mock.patch("django.core.signing.time.time", return_value=time.time() + 31):
+            response = self.client.get("/api/async/order/events/", {"ticket": ticket})
+        self.assertEqual(response.status_code, 401)
+
+    def test_tickets_are_issued_for_access_tokens_only(self):
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.post("/api/async/order/events/ticket/").status_code, 401)
+        response = self.client.get("/api/async/order/events/ticket/", HTTP_AUTHORIZATION=f"Bearer {self.token}")
+        self.assertEqual(response.status_code, 405)
+
+
+class OrderStatusPublishTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="shopper", password="secret123")
+        self.order = make_order(self.user, [])
+        self.subscription = get_broker().subscribe(self.user.id)
+        self.addCleanup(self.subscription.close)
+
+    def published(self):
+        events = []
+        while (event := self.subscription.get(timeout=0)) is not None:
+            events.append(event["data"])
+        return events
+
+    def test_only_committed_transitions_are_published(self):
+        order = Order.objects.get(id=self.order.id)
+        with self.captureOnCommitCallbacks() as callbacks:
+            order.save()  # Status unchanged
+            order.status = "Shipping"
+            order.save()
+            self.assertEqual(self.published(), [])  # Nothing before commit
+        for callback in callbacks:
+            callback()
+        self.assertEqual([(e["previous"], e["status"]) for e in self.published()], [("Pending", "Shipping")])
+
+    def test_cancel_is_published(self):
+        self.client.force_login(self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(f"/api/order/{self.order.id}/cancel/")
+        self.assertEqual(len(self.published()), 1)
+
+    def test_other_users_do_not_receive_it(self):
+        other = User.objects.create_user(username="other", password="secret123")
+        with self.captureOnCommitCallbacks(execute=True):
+            make_order(other, [])
+        self.assertEqual(self.published(), [])
+
+
+class CacheChannelTests(TestCase):
+    def test_events_cross_brokers_once(self):
+        channel = lambda broker: CacheChannel(broker, poll_interval=0.01)
+        publisher, listener = Broker(channel), Broker(channel)
+        for broker in (publisher, listener):
+            self.addCleanup(broker.stopped.set)
+        local = publisher.subscribe(7)
+        remote = listener.subscribe(7)
+        time.sleep(0.05)  # Let the listener's poller read the current sequence
+
+        publisher.publish(7, {"status": "Shipping"})
+
+        self.assertEqual(remote.get(timeout=2)["data"], {"status": "Shipping"})
+        self.assertEqual(local.get(timeout=0.1)["data"], {"status": "Shipping"})
+        # The publisher's own poller skips what it already delivered locally
+        self.assertIsNone(local.get(timeout=0.1))
+
+    def test_poller_waits_for_numbered_events(self):
+        listener = Broker(lambda broker: CacheChannel(broker, poll_interval=0.01))
+        self.addCleanup(listener.stopped.set)
+        events = listener.channel.region
+        remote = listener.subscribe(7)
+        time.sleep(0.05)
+
+        # A publisher has taken the next number but not written its event yet
+        events.add("seq", 0, timeout=None)
+        seq = events.incr("seq")
+        Broker(CacheChannel).publish(7, {"status": "Delivered"})
+        self.assertIsNone(remote.get(timeout=0.1))
+
+        events.set(f"event:{seq}", {"id": "late", "origin": "elsewhere", "user_id": 7, "data": {"status": "Shipping"}})
+        self.assertEqual(remote.get(timeout=2)["data"], {"status": "Shipping"})
+        self.assertEqual(remote.get(timeout=2)["data"], {"status": "Delivered"})
+
+    def test_poller_follows_a_sequence_that_starts_over(self):
+        channel = lambda broker: CacheChannel(broker, poll_interval=0.01)
+        publisher, listener = Broker(channel), Broker(channel)
+        for broker in (publisher, listener):
+            self.addCleanup(broker.stopped.set)
+        remote = listener.subscribe(7)
+        time.sleep(0.05)
+        for status in ("Processing", "Shipping"):
+            publisher.publish(7, {"status": status})
+            self.assertEqual(remote.get(timeout=2)["data"], {"status": status})
+
+        events = listener.channel.region
+        with self.assertLogs("order.events", "WARNING") as logs:
+            # The cache was flushed (or evicted the counter along with the events)
+            events.delete_many(["seq"] + [f"event:{seq}" for seq in range(1, events.get("seq") + 1)])
+            time.sleep(0.05)
+        self.assertIn("went back", logs.output[0])
+        publisher.publish(7, {"status": "Delivered"})
+        self.assertEqual(remote.get(timeout=2)["data"], {"status": "Delivered"})
+
+    def test_poller_gives_up_on_events_never_written(self):
+        listener = Broker(lambda broker: CacheChannel(broker, poll_interval=0.01))
+        listener.channel.gap_timeout = 0.1
+        self.addCleanup(listener.stopped.set)
+        remote = listener.subscribe(7)
+        time.sleep(0.05)
+
+        listener.channel.region.add("seq", 0, timeout=None)
+        listener.channel.region.incr("seq")  # Its publisher died before writing the event
+        with self.assertLogs("order.events", "WARNING") as logs:
+            Broker(CacheChannel).publish(7, {"status": "Delivered"})
+            self.assertEqual(remote.get(timeout=2)["data"], {"status": "Delivered"})
+        self.assertIn("never written", logs.output[0])
+
+
+class OrderExportTests(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_superuser(username="admin", password="secret123")
+        self.client.force_login(self.admin)
+        products = [Product.objects.create(name=f"Item {i}", price=100, stock=5, category="Accessories") for i in range(3)]
+        self.orders = [make_order(self.admin, products[:i]) for i in range(4)]
+
+    def run_action(self, action, orders, **headers):
+        response = self.client.post("/admin/order/order/", {
+            "action": action, "_selected_action": [order.id for order in orders],
+        }, **headers)
+        self.assertEqual(response.status_code, 200)
+        return response, b"".join(response.streaming_content)
+
+    @override_settings(EXPORT_CHUNK_SIZE=1)
+    def test_orders_are_merged_with_their_items(self):
+        _, body = self.run_action("export_json", self.orders)
+        rows = json.loads(body)
+        self.assertEqual([row["id"] for row in rows], [order.id for order in self.orders])
+        self.assertEqual([len(row["items"]) for row in rows], [0, 1, 2, 3])
+        self.assertEqual(rows[3]["items"][2], {"product_id": rows[3]["items"][2]["product_id"], "name": "Item 2", "quantity": 1})
+
+    def test_ndjson_selected_only_and_compressed(self):
+        response, body = self.run_action("export_ndjson", self.orders[2:], HTTP_ACCEPT_ENCODING="gzip")
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        lines = gzip.decompress(body).decode().splitlines()
+        self.assertEqual([json.loads(line)["order_code"] for line in lines], [o.order_code for o in self.orders[2:]])
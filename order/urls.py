@@ -1,6 +1,6 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import OrderViewSet, OrderView, UpdateStockView  # ✅ Ensure both are imported
+from .views import OrderViewSet, OrderView, StockReservationView  # ✅ Ensure both are imported
 
 # ✅ Router for ViewSet-based order management
 router = DefaultRouter()
@@ -11,7 +11,9 @@ urlpatterns = [
     path('cart/orders/', OrderView.as_view(), name="cart-order"),
 
     path('orders/<int:pk>/cancel/', OrderViewSet.as_view({'post': 'cancel'}), name='order-cancel'),
-    path('api/update-stock/', UpdateStockView.as_view(), name='update-stock'),
+    path('api/reservations/', StockReservationView.as_view(), name='stock-reservations'),
+    # ✅ Old name: holds stock now; the order itself takes it off (it used to be deducted twice)
+    path('api/update-stock/', StockReservationView.as_view(), name='update-stock'),
     # ✅ Include router for ViewSet-based order management
     path('', include(router.urls)),
     path('api/', include(router.urls)),
@@ -1,36 +1,50 @@
+from django.conf import settings
 from django.shortcuts import get_object_or_404
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status, permissions
 from .models import Order, OrderItem
+from ecommerce.authentication import STATELESS_AUTHENTICATION
 from cart.models import Cart
-from .serializers import OrderSerializer
+from .serializers import OrderSerializer, order_rows
+from .checkout import CheckoutError, checkout
 from rest_framework import viewsets
 from rest_framework.decorators import action
 from django.utils.decorators import method_decorator
 from rest_framework.permissions import IsAuthenticated, IsAuthenticatedOrReadOnly  # ✅ Import both
 from rest_framework import serializers
 from products.models import Product  # Import Product model if needed
+from products.reservations import InsufficientStock, hold, release_user_holds
 
 class OrderViewSet(viewsets.ModelViewSet):
     queryset = Order.objects.all()
     serializer_class = OrderSerializer
+    authentication_classes = STATELESS_AUTHENTICATION  # ✅ request.user is a TokenUser: filter by user_id
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
         """Return all orders for the authenticated user, including canceled and successful ones"""
-        return Order.objects.filter(user=self.request.user)  # No status filtering
+        queryset = Order.objects.filter(user_id=self.request.user.id).order_by('-created_at')  # No status filtering
+        if self.action in ('list', 'retrieve'):
+            # ✅ Items and their products in 2 extra queries, however many orders
+            queryset = queryset.prefetch_related('items__product')
+        return queryset
 
     def list(self, request):
         """Fetch orders for the logged-in user"""
-        orders = Order.objects.filter(user=request.user)
+        if settings.FAST_LIST_SERIALIZATION:
+            # ✅ Same output from .values() rows: orders + items in 2 queries, no model instances
+            rows = order_rows(request.user, self.get_serializer_context())
+            orders = Order.objects.filter(user_id=request.user.id).order_by('-created_at')
+            return Response(rows.many(orders.values(*rows.columns)))
+        orders = self.get_queryset()
         serializer = self.get_serializer(orders, many=True)
         return Response(serializer.data)
 
     @action(detail=True, methods=['post'])
     def cancel(self, request, pk=None):
         """Cancel an order if it's still 'Pending'"""
-        order = get_object_or_404(Order, id=pk, user=request.user)
+        order = get_object_or_404(Order, id=pk, user_id=request.user.id)
 
         if order.status != "Pending":
             return Response(
@@ -38,7 +52,7 @@ class OrderViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        order.status = "Canceled"
+        order.status = "Cancelled"  # ✅ The spelling in ORDER_STATUS_CHOICES
         order.save()
 
         return Response(
@@ -55,18 +69,9 @@ class OrderViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=["POST"], permission_classes=[IsAuthenticated])  
     def place_order(self, request):
         """✅ Create an order from cart items"""
-        cart_items = Cart.objects.filter(user=request.user)
-
-        if not cart_items.exists():
-            return Response({"error": "Cart is empty"}, status=status.HTTP_400_BAD_REQUEST)
-
-        total_price = sum(item.product.price * item.quantity for item in cart_items)
-        order = Order.objects.create(user=request.user, total_amount=total_price)
-
-        for item in cart_items:
-            OrderItem.objects.create(order=order, product=item.product, quantity=item.quantity)
-
-        cart_items.delete()
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        order = serializer.save()
         return Response({"message": "Order placed successfully", "order_code": order.order_code}, status=status.HTTP_201_CREATED)
 
     def update(self, request, pk=None):
@@ -81,87 +86,56 @@ class OrderViewSet(viewsets.ModelViewSet):
         order.save()
         return Response({"message": "Order status updated successfully"})
     
-DELIVERY_FEE = 1000  # Change this based on your delivery cost
-
 class OrderView(APIView):
+    authentication_classes = STATELESS_AUTHENTICATION
     permission_classes = [permissions.IsAuthenticated]
 
     def post(self, request):
-        """✅ Create an order with stock validation & atomic transaction"""
-        user = request.user
-        cart_items = Cart.objects.filter(user=user)
-
-        if not cart_items.exists():
-            return Response({"error": "Cart is empty"}, status=status.HTTP_400_BAD_REQUEST)
-
-        total_cart_amount = sum(item.product.price * item.quantity for item in cart_items)
-        delivery_selected = request.data.get("delivery", False)
-        total_amount = total_cart_amount + (DELIVERY_FEE if delivery_selected else 0)
-
-        required_fields = ["mpesa_code", "first_name", "last_name", "phone_number", "location", "age", "email", "gender"]
-        missing_fields = [field for field in required_fields if field not in request.data]
-
-        if missing_fields:
-            return Response({field: ["This field is required."] for field in missing_fields}, status=status.HTTP_400_BAD_REQUEST)
-
-        # ✅ First check if all items have enough stock before making changes
-        for cart_item in cart_items:
-            product = get_object_or_404(Product, id=cart_item.product.id)
-            if product.quantity < cart_item.quantity:
-                return Response({"error": f"Not enough stock for {product.name}"}, status=status.HTTP_400_BAD_REQUEST)
-
-        # ✅ Use atomic transaction: Everything runs successfully or gets rolled back
-        with transaction.atomic():
-            order_data = request.data.copy()
-            order_data.pop("items", None)
-            order_data.pop("total_amount", None)
-            order_data["user"] = user.id  
-
-            serializer = OrderSerializer(data=order_data)
-            if serializer.is_valid():
-                order = serializer.save(user=user, total_amount=total_amount)
-
-                for cart_item in cart_items:
-                    product = get_object_or_404(Product, id=cart_item.product.id)
-                    product.quantity -= cart_item.quantity  # ✅ Deduct stock
-                    product.save()
-                    OrderItem.objects.create(order=order, product=cart_item.product, quantity=cart_item.quantity)
-
-                # ✅ Clear cart after successful order
-                cart_items.delete()
-
-                return Response({
-                    "message": "Order placed successfully",
-                    "order_code": order.order_code,
-                    "total_amount": total_amount  
-                }, status=status.HTTP_201_CREATED)
-
-        return Response({"error": "Failed to place order"}, status=status.HTTP_400_BAD_REQUEST)
-
-class UpdateStockView(APIView):
+        """✅ Create an order: conditional stock decrement & bulk inserts in one transaction"""
+        order_data = request.data.copy()
+        order_data.pop("items", None)
+        order_data.pop("total_amount", None)
+
+        serializer = OrderSerializer(data=order_data, context={"request": request})
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            order = checkout(request.user, serializer.validated_data)
+        except CheckoutError as exc:
+            return Response({"error": exc.message}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response({
+            "message": "Order placed successfully",
+            "order_code": order.order_code,
+            "total_amount": order.total_amount,
+        }, status=status.HTTP_201_CREATED)
+
+class StockReservationView(APIView):
+    """✅ Checkout holds: the payment page sets the cart's stock aside while the buyer pays"""
+    authentication_classes = STATELESS_AUTHENTICATION
     permission_classes = [permissions.IsAuthenticated]
 
     def post(self, request):
-        """✅ Deduct product stock based on the cart"""
-        user = request.user
-        cart_items = Cart.objects.filter(user=user)
-
-        if not cart_items.exists():
+        """Hold stock for the whole cart (replacing any earlier hold); the order uses it up"""
+        quantities = {}
+        for product_id, quantity in Cart.objects.filter(user_id=request.user.id).values_list("product_id", "quantity"):
+            quantities[product_id] = quantities.get(product_id, 0) + quantity
+        if not quantities:
             return Response({"error": "Cart is empty"}, status=status.HTTP_400_BAD_REQUEST)
 
-        # ✅ First check stock availability
-        for item in cart_items:
-            product = get_object_or_404(Product, id=item.product.id)
-            if product.quantity < item.quantity:
-                return Response({"error": f"Not enough stock for {product.name}"}, status=status.HTTP_400_BAD_REQUEST)
-
-        # ✅ Deduct stock using an atomic transaction
-        with transaction.atomic():
-            for item in cart_items:
-                product = get_object_or_404(Product, id=item.product.id)
-                product.quantity -= item.quantity
-                product.save()
-
-            cart_items.delete()  # ✅ Clear cart after stock update
-
-        return Response({"message": "Stock updated successfully"}, status=status.HTTP_200_OK)
\ No newline at end of file
+        try:
+            expires_at = hold(request.user, quantities)
+        except InsufficientStock as exc:
+            return Response({"error": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response({
+            "message": "Stock reserved",
+            "expires_at": expires_at,
+            "holds": [{"product_id": product_id, "quantity": qty} for product_id, qty in quantities.items()],
+        }, status=status.HTTP_200_OK)
+
+    def delete(self, request):
+        """Give the held stock back (the buyer left checkout)"""
+        release_user_holds(request.user)
+        return Response(status=status.HTTP_204_NO_CONTENT)
@@ -1,8 +1,17 @@
 from django.contrib import admin
 from .models import Product  # Import Product model
+from .search import get_search_backend
 
-admin.site.register(Product)  # Register Product model
 class ProductAdmin(admin.ModelAdmin):
-    list_display = ('name', 'category', 'price', 'stock')  # Show these fields in admin
+    list_display = ('name', 'sku', 'category', 'price', 'stock', 'reserved')  # Show these fields in admin
     list_filter = ('category',)  # Add filtering by category
-    search_fields = ('name', 'description')  # Allow searching
\ No newline at end of file
+    search_fields = ('name', 'description')  # Allow searching
+    readonly_fields = ('reserved',)  # ✅ Maintained by products.reservations
+
+    def get_search_results(self, request, queryset, search_term):
+        """Search name + description through the search index instead of icontains scans"""
+        if not search_term:
+            return queryset, False
+        return get_search_backend().filter(queryset, search_term), False
+
+admin.site.register(Product, ProductAdmin)  # Register Product model
@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class ProductsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'products'
+
+    def ready(self):
+        from django.db.models.signals import post_migrate
+        from . import signals  # ✅ Connect catalog cache invalidation & search sync
+        post_migrate.connect(signals.ensure_search_index, sender=self)
@@ -0,0 +1,141 @@
+"""Async versions of the catalog read endpoints.
+
+They use the same versioned catalog cache and ETag scheme as
+ProductViewSet and render the same bytes (apart from their own URLs in
+page links), so clients can switch between them freely. Cache hits and
+304s never leave the event loop; misses read through the async ORM.
+"""
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.paginator import InvalidPage, Paginator
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.views.decorators.http import require_GET
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from ecommerce.async_views import not_found, render_json
+from ecommerce.cache import MISSING
+
+from .cache import aget_catalog_version, catalog_cache, catalog_cache_key, catalog_etag
+from .models import Product
+from .pagination import KEYSET_ORDERING, ProductCursorPagination, ProductPagination, akeyset_page
+from .serializers import ProductSerializer, product_rows
+from .views import ProductFilter, catalog_params, use_cursor_pagination
+
+
+class BadRequest(Exception):
+    def __init__(self, detail, status=400):
+        self.detail = detail
+        self.status = status
+
+
+def _filtered_queryset(query_params):
+    # In a thread: the in-process search backend may load rows while filtering by name
+    filterset = ProductFilter(query_params, queryset=Product.objects.order_by(*KEYSET_ORDERING))
+    if not filterset.is_valid():
+        raise BadRequest({field: list(messages) for field, messages in filterset.errors.items()})
+    return filterset.qs
+
+
+def _page_size(query_params):
+    """ProductPagination.get_page_size for a plain Django request"""
+    try:
+        size = int(query_params[ProductPagination.page_size_query_param])
+    except (KeyError, ValueError):
+        return ProductPagination.page_size
+    if size <= 0:
+        return ProductPagination.page_size
+    return min(size, ProductPagination.max_page_size)
+
+
+def _cursor_page_size(query_params):
+    try:
+        size = int(query_params.get('page_size', ProductCursorPagination.page_size))
+    except ValueError:
+        return ProductCursorPagination.page_size
+    return max(1, min(size, ProductCursorPagination.max_page_size))
+
+
+async def _build_page(request):
+    """The same page dict ProductViewSet.list builds"""
+    queryset = await sync_to_async(_filtered_queryset)(request.GET)
+    url = request.build_absolute_uri()
+    context = {'request': request}
+    if settings.FAST_LIST_SERIALIZATION:
+        fast = product_rows(context)
+        queryset = queryset.values(*fast.columns)
+        serialize = fast.many
+    else:
+        serialize = lambda page: ProductSerializer(page, many=True, context=context).data
+
+    if use_cursor_pagination(request.GET):
+        cursor = request.GET.get('cursor') or None
+        try:
+            rows, next_cursor, previous_cursor = await akeyset_page(queryset, cursor, _cursor_page_size(request.GET))
+        except ValueError:
+            raise BadRequest({"detail": "Invalid cursor"}, status=404)
+        return {
+            'next': replace_query_param(url, 'cursor', next_cursor) if next_cursor else None,
+            'previous': replace_query_param(url, 'cursor', previous_cursor) if previous_cursor else None,
+            'results': serialize(rows),
+        }
+
+    paginator = Paginator(queryset, _page_size(request.GET))
+    paginator.count = await queryset.acount()  # Prime the cached count so paging never queries synchronously
+    page_number = request.GET.get('page', 1)
+    if page_number in ProductPagination.last_page_strings:
+        page_number = paginator.num_pages
+    try:
+        page = paginator.page(page_number)
+    except InvalidPage:
+        raise BadRequest({"detail": "Invalid page."}, status=404)
+
+    rows = [product async for product in page.object_list]
+    previous = None
+    if page.has_previous():
+        previous_number = page.previous_page_number()
+        previous = (
+            remove_query_param(url, 'page') if previous_number == 1
+            else replace_query_param(url, 'page', previous_number)
+        )
+    return {
+        'count': paginator.count,
+        'next': replace_query_param(url, 'page', page.next_page_number()) if page.has_next() else None,
+        'previous': previous,
+        'results': serialize(rows),
+    }
+
+
+@require_GET
+async def product_list(request):
+    """GET /api/async/products/ — ProductViewSet.list on the event loop"""
+    params = catalog_params(request)
+    version = await aget_catalog_version()
+    etag = catalog_etag(version, params)
+
+    not_modified = get_conditional_response(request, etag=etag)
+    if not_modified is not None:
+        patch_cache_control(not_modified, no_cache=True)
+        return not_modified
+
+    key = catalog_cache_key(version, params)
+    data = await catalog_cache().aget(key, MISSING)
+    if data is MISSING:
+        try:
+            data = await _build_page(request)
+        except BadRequest as exc:
+            return render_json(exc.detail, status=exc.status)
+        await catalog_cache().aset(key, data)
+
+    response = render_json(data)
+    response['ETag'] = etag
+    patch_cache_control(response, no_cache=True)
+    return response
+
+
+@require_GET
+async def product_detail(request, pk):
+    """GET /api/async/products/<pk>/"""
+    product = await Product.objects.filter(pk=pk).afirst()
+    if product is None:
+        return not_found(Product)
+    return render_json(ProductSerializer(product, context={'request': request}).data)
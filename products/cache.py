@@ -0,0 +1,63 @@
+import hashlib
+import time
+
+from ecommerce.cache import region
+
+CATALOG_VERSION_KEY = "version"
+
+
+def catalog_cache():
+    return region("catalog")
+
+
+def get_catalog_version():
+    """Return the current catalog version, seeding it if the cache was cleared"""
+    catalog = catalog_cache()
+    version = catalog.get(CATALOG_VERSION_KEY)
+    if version is None:
+        # Seed from the clock so a lost counter never reuses an old version
+        catalog.add(CATALOG_VERSION_KEY, int(time.time() * 1000), None)
+        version = catalog.get(CATALOG_VERSION_KEY)
+    return version
+
+
+async def aget_catalog_version():
+    """get_catalog_version for async views"""
+    catalog = catalog_cache()
+    version = await catalog.aget(CATALOG_VERSION_KEY)
+    if version is None:
+        await catalog.aadd(CATALOG_VERSION_KEY, int(time.time() * 1000), None)
+        version = await catalog.aget(CATALOG_VERSION_KEY)
+    return version
+
+
+def bump_catalog_version():
+    """Invalidate every cached catalog page by moving to a new version"""
+    try:
+        return catalog_cache().incr(CATALOG_VERSION_KEY)
+    except ValueError:
+        return get_catalog_version()
+
+
+def normalize_params(query_params, allowed, case_insensitive=()):
+    """Turn query params into a stable string so equivalent requests share an entry"""
+    items = []
+    for name in sorted(allowed):
+        value = query_params.get(name, "").strip()
+        if not value:
+            continue
+        if name in case_insensitive:
+            value = value.lower()
+        items.append(f"{name}={value}")
+    return "&".join(items)
+
+
+def catalog_cache_key(version, params):
+    digest = hashlib.sha1(params.encode()).hexdigest()
+    return f"v{version}:{digest}"
+
+
+def catalog_etag(version, params):
+    """Strong ETag: the same version and params always render the same bytes"""
+    digest = hashlib.sha1(f"{version}:{params}".encode()).hexdigest()
+    return f'"{digest}"'
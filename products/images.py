@@ -0,0 +1,116 @@
+"""Resized product image derivatives.
+
+Each uploaded image is re-encoded as WebP and JPEG at the widths in
+settings.PRODUCT_IMAGE_WIDTHS (never upscaled). Derivatives are stored
+under content-hashed names, so a URL always refers to the same bytes and
+can be served with an immutable, year-long cache policy. The map of
+generated files lives in Product.image_variants:
+
+    {"source": "<image name>", "webp": {"320": "<name>", ...}, "jpeg": {...}}
+"""
+import hashlib
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+from .cache import bump_catalog_version
+from .models import Product
+
+DERIVED_DIR = "product_images/derived"
+FORMATS = {
+    # format key: (Pillow format, extension, save options)
+    "webp": ("WEBP", "webp", {"quality": 80, "method": 4}),
+    "jpeg": ("JPEG", "jpg", {"quality": 82, "optimize": True, "progressive": True}),
+}
+
+
+def needs_derivatives(product):
+    """True when the stored variants don't belong to the current image"""
+    variants = product.image_variants or {}
+    if not product.image:
+        return bool(variants)
+    return variants.get("source") != product.image.name
+
+
+def _encode(image, fmt):
+    pil_format, _, options = FORMATS[fmt]
+    if pil_format == "JPEG" and image.mode not in ("RGB", "L"):
+        # JPEG has no alpha channel: flatten onto white
+        background = Image.new("RGB", image.size, (255, 255, 255))
+        background.paste(image, mask=image.convert("RGBA").getchannel("A"))
+        image = background
+    buffer = BytesIO()
+    image.save(buffer, pil_format, **options)
+    return buffer.getvalue()
+
+
+def _store(data, width, ext):
+    digest = hashlib.sha256(data).hexdigest()[:16]
+    name = f"{DERIVED_DIR}/{digest}.{width}w.{ext}"
+    if not default_storage.exists(name):  # Content-addressed: same bytes, same file
+        default_storage.save(name, ContentFile(data))
+    return name
+
+
+def render_derivatives(image_file):
+    """Encode every width/format of an image file; returns {format: {width: name}}"""
+    with Image.open(image_file) as source:
+        source = ImageOps.exif_transpose(source)
+        if source.mode not in ("RGB", "RGBA", "L"):
+            source = source.convert("RGBA" if "transparency" in source.info else "RGB")
+
+        widths = sorted({min(width, source.width) for width in settings.PRODUCT_IMAGE_WIDTHS})
+        variants = {fmt: {} for fmt in FORMATS}
+        for width in widths:
+            height = max(1, round(source.height * width / source.width))
+            resized = source if width == source.width else source.resize((width, height), Image.LANCZOS)
+            for fmt, (_, ext, _) in FORMATS.items():
+                variants[fmt][str(width)] = _store(_encode(resized, fmt), width, ext)
+    return variants
+
+
+def build_derivatives(product):
+    """Generate (or clear) the product's variants and record them.
+
+    Writes with a queryset update so product signals don't fire again, then
+    bumps the catalog version so cached listings pick up the new URLs.
+    """
+    variants = {}
+    if product.image:
+        with product.image.open("rb") as image_file:
+            variants = {"source": product.image.name, **render_derivatives(image_file)}
+
+    Product.objects.filter(pk=product.pk).update(image_variants=variants)
+    product.image_variants = variants
+    bump_catalog_version()
+    return variants
+
+
+def media_url(name, request=None):
+    """Public URL for a stored file: the CDN origin if configured, else this host"""
+    if settings.MEDIA_CDN_URL:
+        return settings.MEDIA_CDN_URL.rstrip("/") + "/" + name
+    url = default_storage.url(name)
+    return request.build_absolute_uri(url) if request is not None else url
+
+
+def srcset(product, request=None):
+    """{format: "url 160w, url 320w, ..."} for the product's derivatives"""
+    return srcset_for(product.image.name if product.image else None, product.image_variants, request)
+
+
+def srcset_for(image_name, variants, request=None):
+    """srcset from the raw ``image``/``image_variants`` column values"""
+    variants = variants or {}
+    if not image_name or variants.get("source") != image_name:
+        return {}
+    return {
+        fmt: ", ".join(
+            f"{media_url(name, request)} {width}w"
+            for width, name in sorted(variants[fmt].items(), key=lambda item: int(item[0]))
+        )
+        for fmt in FORMATS if variants.get(fmt)
+    }
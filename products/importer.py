@@ -0,0 +1,278 @@
+"""Bulk catalog import/export behind ``manage.py import_products`` / ``export_products``.
+
+Input is streamed and handled a batch at a time: each batch is checked
+column by column, then upserted on ``sku`` with one
+``bulk_create(update_conflicts=True)`` in its own transaction. Nothing
+fires per row: the catalog version is bumped once at the end, and the
+search index follows through its triggers (FTS5) or that version bump.
+"""
+import csv
+import hashlib
+import json
+import os
+from decimal import Decimal, InvalidOperation
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+
+from ecommerce.streaming import encode_row
+
+from .cache import bump_catalog_version
+from .models import Product
+from .tasks import build_image_derivatives
+
+EXPORT_FIELDS = ('sku', 'name', 'description', 'price', 'stock', 'category', 'image')
+UPDATE_FIELDS = ['name', 'description', 'price', 'stock', 'category']
+IMAGE_DIR = 'product_images'
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp', '.gif')
+
+_sku = Product._meta.get_field('sku')
+_name = Product._meta.get_field('name')
+_price = Product._meta.get_field('price')
+PRICE_QUANTUM = Decimal(1).scaleb(-_price.decimal_places)
+MAX_PRICE = Decimal(10) ** (_price.max_digits - _price.decimal_places)
+CATEGORIES = {}
+for _key, _label in Product.CATEGORY_CHOICES:
+    CATEGORIES[_key.lower()] = CATEGORIES[_label.lower()] = _key
+
+
+class RowError(Exception):
+    pass
+
+
+def detect_format(path):
+    return 'jsonl' if path.lower().endswith(('.jsonl', '.ndjson')) else 'csv'
+
+
+def read_rows(stream, fmt):
+    """Yield (line number, dict) from a CSV (with header) or JSONL text stream"""
+    if fmt == 'csv':
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, row
+        return
+    for line_number, line in enumerate(stream, 1):
+        if line.strip():
+            try:
+                yield line_number, json.loads(line)
+            except ValueError as exc:
+                yield line_number, exc
+
+
+def batched(rows, size):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+# Column validators: each maps a raw value to the stored one or raises RowError
+
+def _text(value):
+    return '' if value is None else str(value).strip()
+
+
+def clean_sku(value):
+    value = _text(value)
+    if not value:
+        raise RowError("sku is required")
+    if len(value) > _sku.max_length:
+        raise RowError(f"sku is longer than {_sku.max_length} characters")
+    return value
+
+
+def clean_name(value):
+    value = _text(value)
+    if not value:
+        raise RowError("name is required")
+    if len(value) > _name.max_length:
+        raise RowError(f"name is longer than {_name.max_length} characters")
+    return value
+
+
+def clean_description(value):
+    return _text(value) or None
+
+
+def clean_price(value):
+    try:
+        price = Decimal(_text(value))
+    except InvalidOperation:
+        raise RowError(f"price {value!r} is not a number")
+    # NaN survives quantize() and then raises on comparison, aborting the whole import
+    if not price.is_finite():
+        raise RowError(f"price {value!r} is not a number")
+    price = price.quantize(PRICE_QUANTUM)
+    if not 0 <= price < MAX_PRICE:
+        raise RowError(f"price {value!r} is out of range")
+    return price
+
+
+def clean_stock(value):
+    value = _text(value)
+    if not value:
+        return 0
+    try:
+        stock = int(value)
+    except ValueError:
+        raise RowError(f"stock {value!r} is not a whole number")
+    if stock < 0:
+        raise RowError("stock cannot be negative")
+    return stock
+
+
+def clean_category(value):
+    try:
+        return CATEGORIES[_text(value).lower()]
+    except KeyError:
+        raise RowError(f"unknown category {value!r}")
+
+
+COLUMNS = {
+    'sku': clean_sku,
+    'name': clean_name,
+    'description': clean_description,
+    'price': clean_price,
+    'stock': clean_stock,
+    'category': clean_category,
+}
+
+
+def validate_batch(batch):
+    """Clean a batch column by column: ({sku: values}, [(line, message)])
+
+    A sku repeated within the batch keeps its last row, as a row-by-row
+    upsert would.
+    """
+    errors = {}
+    rows = []
+    for line_number, raw in batch:
+        if isinstance(raw, Exception) or not isinstance(raw, dict):
+            errors[line_number] = f"not a JSON object ({raw})"
+        else:
+            rows.append((line_number, raw))
+
+    cleaned = [{} for _ in rows]
+    for column, clean in COLUMNS.items():
+        for (line_number, raw), values in zip(rows, cleaned):
+            if line_number in errors:
+                continue
+            try:
+                values[column] = clean(raw.get(column))
+            except RowError as exc:
+                errors[line_number] = str(exc)
+    for (line_number, raw), values in zip(rows, cleaned):
+        values['image'] = _text(raw.get('image'))
+
+    valid = {}
+    for (line_number, _), values in zip(rows, cleaned):
+        if line_number not in errors:
+            valid[values['sku']] = values
+    return valid, sorted(errors.items())
+
+
+class ImageLibrary:
+    """Resolves import rows to stored image names, copying files from a local directory.
+
+    Files are stored under a content hash, so re-importing the same
+    picture reuses the stored copy instead of writing another one.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.files = {}
+        for filename in os.listdir(directory):
+            stem, extension = os.path.splitext(filename)
+            if extension.lower() in IMAGE_EXTENSIONS:
+                self.files[filename.lower()] = filename
+                self.files.setdefault(stem.lower(), filename)
+        self._stored = {}
+
+    def find(self, values):
+        """The file named by the row's image column, else one named after its sku or name"""
+        for candidate in (values['image'], values['sku'], values['name']):
+            filename = self.files.get(candidate.lower()) if candidate else None
+            if filename:
+                return filename
+        return None
+
+    def store(self, filename):
+        if filename not in self._stored:
+            with open(os.path.join(self.directory, filename), 'rb') as source:
+                data = source.read()
+            extension = os.path.splitext(filename)[1].lower()
+            name = f"{IMAGE_DIR}/{hashlib.sha1(data).hexdigest()[:16]}{extension}"
+            if not default_storage.exists(name):
+                name = default_storage.save(name, ContentFile(data))
+            self._stored[filename] = name
+        return self._stored[filename]
+
+
+def upsert_batch(valid, images=None):
+    """Insert or update one validated batch; returns the number of rows written"""
+    with_image, without_image = [], []
+    for values in valid.values():
+        if images is not None:
+            filename = images.find(values)
+            values['image'] = images.store(filename) if filename else ''
+        product = Product(**values)
+        (with_image if values['image'] else without_image).append(product)
+
+    with transaction.atomic():
+        # Rows without an image leave any existing one alone
+        if without_image:
+            Product.objects.bulk_create(
+                without_image, update_conflicts=True, unique_fields=['sku'], update_fields=UPDATE_FIELDS,
+            )
+        if with_image:
+            Product.objects.bulk_create(
+                with_image, update_conflicts=True, unique_fields=['sku'], update_fields=UPDATE_FIELDS + ['image'],
+            )
+            schedule_image_derivatives([product.sku for product in with_image])
+    return len(with_image) + len(without_image)
+
+
+def schedule_image_derivatives(skus):
+    """Queue resizing for imported products whose image is new or changed"""
+    stale = Product.objects.filter(sku__in=skus).exclude(image='').values_list('id', 'image', 'image_variants')
+    for product_id, image, variants in stale:
+        if (variants or {}).get('source') != image:
+            build_image_derivatives.enqueue(product_id=product_id)
+
+
+def import_products(stream, fmt, batch_size=5000, images=None, on_batch=None):
+    """Upsert every valid row of `stream`; returns (rows written, [(line, message)])"""
+    written = 0
+    errors = []
+    for batch in batched(read_rows(stream, fmt), batch_size):
+        valid, batch_errors = validate_batch(batch)
+        if valid:
+            written += upsert_batch(valid, images)
+        errors.extend(batch_errors)
+        if on_batch is not None:
+            on_batch(written, errors)
+    if written:
+        bump_catalog_version()
+    return written, errors
+
+
+def export_products(stream, fmt, chunk_size=5000):
+    """Write the catalog to a text stream as CSV or JSONL; returns the row count"""
+    rows = Product.objects.order_by('id').values_list(*EXPORT_FIELDS).iterator(chunk_size=chunk_size)
+    count = 0
+    if fmt == 'csv':
+        writer = csv.writer(stream)
+        writer.writerow(EXPORT_FIELDS)
+        for row in rows:
+            writer.writerow(row)
+            count += 1
+        return count
+    for row in rows:
+        stream.write(encode_row(dict(zip(EXPORT_FIELDS, row))).decode() + '\n')
+        count += 1
+    return count
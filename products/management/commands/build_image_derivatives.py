@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+
+from products.images import build_derivatives, needs_derivatives
+from products.models import Product
+
+
+class Command(BaseCommand):
+    help = "Generate missing or stale WebP/JPEG derivatives for product images"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help="Rebuild even if the variants are current")
+        parser.add_argument('ids', nargs='*', type=int, help="Only these product ids")
+
+    def handle(self, *args, **options):
+        products = Product.objects.exclude(image='', image_variants={}).order_by('id')
+        if options['ids']:
+            products = products.filter(id__in=options['ids'])
+
+        built = failed = 0
+        for product in products.iterator():
+            if not (options['force'] or needs_derivatives(product)):
+                continue
+            try:
+                build_derivatives(product)
+            except (OSError, ValueError) as exc:  # Missing file, not an image, ...
+                failed += 1
+                self.stderr.write(f"Product {product.id} ({product.image.name}): {exc}")
+            else:
+                built += 1
+
+        self.stdout.write(f"Built derivatives for {built} product(s), {failed} failed")
@@ -0,0 +1,23 @@
+
+from django.core.management.base import BaseCommand
+
+from products.importer import detect_format, export_products
+
+
+class Command(BaseCommand):
+    help = "Write the catalog as CSV or JSONL in import_products' format"
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', nargs='?', default='-', help="Output file; - (the default) for stdout")
+        parser.add_argument('--format', choices=['csv', 'jsonl'], help="Default: from the file extension, else csv")
+        parser.add_argument('--chunk-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = options['format'] or ('csv' if path == '-' else detect_format(path))
+        if path == '-':
+            count = export_products(self.stdout, fmt, options['chunk_size'])
+        else:
+            with open(path, 'w', newline='', encoding='utf-8') as stream:
+                count = export_products(stream, fmt, options['chunk_size'])
+            self.stdout.write(f"Exported {count} product(s) to {path}")
@@ -0,0 +1,45 @@
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from products.importer import ImageLibrary, detect_format, import_products
+
+
+class Command(BaseCommand):
+    help = "Upsert products by sku from a CSV or JSONL file, in batches"
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="CSV (with a header row) or JSONL file; - for stdin")
+        parser.add_argument('--format', choices=['csv', 'jsonl'], help="Default: from the file extension")
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument(
+            '--images', metavar='DIR',
+            help="Attach pictures from this directory, matched by the image column, sku or name (e.g. mywebpics/)",
+        )
+        parser.add_argument('--max-errors', type=int, default=20, help="Invalid rows to print before summarizing")
+        parser.add_argument('--strict', action='store_true', help="Fail if any row is invalid (valid batches stay written)")
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = options['format'] or ('csv' if path == '-' else detect_format(path))
+        images = ImageLibrary(options['images']) if options['images'] else None
+        started = time.monotonic()
+
+        def progress(written, errors):
+            if options['verbosity'] > 1:
+                self.stdout.write(f"  {written} rows written, {len(errors)} invalid ({time.monotonic() - started:.1f}s)")
+
+        if path == '-':
+            written, errors = import_products(sys.stdin, fmt, options['batch_size'], images, progress)
+        else:
+            with open(path, newline='', encoding='utf-8') as stream:
+                written, errors = import_products(stream, fmt, options['batch_size'], images, progress)
+
+        for line_number, message in errors[:options['max_errors']]:
+            self.stderr.write(f"line {line_number}: {message}")
+        if len(errors) > options['max_errors']:
+            self.stderr.write(f"... and {len(errors) - options['max_errors']} more")
+        self.stdout.write(f"Imported {written} product(s) in {time.monotonic() - started:.1f}s, {len(errors)} invalid row(s) skipped")
+        if errors and options['strict']:
+            raise CommandError(f"{len(errors)} invalid row(s)")
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from products.reservations import reconcile, release_expired
+
+
+class Command(BaseCommand):
+    help = "Release expired checkout holds (cron-friendly; workers also do it after each hold expires)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reconcile', action='store_true',
+                            help="Also recompute every product's reserved units from its holds")
+
+    def handle(self, *args, **options):
+        released = release_expired()
+        self.stdout.write(f"Released {released} expired hold(s)")
+        if options['reconcile']:
+            reconcile()
+            self.stdout.write("Reserved units recomputed from holds")
@@ -0,0 +1,23 @@
+from django.db import migrations
+
+
+def create_search_index(apps, schema_editor):
+    from products.search import install_fts
+    install_fts(schema_editor.connection)
+
+
+def drop_search_index(apps, schema_editor):
+    from products.search import uninstall_fts
+    uninstall_fts(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+    """SQLite FTS5 index over name + description (no-op on other databases)"""
+
+    dependencies = [
+        ('products', '0003_product_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index, elidable=True),
+    ]
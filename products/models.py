@@ -1,3 +1,4 @@
+from django.contrib.auth.models import User
 from django.db import models
 
 class Product(models.Model):
@@ -11,12 +12,40 @@ class Product(models.Model):
         ('Electrical Spare Parts', 'Electrical Spare Parts'),
     ]
 
+    sku = models.CharField(max_length=64, unique=True, null=True, blank=True)  # ✅ Upsert key for import_products
     name = models.CharField(max_length=255)
     description = models.TextField(blank=True, null=True)
     price = models.DecimalField(max_digits=10, decimal_places=2)
     stock = models.PositiveIntegerField(default=0)
+    reserved = models.PositiveIntegerField(default=0, editable=False)  # ✅ Units under checkout holds, see products.reservations
     image = models.ImageField(upload_to='product_images/', blank=True, null=True)
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)  # ✅ Resized copies, see products.images
     category = models.CharField(max_length=50, choices=CATEGORY_CHOICES)  # ✅ Category field
 
+    class Meta:
+        indexes = [
+            # ✅ Category filter + price range/sort
+            models.Index(fields=['category', 'price'], name='product_category_price_idx'),
+            # ✅ Default (price, id) ordering and keyset pagination
+            models.Index(fields=['price', 'id'], name='product_price_id_idx'),
+        ]
+
+    def __str__(self):
+        return self.name
+
+class StockHold(models.Model):
+    """Units of a product set aside for one user's checkout until `expires_at`"""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='holds')
+    quantity = models.PositiveIntegerField()
+    expires_at = models.DateTimeField(db_index=True)  # ✅ The sweeper's range scan
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            # ✅ Lazy release of a product's expired holds when it is reserved again
+            models.Index(fields=['product', 'expires_at'], name='stockhold_product_expiry_idx'),
+        ]
+
     def __str__(self):
-        return self.name
\ No newline at end of file
+        return f"{self.quantity} x {self.product_id} held for {self.user_id}"
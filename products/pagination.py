@@ -0,0 +1,145 @@
+import base64
+from decimal import Decimal, InvalidOperation
+
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+# Keyset ordering; must match ProductViewSet's default ordering
+KEYSET_ORDERING = ('price', 'id')
+
+
+class ProductPagination(PageNumberPagination):
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+
+def encode_cursor(price, pk, reverse=False):
+    raw = f"{'r' if reverse else 'f'}:{price}:{pk}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Return (price, id, reverse) or raise ValueError for a tampered cursor"""
+    padded = cursor + '=' * (-len(cursor) % 4)
+    try:
+        direction, price, pk = base64.urlsafe_b64decode(padded.encode()).decode().split(':')
+        if direction not in ('f', 'r'):
+            raise ValueError(cursor)
+        return Decimal(price), int(pk), direction == 'r'
+    except (UnicodeDecodeError, InvalidOperation, TypeError) as exc:
+        raise ValueError(cursor) from exc
+
+
+def _get(row, name):
+    return row[name] if isinstance(row, dict) else getattr(row, name)
+
+
+def _keyset_query(queryset, cursor, page_size):
+    """The page query for `cursor`: (sliced queryset, reverse)"""
+    if cursor is None:
+        price = pk = None
+        reverse = False
+    else:
+        price, pk, reverse = decode_cursor(cursor)
+
+    if reverse:
+        queryset = queryset.order_by('-price', '-id')
+        if price is not None:
+            queryset = queryset.filter(Q(price__lt=price) | Q(price=price, id__lt=pk))
+    else:
+        queryset = queryset.order_by(*KEYSET_ORDERING)
+        if price is not None:
+            queryset = queryset.filter(Q(price__gt=price) | Q(price=price, id__gt=pk))
+
+    # One extra row tells us whether another page exists in this direction
+    return queryset[:page_size + 1], reverse
+
+
+def _keyset_result(rows, cursor, page_size, reverse):
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+    if reverse:
+        rows.reverse()
+
+    if not rows:
+        return rows, None, None
+
+    first, last = rows[0], rows[-1]
+    has_next = has_more if not reverse else True
+    has_previous = has_more if reverse else cursor is not None
+    next_cursor = encode_cursor(_get(last, 'price'), _get(last, 'id')) if has_next else None
+    previous_cursor = encode_cursor(_get(first, 'price'), _get(first, 'id'), reverse=True) if has_previous else None
+    return rows, next_cursor, previous_cursor
+
+
+def keyset_page(queryset, cursor, page_size):
+    """Fetch one page seeking on (price, id) instead of scanning an OFFSET.
+
+    Returns (rows, next_cursor, previous_cursor). Works on model and
+    ``.values()`` querysets alike.
+    """
+    query, reverse = _keyset_query(queryset, cursor, page_size)
+    return _keyset_result(list(query), cursor, page_size, reverse)
+
+
+async def akeyset_page(queryset, cursor, page_size):
+    """keyset_page for async views"""
+    query, reverse = _keyset_query(queryset, cursor, page_size)
+    return _keyset_result([row async for row in query], cursor, page_size, reverse)
+
+
+class ProductCursorPagination(BasePagination):
+    """Keyset pagination on (price, id), constant cost however deep the page"""
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    page_size = ProductPagination.page_size
+    max_page_size = ProductPagination.max_page_size
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except (TypeError, ValueError):
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        cursor = request.query_params.get(self.cursor_query_param) or None
+        try:
+            rows, self.next_cursor, self.previous_cursor = keyset_page(queryset, cursor, self.get_page_size(request))
+        except ValueError:
+            raise NotFound("Invalid cursor")
+        return rows
+
+    def get_link(self, cursor):
+        if cursor is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, cursor)
+
+    def get_next_link(self):
+        return self.get_link(self.next_cursor)
+
+    def get_previous_link(self):
+        return self.get_link(self.previous_cursor)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
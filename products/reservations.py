@@ -0,0 +1,209 @@
+"""Checkout holds: stock set aside for a user between the payment page and the order.
+
+``Product.reserved`` is the sum of the product's ``StockHold`` rows, so
+"available" is ``stock - reserved``. Every change is one conditional
+UPDATE per statement, like order.checkout's stock decrement::
+
+    from products.reservations import hold, available
+
+    expires_at = hold(user, {product_id: 2})  # raises InsufficientStock
+    available([product_id])                   # {product_id: units}, cached
+
+Holds are consumed by ``order.checkout`` when the order is created,
+replaced when the user reserves again, and released once they expire:
+lazily when someone reserves the same product, and by the
+``release_expired_holds`` job queued for just after they expire (one job
+for every reservation expiring within the same SWEEP_SLACK).
+"""
+import datetime
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from ecommerce.cache import region
+from jobs.queue import queued_between
+from jobs.registry import task
+
+from .cache import bump_catalog_version
+from .models import Product, StockHold
+
+RELEASE_BATCH = 1000
+SWEEP_SLACK = datetime.timedelta(seconds=1)  # A queued sweep this soon after a hold expires also releases it
+
+
+class InsufficientStock(Exception):
+    def __init__(self, products):
+        self.products = products
+        names = ", ".join(p.name for p in products)
+        super().__init__(f"Not enough stock for {names}")
+
+
+def stock_cache():
+    return region("stock")
+
+
+def per_product(quantities):
+    """A CASE mapping each product id in `quantities` to its quantity (0 for any other)"""
+    return Case(
+        *[When(id=product_id, then=Value(qty)) for product_id, qty in quantities.items()],
+        default=Value(0),
+        output_field=IntegerField(),
+    )
+
+
+def forget_availability(product_ids, catalog=True):
+    """Drop cached availability once the transaction that changed it commits.
+
+    Catalog pages show ``stock`` and ``reserved`` too, so the catalog
+    version is bumped with it (``catalog=False`` when the caller bumps it
+    anyway, like the Product signals).
+    """
+    keys = [f"available:{product_id}" for product_id in product_ids]
+    if keys:
+        def commit():
+            stock_cache().delete_many(keys)
+            if catalog:
+                bump_catalog_version()
+        transaction.on_commit(commit)
+
+
+def available(product_ids):
+    """{product_id: stock - reserved}, from the "stock" region, one query for the misses"""
+    product_ids = list(product_ids)
+    cached = stock_cache().get_many([f"available:{product_id}" for product_id in product_ids])
+    result = {product_id: cached[f"available:{product_id}"] for product_id in product_ids
+              if f"available:{product_id}" in cached}
+    missing = [product_id for product_id in product_ids if product_id not in result]
+    if missing:
+        fresh = dict(
+            Product.objects.filter(id__in=missing)
+            .annotate(available=F('stock') - F('reserved')).values_list('id', 'available')
+        )
+        stock_cache().set_many({f"available:{product_id}": max(units, 0) for product_id, units in fresh.items()})
+        result.update({product_id: max(units, 0) for product_id, units in fresh.items()})
+    return result
+
+
+def _release(holds):
+    """Delete `holds` ((id, product_id, quantity) rows) and give their units back"""
+    if not holds:
+        return
+    released = {}
+    for _, product_id, quantity in holds:
+        released[product_id] = released.get(product_id, 0) + quantity
+    StockHold.objects.filter(id__in=[hold_id for hold_id, _, _ in holds]).delete()
+    Product.objects.filter(id__in=released).update(reserved=F('reserved') - per_product(released))
+    forget_availability(released)
+
+
+def _locked(holds):
+    return list(holds.select_for_update().values_list('id', 'product_id', 'quantity'))
+
+
+def user_holds(user):
+    return StockHold.objects.filter(user_id=user.id)
+
+
+def release_user_holds(user):
+    with transaction.atomic():
+        _release(_locked(user_holds(user)))
+
+
+def release_expired(now=None, product_ids=None):
+    """Release holds past their expiry (only those on `product_ids`, if given); returns how many"""
+    now = now or timezone.now()
+    expired = StockHold.objects.filter(expires_at__lte=now)
+    if product_ids is not None:
+        expired = expired.filter(product_id__in=product_ids)
+    count = 0
+    while True:
+        with transaction.atomic():
+            holds = _locked(expired.order_by('expires_at')[:RELEASE_BATCH])
+            _release(holds)
+        count += len(holds)
+        if len(holds) < RELEASE_BATCH:
+            return count
+
+
+@task(priority=5)
+def release_expired_holds():
+    """The sweeper: queued to run just after each batch of holds expires"""
+    release_expired()
+
+
+def hold(user, quantities, ttl=None):
+    """Hold `quantities` ({product_id: qty}) for `user`, replacing their previous holds.
+
+    All or nothing: raises InsufficientStock (holding nothing new) if any
+    product's available stock can't cover it. Returns the expiry time.
+    """
+    ttl = ttl or getattr(settings, 'STOCK_HOLD_SECONDS', 600)
+    expires_at = timezone.now() + datetime.timedelta(seconds=ttl)
+    try:
+        with transaction.atomic():
+            _release(_locked(user_holds(user)))
+            release_expired(product_ids=list(quantities))
+            # Check and reserve in one statement: concurrent holds on a hot SKU can't oversell it
+            needed = per_product(quantities)
+            reserved = Product.objects.filter(id__in=quantities, stock__gte=F('reserved') + needed).update(
+                reserved=F('reserved') + needed,
+            )
+            if reserved != len(quantities):
+                raise InsufficientStock([])
+            StockHold.objects.bulk_create([
+                StockHold(user_id=user.id, product_id=product_id, quantity=qty, expires_at=expires_at)
+                for product_id, qty in quantities.items()
+            ])
+            forget_availability(quantities)
+            if not queued_between(release_expired_holds.name, expires_at, expires_at + SWEEP_SLACK):
+                release_expired_holds.enqueue(delay=ttl + SWEEP_SLACK.total_seconds())
+    except InsufficientStock:
+        short = [
+            product for product in Product.objects.filter(id__in=quantities)
+            if product.stock - product.reserved < quantities[product.id]
+        ]
+        raise InsufficientStock(short)
+    return expires_at
+
+
+def consume(user, quantities):
+    """Take `quantities` off stock, using up `user`'s holds; call inside the order's transaction.
+
+    Held units count as available to their holder, whatever the holds
+    cover is also released, and the check and the write share one
+    conditional UPDATE. Returns False if any product falls short; the
+    caller then rolls the transaction back.
+    """
+    holds = _locked(user_holds(user))
+    held = {}
+    for _, product_id, quantity in holds:
+        held[product_id] = held.get(product_id, 0) + quantity
+    product_ids = set(quantities) | set(held)
+    needed, freed = per_product(quantities), per_product(held)
+
+    updated = Product.objects.filter(id__in=product_ids, stock__gte=F('reserved') - freed + needed).update(
+        stock=F('stock') - needed, reserved=F('reserved') - freed,
+    )
+    if updated != len(product_ids):
+        return False
+    if holds:
+        StockHold.objects.filter(id__in=[hold_id for hold_id, _, _ in holds]).delete()
+    forget_availability(product_ids)
+    return True
+
+
+def reconcile(product_ids=None):
+    """Recompute `reserved` from the holds, e.g. after holds were deleted by a user cascade"""
+    held = StockHold.objects.filter(product=OuterRef('pk')).values('product').annotate(units=Sum('quantity'))
+    products = Product.objects.all() if product_ids is None else Product.objects.filter(id__in=product_ids)
+    with transaction.atomic():
+        changed = list(products.filter(reserved__gt=0).values_list('id', flat=True)) + list(
+            StockHold.objects.values_list('product_id', flat=True).distinct()
+        )
+        products.filter(id__in=changed).update(
+            reserved=Coalesce(Subquery(held.values('units'), output_field=IntegerField()), 0),
+        )
+        forget_availability(changed)
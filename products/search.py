@@ -0,0 +1,376 @@
+"""Product search over name + description.
+
+Two interchangeable backends:
+
+* ``SQLiteFTSBackend`` uses the FTS5 table created by migration 0004.
+  Triggers keep it in sync with ``products_product``, bulk writes included.
+* ``InvertedIndexBackend`` is an in-process BM25 index for other
+  databases. Product signals keep it in sync, and it rebuilds itself when
+  the catalog version shows another process changed the catalog.
+
+Both rank results, match prefixes (as-you-type), tolerate small typos and
+return category facets. ``get_search_backend()`` picks one according to
+``settings.PRODUCT_SEARCH_BACKEND`` ("auto", "fts5" or "memory").
+"""
+import math
+import re
+import threading
+import unicodedata
+from bisect import bisect_left
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.db import connection
+from django.db.models.expressions import RawSQL
+
+from .cache import get_catalog_version
+from .models import Product
+
+FTS_TABLE = 'products_search'
+FTS_VOCAB_TABLE = 'products_search_vocab'
+
+NAME_WEIGHT = 3.0  # A hit in the name counts as much as three in the description
+PREFIX_WEIGHT = 0.8
+FUZZY_WEIGHT = 0.5
+MAX_EXPANSIONS = 20  # Terms a single prefix/typo may expand to
+
+_WORD_RE = re.compile(r'\w+')
+
+
+def tokenize(text):
+    """Lowercase words with diacritics stripped, matching FTS5's unicode61 tokenizer"""
+    if not text:
+        return []
+    text = unicodedata.normalize('NFKD', text)
+    text = ''.join(ch for ch in text if not unicodedata.combining(ch))
+    return _WORD_RE.findall(text.lower())
+
+
+def max_typos(term):
+    if len(term) < 4:
+        return 0
+    return 1 if len(term) < 8 else 2
+
+
+def edit_distance(a, b, limit):
+    """Levenshtein distance, giving up early once it exceeds `limit`"""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb)))
+        if min(current) > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+
+def close_terms(term, candidates):
+    """Vocabulary terms within the typo budget of `term`"""
+    limit = max_typos(term)
+    if not limit:
+        return []
+    return [c for c in candidates if c != term and edit_distance(term, c, limit) <= limit][:MAX_EXPANSIONS]
+
+
+class SearchResult:
+    def __init__(self, ids, total, facets):
+        self.ids = ids  # Ranked product ids for the requested window
+        self.total = total
+        self.facets = facets  # {category: count} over every match, ignoring the category filter
+
+
+FTS_SCHEMA = [
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+    f"name, description, content='products_product', content_rowid='id', "
+    f"tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_VOCAB_TABLE} USING fts5vocab({FTS_TABLE}, 'row')",
+]
+FTS_TRIGGERS = {
+    'products_search_ai': (
+        f"AFTER INSERT ON products_product BEGIN "
+        f"INSERT INTO {FTS_TABLE}(rowid, name, description) VALUES (new.id, new.name, new.description); END"
+    ),
+    'products_search_ad': (
+        f"AFTER DELETE ON products_product BEGIN "
+        f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name, description) "
+        f"VALUES ('delete', old.id, old.name, old.description); END"
+    ),
+    'products_search_au': (
+        f"AFTER UPDATE OF name, description ON products_product BEGIN "
+        f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name, description) "
+        f"VALUES ('delete', old.id, old.name, old.description); "
+        f"INSERT INTO {FTS_TABLE}(rowid, name, description) VALUES (new.id, new.name, new.description); END"
+    ),
+}
+
+
+def install_fts(conn):
+    """Create the FTS5 table and its sync triggers if missing; a no-op off SQLite.
+
+    Safe to run repeatedly. SQLite migrations that rebuild products_product
+    drop its triggers, so this also runs after every migrate. The index is
+    rebuilt whenever a trigger had to be recreated.
+    """
+    if conn.vendor != 'sqlite':
+        return False
+    with conn.cursor() as cursor:
+        try:
+            for statement in FTS_SCHEMA:
+                cursor.execute(statement)
+        except Exception:  # SQLite built without FTS5: the in-memory index takes over
+            return False
+        cursor.execute("SELECT name FROM sqlite_master WHERE type = 'trigger'")
+        existing = {row[0] for row in cursor.fetchall()}
+        missing = [name for name in FTS_TRIGGERS if name not in existing]
+        for name in missing:
+            cursor.execute(f"CREATE TRIGGER {name} {FTS_TRIGGERS[name]}")
+        if missing:
+            cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+    _fts_tables.pop(conn.settings_dict['NAME'], None)
+    return True
+
+
+def uninstall_fts(conn):
+    if conn.vendor != 'sqlite':
+        return
+    with conn.cursor() as cursor:
+        for name in FTS_TRIGGERS:
+            cursor.execute(f"DROP TRIGGER IF EXISTS {name}")
+        cursor.execute(f"DROP TABLE IF EXISTS {FTS_VOCAB_TABLE}")
+        cursor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+    _fts_tables.pop(conn.settings_dict['NAME'], None)
+
+
+_fts_tables = {}  # Database name -> whether the FTS table exists
+
+
+class SQLiteFTSBackend:
+    name = 'fts5'
+
+    @staticmethod
+    def is_available():
+        if connection.vendor != 'sqlite':
+            return False
+        name = connection.settings_dict['NAME']
+        if name not in _fts_tables:
+            _fts_tables[name] = FTS_TABLE in connection.introspection.table_names()
+        return _fts_tables[name]
+
+    def _vocab_near(self, cursor, term):
+        # Typos rarely hit the first letter; this keeps the candidate scan small
+        cursor.execute(
+            f"SELECT term FROM {FTS_VOCAB_TABLE} WHERE term >= %s AND term < %s AND length(term) BETWEEN %s AND %s",
+            [term[0], chr(ord(term[0]) + 1), len(term) - 2, len(term) + 2],
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+    def match_expression(self, query):
+        """FTS5 MATCH string: every token must match exactly, as a prefix, or within a typo"""
+        tokens = tokenize(query)
+        if not tokens:
+            return None
+        clauses = []
+        with connection.cursor() as cursor:
+            for token in tokens:
+                options = [f'"{token}"*']
+                cursor.execute(
+                    f"SELECT 1 FROM {FTS_VOCAB_TABLE} WHERE term >= %s AND term < %s LIMIT 1",
+                    [token, token + '\uffff'],
+                )
+                if cursor.fetchone() is None:
+                    options += [f'"{term}"' for term in close_terms(token, self._vocab_near(cursor, token))]
+                clauses.append('(' + ' OR '.join(options) + ')')
+        return ' AND '.join(clauses)
+
+    def search(self, query, category=None, limit=20, offset=0):
+        expression = self.match_expression(query)
+        if expression is None:
+            return SearchResult([], 0, {})
+        table = Product._meta.db_table
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT p.category, count(*) FROM {FTS_TABLE} s JOIN {table} p ON p.id = s.rowid "
+                f"WHERE {FTS_TABLE} MATCH %s GROUP BY p.category",
+                [expression],
+            )
+            facets = dict(cursor.fetchall())
+
+            where, params = f"{FTS_TABLE} MATCH %s", [expression]
+            if category:
+                where += " AND p.category = %s"
+                params.append(category)
+            cursor.execute(
+                f"SELECT s.rowid FROM {FTS_TABLE} s JOIN {table} p ON p.id = s.rowid WHERE {where} "
+                f"ORDER BY bm25({FTS_TABLE}, {NAME_WEIGHT}, 1.0) LIMIT %s OFFSET %s",
+                params + [limit, offset],
+            )
+            ids = [row[0] for row in cursor.fetchall()]
+        total = facets.get(category, 0) if category else sum(facets.values())
+        return SearchResult(ids, total, facets)
+
+    def filter(self, queryset, query):
+        expression = self.match_expression(query)
+        if expression is None:
+            return queryset
+        # Stays a single SQL query: the match becomes an id subquery
+        return queryset.filter(id__in=RawSQL(f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s", [expression]))
+
+    def sync(self, product, deleted=False, version=None):
+        pass  # The FTS triggers already did it
+
+    def rebuild(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+
+
+class InvertedIndexBackend:
+    """BM25 over an in-memory postings map; built lazily from the DB on first use"""
+    name = 'memory'
+    k1 = 1.2
+    b = 0.75
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.version = None
+        self.reset()
+
+    def reset(self):
+        self.postings = defaultdict(dict)  # term -> {product_id: weighted tf}
+        self.doc_terms = {}  # product_id -> {term: weighted tf}
+        self.doc_length = {}
+        self.categories = {}
+        self.total_length = 0.0
+        self._sorted_terms = None
+
+    def _document(self, name, description):
+        terms = Counter()
+        for token in tokenize(name):
+            terms[token] += NAME_WEIGHT
+        for token in tokenize(description):
+            terms[token] += 1.0
+        return terms
+
+    def _remove(self, product_id):
+        terms = self.doc_terms.pop(product_id, None)
+        if terms is None:
+            return
+        for term in terms:
+            postings = self.postings[term]
+            postings.pop(product_id, None)
+            if not postings:
+                del self.postings[term]
+                self._sorted_terms = None
+        self.total_length -= self.doc_length.pop(product_id)
+        self.categories.pop(product_id, None)
+
+    def _add(self, product_id, name, description, category):
+        terms = self._document(name, description)
+        self.doc_terms[product_id] = terms
+        self.doc_length[product_id] = length = sum(terms.values())
+        self.total_length += length
+        self.categories[product_id] = category
+        for term, weight in terms.items():
+            if term not in self.postings:
+                self._sorted_terms = None
+            self.postings[term][product_id] = weight
+
+    def rebuild(self):
+        with self.lock:
+            version = get_catalog_version()
+            self.reset()
+            rows = Product.objects.values_list('id', 'name', 'description', 'category')
+            for product_id, name, description, category in rows.iterator(chunk_size=2000):
+                self._add(product_id, name, description, category)
+            self.version = version
+
+    def sync(self, product, deleted=False, version=None):
+        """Apply one product change; `version` is the catalog version it produced"""
+        with self.lock:
+            if self.version is None:
+                return  # Not built yet; the first search loads everything
+            self._remove(product.id)
+            if not deleted:
+                self._add(product.id, product.name, product.description, product.category)
+            if version is not None and version == self.version + 1:
+                self.version = version  # Ours was the only change since the last sync
+
+    def _ensure_fresh(self):
+        if self.version != get_catalog_version():
+            self.rebuild()
+
+    def _sorted(self):
+        if self._sorted_terms is None:
+            self._sorted_terms = sorted(self.postings)
+        return self._sorted_terms
+
+    def expand(self, token):
+        """[(term, weight)] for the exact term, its prefix completions and near misses"""
+        terms = self._sorted()
+        expansions = []
+        start = bisect_left(terms, token)
+        for term in terms[start:start + MAX_EXPANSIONS]:
+            if not term.startswith(token):
+                break
+            expansions.append((term, 1.0 if term == token else PREFIX_WEIGHT))
+        if not expansions:
+            first = token[0]
+            lo, hi = bisect_left(terms, first), bisect_left(terms, chr(ord(first) + 1))
+            expansions = [(term, FUZZY_WEIGHT) for term in close_terms(token, terms[lo:hi])]
+        return expansions
+
+    def _score(self, query):
+        tokens = tokenize(query)
+        if not tokens:
+            return {}
+        n_docs = len(self.doc_terms) or 1
+        avg_length = self.total_length / n_docs if self.total_length else 1.0
+        scores = None
+        for token in tokens:
+            token_scores = defaultdict(float)
+            for term, weight in self.expand(token):
+                postings = self.postings[term]
+                idf = math.log(1 + (n_docs - len(postings) + 0.5) / (len(postings) + 0.5))
+                for product_id, tf in postings.items():
+                    norm = tf + self.k1 * (1 - self.b + self.b * self.doc_length[product_id] / avg_length)
+                    token_scores[product_id] += weight * idf * tf * (self.k1 + 1) / norm
+            if scores is None:
+                scores = dict(token_scores)
+            else:
+                # Every token has to match
+                scores = {pid: s + token_scores[pid] for pid, s in scores.items() if pid in token_scores}
+            if not scores:
+                break
+        return scores or {}
+
+    def search(self, query, category=None, limit=20, offset=0):
+        with self.lock:
+            self._ensure_fresh()
+            scores = self._score(query)
+            facets = dict(Counter(self.categories[pid] for pid in scores))
+            if category:
+                scores = {pid: s for pid, s in scores.items() if self.categories[pid] == category}
+        ranked = sorted(scores, key=lambda pid: (-scores[pid], pid))
+        return SearchResult(ranked[offset:offset + limit], len(ranked), facets)
+
+    def filter(self, queryset, query):
+        if not tokenize(query):
+            return queryset
+        with self.lock:
+            self._ensure_fresh()
+            ids = list(self._score(query))
+        return queryset.filter(id__in=ids)
+
+
+_memory_backend = InvertedIndexBackend()
+
+
+def get_search_backend():
+    choice = getattr(settings, 'PRODUCT_SEARCH_BACKEND', 'auto')
+    if choice == 'memory':
+        return _memory_backend
+    if choice == 'fts5' or SQLiteFTSBackend.is_available():
+        return SQLiteFTSBackend()
+    return _memory_backend
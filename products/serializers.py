@@ -1,16 +1,30 @@
 from rest_framework import serializers
 from django.conf import settings
+from ecommerce.serializers import Column, RowSerializer
+from .images import media_url, srcset, srcset_for
 from .models import Product
 
 class ProductSerializer(serializers.ModelSerializer):
     image = serializers.SerializerMethodField()  # This ensures a full URL is returned
+    image_srcset = serializers.SerializerMethodField()  # {"webp": "url 160w, ...", "jpeg": ...}
 
     class Meta:
         model = Product
-        fields = '__all__' # Or explicitly list the fields: ['id', 'name', 'image']
+        exclude = ['image_variants']
 
     def get_image(self, obj):
-        request = self.context.get('request')
         if obj.image:
-             return f"http://127.0.0.1:8000{obj.image.url}"
-        return None
\ No newline at end of file
+            return media_url(obj.image.name, self.context.get('request'))
+        return None
+
+    def get_image_srcset(self, obj):
+        return srcset(obj, self.context.get('request'))
+
+
+def product_rows(context):
+    """ProductSerializer over .values() rows, for the read-only list fast path"""
+    request = context.get('request')
+    return RowSerializer(ProductSerializer(context=context), overrides={
+        'image': Column('image', fn=lambda name: media_url(name, request) if name else None),
+        'image_srcset': Column('image', 'image_variants', fn=lambda name, variants: srcset_for(name, variants, request)),
+    })
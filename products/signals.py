@@ -0,0 +1,39 @@
+from django.db import connections, transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .cache import bump_catalog_version
+from .models import Product
+from .reservations import forget_availability
+from .search import get_search_backend, install_fts
+from .tasks import schedule_derivatives
+
+
+def _on_product_change(instance, deleted):
+    if deleted:
+        # delete() clears instance.pk before on_commit callbacks run
+        instance = Product(id=instance.pk)
+
+    def commit():
+        # Bump the catalog version once the change is committed, then let the search index catch up
+        version = bump_catalog_version()
+        get_search_backend().sync(instance, deleted=deleted, version=version)
+    transaction.on_commit(commit)
+    forget_availability([instance.pk], catalog=False)  # ✅ Stock may have been edited; commit() bumps the catalog
+
+
+@receiver(post_save, sender=Product)
+def product_saved(sender, instance, **kwargs):
+    _on_product_change(instance, deleted=False)
+    schedule_derivatives(instance)  # ✅ Thumbnails for a new or replaced image, built by a worker
+
+
+@receiver(post_delete, sender=Product)
+def product_deleted(sender, instance, **kwargs):
+    _on_product_change(instance, deleted=True)
+
+
+def ensure_search_index(sender, using, **kwargs):
+    """SQLite table rebuilds in later migrations drop the FTS triggers; put them back"""
+    if Product._meta.db_table in connections[using].introspection.table_names():
+        install_fts(connections[using])
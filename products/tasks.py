@@ -0,0 +1,19 @@
+from jobs.registry import task
+
+from .images import build_derivatives, needs_derivatives
+from .models import Product
+from .reservations import release_expired_holds  # noqa: F401  Registered here for the workers
+
+
+@task(priority=5)
+def build_image_derivatives(product_id):
+    """Resize a product's image; a no-op if the product is gone or already current"""
+    product = Product.objects.filter(pk=product_id).first()
+    if product is not None and needs_derivatives(product):
+        build_derivatives(product)
+
+
+def schedule_derivatives(product):
+    """Queue the derivatives if the image changed (the job commits with the product)"""
+    if needs_derivatives(product):
+        build_image_derivatives.enqueue(product_id=product.pk)
@@ -1,3 +1,580 @@
-from django.test import TestCase
+import gzip
+import json
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from decimal import Decimal
+from io import BytesIO, StringIO
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import RequestFactory, TestCase, override_settings
+from django.utils import timezone
+from PIL import Image
+
+from ecommerce.media import serve_media
+from ecommerce.testing import QueryCountMixin
+from jobs.models import Job
+from jobs.worker import run_pending
+
+from .cache import get_catalog_version
+from .images import srcset
+from .models import Product, StockHold
+from .reservations import InsufficientStock, available, hold, reconcile, release_expired, release_user_holds
+from .search import SQLiteFTSBackend
+
+
+class CatalogCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        Product.objects.create(name="Smart TV", price=30000, stock=5, category="Entertainment")
+
+    def test_revalidation_returns_304_without_queries(self):
+        response = self.client.get("/api/products/")
+        self.assertEqual(response.status_code, 200)
+        etag = response["ETag"]
+
+        with self.assertNumQueries(0):
+            response = self.client.get("/api/products/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_product_change_invalidates_catalog(self):
+        etag = self.client.get("/api/products/")["ETag"]
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Product.objects.create(name="Radio", price=500, stock=2, category="Entertainment")
+
+        response = self.client.get("/api/products/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+        self.assertEqual(response.json()["count"], 2)
+
+    def test_equivalent_filters_share_an_etag(self):
+        first = self.client.get("/api/products/", {"category": "Entertainment"})
+        second = self.client.get("/api/products/", {"category": "entertainment", "name": ""})
+        self.assertEqual(first["ETag"], second["ETag"])
+
+
+class ProductPaginationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        # Duplicate prices make sure the keyset tie-breaks on id
+        Product.objects.bulk_create([
+            Product(name=f"Item {i}", price=100 + i // 3, stock=1, category="Accessories") for i in range(25)
+        ])
+        self.ordered_ids = list(Product.objects.order_by("price", "id").values_list("id", flat=True))
+
+    def test_page_number_pagination_applies(self):
+        data = self.client.get("/api/products/", {"page": 2}).json()
+        self.assertEqual(data["count"], 25)
+        self.assertEqual([p["id"] for p in data["results"]], self.ordered_ids[10:20])
+
+    def test_cursor_pagination_walks_forward_and_back(self):
+        data = self.client.get("/api/products/", {"pagination": "cursor", "page_size": 10}).json()
+        seen = [p["id"] for p in data["results"]]
+        self.assertIsNone(data["previous"])
+        while data["next"]:
+            data = self.client.get(data["next"]).json()
+            seen += [p["id"] for p in data["results"]]
+        self.assertEqual(seen, self.ordered_ids)
+
+        back = self.client.get(data["previous"]).json()
+        self.assertEqual([p["id"] for p in back["results"]], self.ordered_ids[10:20])
+
+    def test_get_products_is_paged(self):
+        data = self.client.get("/api/products-list/", {"page_size": 5}).json()
+        self.assertEqual(data["count"], 25)
+        self.assertEqual(len(data["results"]), 5)
+
+        data = self.client.get("/api/products-list/", {"pagination": "cursor", "page_size": 20}).json()
+        data = self.client.get(data["next"]).json()
+        self.assertEqual([p["id"] for p in data["results"]], self.ordered_ids[20:])
+        self.assertIsNone(data["next"])
+
+
+class ProductQueryCountTests(QueryCountMixin, TestCase):
+    def add_products(self, count):
+        Product.objects.bulk_create([
+            Product(name=f"Item {i}", price=100 + i, stock=1, category="Accessories") for i in range(count)
+        ])
+
+    def test_list(self):
+        def call():
+            cache.clear()  # Measure the uncached path
+            return self.client.get("/api/products/")
+
+        self.add_products(3)
+        # Count + page
+        self.assertConstantQueries(call, lambda: self.add_products(50), expected=2)
+
+
+class SearchTestsMixin:
+    def setUp(self):
+        cache.clear()
+        with self.captureOnCommitCallbacks(execute=True):
+            Product.objects.create(name="Samsung Smart TV", description="55 inch 4K television",
+                                   price=30000, stock=3, category="Entertainment")
+            Product.objects.create(name="TV wall bracket", description="Fits any smart TV up to 65 inch",
+                                   price=2000, stock=10, category="Accessories")
+            Product.objects.create(name="Steam mopper", description="Cleans tiles", price=4000, stock=4,
+                                   category="Cleaning Tools")
+
+    def search(self, **params):
+        return self.client.get("/api/products/search/", params).json()
+
+    def test_ranks_name_hits_first(self):
+        data = self.search(q="smart tv")
+        self.assertEqual([p["name"] for p in data["results"]], ["Samsung Smart TV", "TV wall bracket"])
+        self.assertEqual(data["facets"]["category"], {"Entertainment": 1, "Accessories": 1})
+
+    def test_prefix_and_typo(self):
+        self.assertEqual(self.search(q="televi")["count"], 1)
+        self.assertEqual(self.search(q="moper")["results"][0]["name"], "Steam mopper")
+
+    def test_category_filter_keeps_facets(self):
+        data = self.search(q="tv", category="accessories")
+        self.assertEqual(data["count"], 1)
+        self.assertEqual(len(data["facets"]["category"]), 2)
+
+    def test_index_follows_product_changes(self):
+        product = Product.objects.get(name="Steam mopper")
+        with self.captureOnCommitCallbacks(execute=True):
+            product.name = "Vacuum cleaner"
+            product.save()
+        self.assertEqual(self.search(q="mopper")["count"], 0)
+        self.assertEqual(self.search(q="vacuum")["count"], 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            product.delete()
+        self.assertEqual(self.search(q="vacuum")["count"], 0)
+
+    def test_name_filter_uses_index(self):
+        data = self.client.get("/api/products/", {"name": "bracket"}).json()
+        self.assertEqual([p["name"] for p in data["results"]], ["TV wall bracket"])
+
+
+class FTSSearchTests(SearchTestsMixin, TestCase):
+    def setUp(self):
+        if not SQLiteFTSBackend.is_available():
+            self.skipTest("SQLite FTS5 is not available")
+        super().setUp()
+
+
+@override_settings(PRODUCT_SEARCH_BACKEND="memory")
+class InvertedIndexSearchTests(SearchTestsMixin, TestCase):
+    pass
+
+
+def png_upload(name="photo.png", size=(800, 400)):
+    buffer = BytesIO()
+    Image.new("RGBA", size, (200, 30, 30, 128)).save(buffer, "PNG")
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type="image/png")
+
+
+class ImageDerivativeTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=media_root, MEDIA_CDN_URL="", PRODUCT_IMAGE_WIDTHS=(160, 320, 1280))
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def create(self, image):
+        with self.captureOnCommitCallbacks(execute=True):
+            product = Product.objects.create(name="Radio", price=500, stock=2, category="Entertainment", image=image)
+        run_pending()  # What a worker would do
+        product.refresh_from_db()
+        return product
+
+    def test_upload_builds_hashed_derivatives(self):
+        product = self.create(png_upload())
+        variants = product.image_variants
+
+        self.assertEqual(variants["source"], product.image.name)
+        # Never upscaled: 1280 is capped at the 800px original
+        self.assertEqual(sorted(variants["webp"], key=int), ["160", "320", "800"])
+        for fmt in ("webp", "jpeg"):
+            for width, name in variants[fmt].items():
+                self.assertRegex(name, rf"^product_images/derived/[0-9a-f]{{16}}\.{width}w\.(webp|jpg)$")
+                with default_storage.open(name) as stored, Image.open(stored) as image:
+                    self.assertEqual(image.width, int(width))
+
+    def test_serializer_returns_srcset(self):
+        self.create(png_upload())
+        product = self.client.get("/api/products/").json()["results"][0]
+
+        self.assertTrue(product["image"].startswith("http://testserver/media/product_images/"))
+        self.assertNotIn("image_variants", product)
+        webp = product["image_srcset"]["webp"].split(", ")
+        self.assertEqual(len(webp), 3)
+        self.assertRegex(webp[0], r"^http://testserver/media/product_images/derived/\w+\.160w\.webp 160w$")
+
+    @override_settings(MEDIA_CDN_URL="https://cdn.example.com/media/")
+    def test_cdn_origin(self):
+        product = self.create(png_upload())
+        self.assertTrue(srcset(product)["jpeg"].startswith("https://cdn.example.com/media/product_images/derived/"))
+
+    def test_upload_queues_a_job(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            product = Product.objects.create(name="Radio", price=500, stock=2, category="Entertainment", image=png_upload())
+        job = Job.objects.get()
+        self.assertEqual((job.task, job.kwargs), ("products.tasks.build_image_derivatives", {"product_id": product.id}))
+        self.assertEqual(Product.objects.get(id=product.id).image_variants, {})  # Nothing built on the request path
+
+    def test_unchanged_image_is_not_rebuilt(self):
+        product = self.create(png_upload())
+        product.stock = 3
+        product.save()
+        self.assertFalse(Job.objects.filter(status=Job.QUEUED).exists())
+
+    def test_bad_upload_does_not_fail_the_save(self):
+        upload = SimpleUploadedFile("broken.png", b"not an image", content_type="image/png")
+        with self.assertLogs("jobs.worker", "ERROR"):
+            product = self.create(upload)
+        self.assertEqual(product.image_variants, {})
+        self.assertEqual(srcset(product), {})
+        job = Job.objects.get()
+        self.assertEqual((job.status, job.attempts), (Job.QUEUED, 1))  # Retried later, with backoff
+        self.assertIn("UnidentifiedImageError", job.last_error)
+
+    def test_derivatives_are_served_immutable(self):
+        product = self.create(png_upload())
+        name = product.image_variants["webp"]["160"]
+        response = serve_media(RequestFactory().get(f"/media/{name}"), name)
+        self.assertEqual(response["Cache-Control"], "public, max-age=31536000, immutable")
+        original = serve_media(RequestFactory().get(f"/media/{product.image.name}"), product.image.name)
+        self.assertFalse(original.has_header("Cache-Control"))
+
+
+class AsyncCatalogTests(TestCase):
+    """The async endpoints must serve exactly what the DRF ones do"""
+
+    def setUp(self):
+        cache.clear()
+        for i in range(25):
+            Product.objects.create(
+                name=f"Speaker {i}", description="Loud", price=100 + (i % 7) * 10, stock=3,
+                category="Entertainment" if i % 2 else "Kitchenware",
+            )
+
+    def assertSameResponse(self, query):
+        cache.clear()
+        sync = self.client.get("/api/products/", query)
+        cache.clear()
+        async_ = self.client.get("/api/async/products/", query)
+        self.assertEqual(async_.status_code, sync.status_code, query)
+        self.assertEqual(async_.content.replace(b"/api/async/products/", b"/api/products/"), sync.content, query)
+        return async_
+
+    def test_list_matches_drf(self):
+        for query in (
+            {}, {"page": 2}, {"page": "last"}, {"page_size": 7, "page": 3}, {"page_size": 0},
+            {"category": "kitchenware", "price_min": 120}, {"name": "speaker"},
+            {"page": 99}, {"price_min": "abc"},
+        ):
+            self.assertSameResponse(query)
+
+    def test_cursor_mode_matches_drf(self):
+        first = self.assertSameResponse({"pagination": "cursor", "page_size": 10})
+        cursor = first.json()["next"].split("cursor=")[1].split("&")[0]
+        self.assertSameResponse({"cursor": cursor, "page_size": 10})
+        self.assertEqual(self.client.get("/api/async/products/", {"cursor": "junk"}).status_code, 404)
+
+    def test_cached_and_revalidated_without_queries(self):
+        etag = self.client.get("/api/async/products/")["ETag"]
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get("/api/async/products/")["ETag"], etag)
+        with self.assertNumQueries(0):
+            response = self.client.get("/api/async/products/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Product.objects.filter(id=Product.objects.first().id).delete()
+        self.assertEqual(self.client.get("/api/async/products/").json()["count"], 24)
+
+    def test_detail_matches_drf(self):
+        product = Product.objects.first()
+        for pk in (product.id, 999999):
+            sync = self.client.get(f"/api/products/{pk}/")
+            async_ = self.client.get(f"/api/async/products/{pk}/")
+            self.assertEqual((async_.status_code, async_.content), (sync.status_code, sync.content))
+
+
+class FastListSerializationTests(TestCase):
+    """The .values() fast path must render exactly what ProductSerializer does"""
+
+    def setUp(self):
+        cache.clear()
+        for i in range(15):
+            Product.objects.create(
+                name=f"Lamp {i} \u2028 ✓", description=None if i % 3 else "Warm", price=Decimal("99.5") + i,
+                stock=i, category="General Appliances",
+            )
+        Product.objects.filter(id=Product.objects.first().id).update(
+            image="product_images/lamp.png",
+            image_variants={"source": "product_images/lamp.png", "webp": {"320": "product_images/derived/a.320w.webp"}},
+        )
+
+    def assertSameContent(self, url, query):
+        cache.clear()
+        fast = self.client.get(url, query)
+        cache.clear()
+        with self.settings(FAST_LIST_SERIALIZATION=False):
+            slow = self.client.get(url, query)
+        self.assertEqual(fast.status_code, 200)
+        self.assertEqual(fast.content, slow.content, query)
+        return fast
+
+    def test_list_matches_serializer(self):
+        for url in ("/api/products/", "/api/async/products/"):
+            response = self.assertSameContent(url, {"page_size": 20})
+            self.assertIn(b"\\u2028", response.content)  # Escaped as DRF does
+            self.assertSameContent(url, {"pagination": "cursor", "page_size": 4})
+
+        product = self.client.get("/api/products/", {"page_size": 1}).json()["results"][0]
+        self.assertEqual(product["image"], "http://testserver/media/product_images/lamp.png")
+        self.assertEqual(product["image_srcset"], {
+            "webp": "http://testserver/media/product_images/derived/a.320w.webp 320w",
+        })
+
+
+class CatalogExportTests(TestCase):
+    def setUp(self):
+        Product.objects.bulk_create([
+            Product(name=f"Kettle {i}", price=Decimal("10.50") + i, stock=i, category="Kitchenware") for i in range(25)
+        ])
+
+    def export(self, fmt, **headers):
+        response = self.client.get("/api/products-list/", {"export": fmt}, **headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return response, b"".join(response.streaming_content)
+
+    @override_settings(EXPORT_CHUNK_SIZE=10)
+    def test_json_export_has_every_row(self):
+        response, body = self.export("json")
+        self.assertEqual(response["Content-Type"], "application/json")
+        self.assertEqual(response["Content-Disposition"], 'attachment; filename="products.json"')
+        rows = json.loads(body)
+        self.assertEqual([row["name"] for row in rows], [f"Kettle {i}" for i in range(25)])
+        self.assertEqual(rows[0]["price"], "10.50")  # As get_products' JsonResponse writes Decimals
+
+    def test_ndjson_export_is_one_row_per_line(self):
+        response, body = self.export("ndjson")
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        lines = body.decode().splitlines()
+        self.assertEqual(len(lines), 25)
+        self.assertEqual(json.loads(lines[-1])["name"], "Kettle 24")
+
+    def test_gzip_when_accepted(self):
+        _, plain = self.export("json")
+        response, body = self.export("json", HTTP_ACCEPT_ENCODING="gzip;q=1.0, br;q=0")
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertIn("Accept-Encoding", response["Vary"])
+        self.assertEqual(gzip.decompress(body), plain)
+
+    def test_unknown_format(self):
+        self.assertEqual(self.client.get("/api/products-list/", {"export": "xml"}).status_code, 400)
+
+
+class ImportExportCommandTests(TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=os.path.join(self.tmp, "media"))
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def write(self, name, text):
+        path = os.path.join(self.tmp, name)
+        with open(path, "w", encoding="utf-8") as stream:
+            stream.write(text)
+        return path
+
+    def run_import(self, path, *args):
+        out, err = StringIO(), StringIO()
+        call_command("import_products", path, *args, stdout=out, stderr=err)
+        return out.getvalue(), err.getvalue()
+
+    def test_csv_upserts_in_batches_and_reports_bad_rows(self):
+        Product.objects.create(sku="TV-1", name="Old TV", price=1, stock=1, category="Entertainment")
+        version = get_catalog_version()
+        path = self.write("catalog.csv", (
+            "sku,name,description,price,stock,category\n"
+            "TV-1,Smart TV,55 inch,30000,4,entertainment\n"
+            "KT-1,Kettle,,1500.5,,Kitchenware\n"
+            "BAD-1,No price,,abc,1,Kitchenware\n"
+            ",Missing sku,,10,1,Kitchenware\n"
+            "MOP-1,Mop,,300,2,Cleaning\n"
+            "KT-1,Kettle v2,,1600,3,Kitchenware\n"
+        ))
+        # Per batch with valid rows: one upsert between a savepoint pair; the all-invalid batch writes nothing
+        with self.assertNumQueries(6):
+            out, err = self.run_import(path, "--batch-size", "2")
+
+        self.assertIn("Imported 4 product(s)", out)
+        self.assertIn("line 4: price 'abc' is not a number", err)
+        self.assertIn("line 5: sku is required", err)
+        products = {p.sku: p for p in Product.objects.all()}
+        self.assertEqual(len(products), 3)
+        self.assertEqual((products["TV-1"].name, products["TV-1"].stock), ("Smart TV", 4))
+        self.assertEqual((products["KT-1"].name, products["KT-1"].price), ("Kettle v2", Decimal("1600.00")))
+        self.assertEqual(products["MOP-1"].category, "Cleaning Tools")
+        self.assertNotEqual(get_catalog_version(), version)
+
+    def test_non_finite_prices_are_bad_rows(self):
+        path = self.write("catalog.jsonl", "\n".join([
+            '{"sku": "A", "name": "A", "price": "NaN", "category": "Accessories"}',
+            '{"sku": "B", "name": "B", "price": NaN, "category": "Accessories"}',
+            '{"sku": "C", "name": "C", "price": "sNaN", "category": "Accessories"}',
+            '{"sku": "D", "name": "D", "price": "Infinity", "category": "Accessories"}',
+            '{"sku": "E", "name": "E", "price": "-inf", "category": "Accessories"}',
+            '{"sku": "F", "name": "F", "price": 5, "category": "Accessories"}',
+        ]))
+        out, err = self.run_import(path)
+
+        self.assertIn("Imported 1 product(s)", out)
+        for line in range(1, 6):
+            self.assertIn(f"line {line}: price", err)
+        self.assertEqual(list(Product.objects.values_list("sku", flat=True)), ["F"])
+
+    def test_strict_fails_on_bad_rows(self):
+        path = self.write("catalog.jsonl", '{"sku": "A", "name": "A", "price": 1, "category": "Accessories"}\nnot json\n')
+        with self.assertRaises(CommandError):
+            self.run_import(path, "--strict")
+        self.assertTrue(Product.objects.filter(sku="A").exists())
+
+    def test_images_are_matched_from_a_directory(self):
+        pictures = os.path.join(self.tmp, "pictures")
+        os.mkdir(pictures)
+        png_bytes = png_upload().read()
+        for name in ("Smart TV 30k.png", "kt-1.png"):
+            with open(os.path.join(pictures, name), "wb") as stream:
+                stream.write(png_bytes)
+        path = self.write("catalog.jsonl", "\n".join(json.dumps(row) for row in [
+            {"sku": "TV-1", "name": "Smart TV 30k", "price": "30000", "category": "Entertainment"},
+            {"sku": "KT-1", "name": "Kettle", "price": "1500", "category": "Kitchenware"},
+            {"sku": "MOP-1", "name": "Mop", "price": "300", "category": "Cleaning Tools"},
+        ]))
+        self.run_import(path, "--images", pictures)
+
+        images = dict(Product.objects.values_list("sku", "image"))
+        self.assertEqual(images["MOP-1"], "")
+        # Identical files share one stored copy
+        self.assertEqual(images["TV-1"], images["KT-1"])
+        self.assertRegex(images["TV-1"], r"^product_images/[0-9a-f]{16}\.png$")
+        self.assertTrue(default_storage.exists(images["TV-1"]))
+        self.assertEqual(Job.objects.filter(task="products.tasks.build_image_derivatives").count(), 2)
+
+        # Re-importing without the directory keeps the images
+        self.run_import(path)
+        self.assertEqual(dict(Product.objects.values_list("sku", "image")), images)
+
+    def test_export_round_trips(self):
+        Product.objects.create(sku="TV-1", name="TV, \"curved\"", price=10, stock=2, category="Entertainment")
+        Product.objects.create(sku="KT-1", name="Kettle", description="Steel", price=5, category="Kitchenware")
+        for fmt in ("csv", "jsonl"):
+            path = os.path.join(self.tmp, f"catalog.{fmt}")
+            call_command("export_products", path, stdout=StringIO())
+            before = list(Product.objects.order_by("sku").values())
+            self.run_import(path)
+            self.assertEqual(list(Product.objects.order_by("sku").values()), before)
+
+
+class StockReservationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.tv = Product.objects.create(name="Smart TV", price=30000, stock=5, category="Entertainment")
+        self.cable = Product.objects.create(name="HDMI cable", price=500, stock=50, category="Accessories")
+        self.alice = User.objects.create_user(username="alice")
+        self.bob = User.objects.create_user(username="bob")
+
+    def reserved(self, product):
+        return Product.objects.get(id=product.id).reserved
+
+    def test_holds_set_stock_aside_all_or_nothing(self):
+        hold(self.alice, {self.tv.id: 4, self.cable.id: 1})
+        self.assertEqual(available([self.tv.id, self.cable.id]), {self.tv.id: 1, self.cable.id: 49})
+
+        with self.assertRaises(InsufficientStock) as raised:
+            hold(self.bob, {self.tv.id: 2, self.cable.id: 1})
+        self.assertEqual([p.name for p in raised.exception.products], ["Smart TV"])
+        self.assertEqual((self.reserved(self.tv), self.reserved(self.cable)), (4, 1))  # Bob holds nothing
+
+    def test_holds_and_releases_refresh_cached_catalog_pages(self):
+        def catalog_reserved(etag=None):
+            extra = {"HTTP_IF_NONE_MATCH": etag} if etag else {}
+            response = self.client.get("/api/products/", **extra)
+            self.assertEqual(response.status_code, 200)
+            rows = {row["id"]: row["reserved"] for row in response.json()["results"]}
+            return rows[self.tv.id], response["ETag"]
+
+        reserved, etag = catalog_reserved()
+        self.assertEqual(reserved, 0)
+        with self.captureOnCommitCallbacks(execute=True):
+            hold(self.alice, {self.tv.id: 4}, ttl=1)
+        reserved, etag = catalog_reserved(etag)
+        self.assertEqual(reserved, 4)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            release_expired(now=timezone.now() + timedelta(seconds=2))
+        self.assertEqual(catalog_reserved(etag)[0], 0)
+
+    def test_holding_again_replaces_the_previous_hold(self):
+        hold(self.alice, {self.tv.id: 4})
+        hold(self.alice, {self.tv.id: 5})
+        self.assertEqual(self.reserved(self.tv), 5)
+        release_user_holds(self.alice)
+        self.assertEqual(self.reserved(self.tv), 0)
+        self.assertFalse(StockHold.objects.exists())
+
+    def test_expired_holds_are_released(self):
+        hold(self.alice, {self.tv.id: 5, self.cable.id: 1}, ttl=60)
+        self.assertEqual(Job.objects.get().task, "products.reservations.release_expired_holds")
+        StockHold.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+
+        hold(self.bob, {self.tv.id: 3})  # Lazily frees Alice's expired TV hold, not her cable
+        self.assertEqual((self.reserved(self.tv), self.reserved(self.cable)), (3, 1))
+
+        self.assertEqual(release_expired(now=timezone.now() + timedelta(hours=1)), 2)
+        self.assertEqual((self.reserved(self.tv), self.reserved(self.cable)), (0, 0))
+
+    def test_holds_expiring_together_share_one_sweep(self):
+        hold(self.alice, {self.tv.id: 1})
+        hold(self.bob, {self.cable.id: 1})
+        hold(self.bob, {self.tv.id: 1}, ttl=60)
+        sweeps = Job.objects.filter(task="products.reservations.release_expired_holds")
+        self.assertEqual(sweeps.count(), 2)
+
+        # A sweep that runs before a hold expires doesn't cover it
+        sweeps.update(run_at=timezone.now())
+        hold(self.alice, {self.cable.id: 1}, ttl=60)
+        self.assertEqual(sweeps.count(), 3)
+
+    def test_availability_is_cached_until_a_change_commits(self):
+        available([self.tv.id])
+        with self.assertNumQueries(0):
+            self.assertEqual(available([self.tv.id]), {self.tv.id: 5})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            hold(self.alice, {self.tv.id: 2})
+        self.assertEqual(available([self.tv.id]), {self.tv.id: 3})
+
+    def test_reconcile_recomputes_reserved(self):
+        hold(self.alice, {self.tv.id: 2})
+        hold(self.bob, {self.tv.id: 1})
+        self.bob.delete()  # Cascades to the hold without giving the unit back
+        self.assertEqual(self.reserved(self.tv), 3)
+        reconcile()
+        self.assertEqual(self.reserved(self.tv), 2)
+
+    def test_availability_endpoint(self):
+        hold(self.alice, {self.tv.id: 2})
+        response = self.client.get("/api/products/availability/", {"ids": f"{self.tv.id},{self.cable.id}"})
+        self.assertEqual(response.json(), {str(self.tv.id): 3, str(self.cable.id): 50})
+        self.assertEqual(self.client.get("/api/products/availability/", {"ids": "x"}).status_code, 400)
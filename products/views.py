@@ -1,10 +1,22 @@
+from django.conf import settings
+from ecommerce.streaming import FORMATS as EXPORT_FORMATS, export_response
 from rest_framework.response import Response
 from rest_framework.decorators import api_view
-from django.http import JsonResponse
-from rest_framework import viewsets
+from django.http import JsonResponse, Http404
+from django.core.paginator import Paginator
+from django.utils.cache import get_conditional_response, patch_cache_control
+from rest_framework import viewsets, status
+from rest_framework.decorators import action
 from django_filters import rest_framework as filters
 from .models import Product
-from .serializers import ProductSerializer
+from .serializers import ProductSerializer, product_rows
+from .cache import (
+    catalog_cache, catalog_cache_key, catalog_etag, get_catalog_version, normalize_params,
+)
+from .search import get_search_backend
+from .reservations import available
+from .pagination import KEYSET_ORDERING, ProductCursorPagination, ProductPagination, keyset_page
+from rest_framework.utils.urls import replace_query_param
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.permissions import AllowAny
 
@@ -14,34 +26,186 @@ def product_list(request):
     serializer = ProductSerializer(products, many=True, context={'request': request})  # Pass request context
     return Response(serializer.data)
 
+def use_cursor_pagination(query_params):
+    """Keyset mode is opted into with ?pagination=cursor and kept by ?cursor= links"""
+    return query_params.get('pagination') == 'cursor' or 'cursor' in query_params
+
+
 def get_products(request):
-    products = list(Product.objects.values())  # Convert QuerySet to list
-    return JsonResponse(products, safe=False)
+    """Paged dump of raw product rows (?page=/?page_size=, or keyset via ?cursor=).
+
+    ?export=json|ndjson streams the whole catalog instead, in constant memory.
+    """
+    export = request.GET.get('export')
+    if export is not None:
+        if export not in EXPORT_FORMATS:
+            return JsonResponse({"error": f"export must be one of: {', '.join(EXPORT_FORMATS)}"}, status=400)
+        return export_response(request, Product.objects.order_by('id').values(), export, filename="products")
+
+    paginator = ProductPagination()
+    try:
+        page_size = min(int(request.GET.get('page_size', paginator.page_size)), paginator.max_page_size)
+    except ValueError:
+        page_size = paginator.page_size
+    page_size = max(page_size, 1)
+    queryset = Product.objects.values()
+    url = request.build_absolute_uri()
+
+    if use_cursor_pagination(request.GET):
+        try:
+            rows, next_cursor, previous_cursor = keyset_page(queryset, request.GET.get('cursor') or None, page_size)
+        except ValueError:
+            raise Http404("Invalid cursor")
+        return JsonResponse({
+            "next": replace_query_param(url, 'cursor', next_cursor) if next_cursor else None,
+            "previous": replace_query_param(url, 'cursor', previous_cursor) if previous_cursor else None,
+            "results": rows,
+        })
+
+    page = Paginator(queryset.order_by(*KEYSET_ORDERING), page_size).get_page(request.GET.get('page'))
+    return JsonResponse({
+        "count": page.paginator.count,
+        "next": replace_query_param(url, 'page', page.next_page_number()) if page.has_next() else None,
+        "previous": replace_query_param(url, 'page', page.previous_page_number()) if page.has_previous() else None,
+        "results": list(page),
+    })
+
+
+# Query params besides the filters that change the rendered catalog page
+PAGINATION_PARAMS = ('page', 'page_size', 'pagination', 'cursor')
+# Filters that match case-insensitively, so "TV" and "tv" share a cache entry
+CASE_INSENSITIVE_PARAMS = ('name', 'category')
+
+
+def catalog_params(request):
+    """Normalized cache/ETag identity of a catalog list request"""
+    allowed = [*ProductFilter.base_filters, *PAGINATION_PARAMS]
+    params = normalize_params(request.GET, allowed, CASE_INSENSITIVE_PARAMS)
+    # Page links are absolute URLs, so host and path are part of the rendered bytes
+    return f"{request.get_host()}{request.path}?{params}"
 
 
 class ProductFilter(filters.FilterSet):
-    name = filters.CharFilter(lookup_expr='icontains')
+    name = filters.CharFilter(method='filter_name')  # ✅ Served by the search index, not an icontains scan
     price_min = filters.NumberFilter(field_name="price", lookup_expr='gte')
     price_max = filters.NumberFilter(field_name="price", lookup_expr='lte')
-    category = filters.CharFilter(field_name="category", lookup_expr='iexact')  # ✅ Add category filter
+    category = filters.CharFilter(field_name="category", method='filter_category')  # ✅ Add category filter
 
     class Meta:
         model = Product
         fields = ['name', 'price_min', 'price_max']
 
+    def filter_name(self, queryset, name, value):
+        return get_search_backend().filter(queryset, value)
+
+    def filter_category(self, queryset, name, value):
+        """Case-insensitive match resolved up front, so the (category, price) index is usable"""
+        categories = {key.lower(): key for key, _ in Product.CATEGORY_CHOICES}
+        category = categories.get(value.lower())
+        if category is None:
+            return queryset.none()
+        return queryset.filter(category=category)
+
 class ProductViewSet(viewsets.ModelViewSet):
-    queryset = Product.objects.all()
+    queryset = Product.objects.order_by(*KEYSET_ORDERING)  # ✅ Stable order so pages never overlap
     serializer_class = ProductSerializer
     filterset_class = ProductFilter
     permission_classes = [AllowAny]
     filter_backends = [DjangoFilterBackend]  # ✅ Add this
     ordering_fields = ['price', 'name']
     ordering = ['price']  # Default ordering by price
+    pagination_class = ProductPagination
+
+    @property
+    def paginator(self):
+        """Pick page-number or keyset pagination per request"""
+        if not hasattr(self, '_paginator'):
+            if use_cursor_pagination(self.request.query_params):
+                self._paginator = ProductCursorPagination()
+            else:
+                self._paginator = self.pagination_class()
+        return self._paginator
+
+    def get_catalog_params(self, request):
+        return catalog_params(request)
+
+    def cached_response(self, request, params, build):
+        """Serve `build()` from the versioned catalog cache, answering 304 on ETag revalidation"""
+        version = get_catalog_version()
+        etag = catalog_etag(version, params)
+
+        # ✅ Revalidation: answer 304 before touching the DB or the cache entry
+        not_modified = get_conditional_response(request, etag=etag)
+        if not_modified is not None:
+            patch_cache_control(not_modified, no_cache=True)
+            return not_modified
+
+        # ✅ Single-flight: a burst of misses after a catalog change rebuilds the page once
+        data = catalog_cache().get_or_set(catalog_cache_key(version, params), build)
+
+        response = Response(data)
+        response['ETag'] = etag
+        patch_cache_control(response, no_cache=True)
+        return response
 
     def list(self, request, *args, **kwargs):
-        queryset = self.filter_queryset(self.get_queryset())
-        serializer = self.get_serializer(queryset, many=True, context={'request': request})  # ✅ Add request context
-        return Response(serializer.data)
+        """Serve the catalog from a versioned cache with ETag revalidation"""
+        def build():
+            queryset = self.filter_queryset(self.get_queryset())
+            if settings.FAST_LIST_SERIALIZATION:
+                # ✅ Same output from .values() rows, without a model instance per product
+                rows = product_rows(self.get_serializer_context())
+                page = self.paginate_queryset(queryset.values(*rows.columns))
+                return self.get_paginated_response(rows.many(page)).data
+            page = self.paginate_queryset(queryset)
+            serializer = self.get_serializer(page, many=True, context={'request': request})  # ✅ Add request context
+            return self.get_paginated_response(serializer.data).data
+
+        return self.cached_response(request, self.get_catalog_params(request), build)
+
+    @action(detail=False, methods=['get'])
+    def search(self, request):
+        """Ranked full-text search over name + description with category facets"""
+        query = request.query_params.get('q', '').strip()
+        category = request.query_params.get('category', '').strip()
+        try:
+            limit = max(1, min(int(request.query_params.get('limit', 20)), ProductPagination.max_page_size))
+            offset = max(0, int(request.query_params.get('offset', 0)))
+        except ValueError:
+            return Response({"error": "limit and offset must be integers"}, status=status.HTTP_400_BAD_REQUEST)
+        if category:
+            category = {key.lower(): key for key, _ in Product.CATEGORY_CHOICES}.get(category.lower(), category)
+
+        def build():
+            result = get_search_backend().search(query, category=category or None, limit=limit, offset=offset)
+            products = Product.objects.in_bulk(result.ids)
+            serializer = self.get_serializer([products[i] for i in result.ids if i in products], many=True)
+            return {
+                "query": query,
+                "count": result.total,
+                "results": serializer.data,
+                "facets": {"category": result.facets},
+            }
+
+        params = normalize_params(
+            {'q': query.lower(), 'category': category, 'limit': str(limit), 'offset': str(offset)},
+            ('q', 'category', 'limit', 'offset'),
+        )
+        return self.cached_response(request, f"search?{params}", build)
+
+    @action(detail=False, methods=['get'])
+    def availability(self, request):
+        """Units on sale (stock minus checkout holds) for ?ids=1,2,3, served from the "stock" cache"""
+        try:
+            ids = [int(part) for part in request.query_params.get('ids', '').split(',') if part.strip()]
+        except ValueError:
+            return Response({"error": "ids must be comma-separated integers"}, status=status.HTTP_400_BAD_REQUEST)
+        if not 0 < len(ids) <= ProductPagination.max_page_size:
+            return Response(
+                {"error": f"Pass between 1 and {ProductPagination.max_page_size} ids"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        return Response({str(product_id): units for product_id, units in available(ids).items()})
 
     def get_image(self,obj):
         request=self.context.get("request")
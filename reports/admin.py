@@ -0,0 +1,27 @@
+from django.contrib import admin
+
+from .models import DailyOrderStats, DailyProductSales
+
+
+class RollupAdmin(admin.ModelAdmin):
+    """Read-only: rows are maintained by reports.rollups and rebuilt by backfill_reports"""
+    date_hierarchy = 'day'
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(DailyOrderStats)
+class DailyOrderStatsAdmin(RollupAdmin):
+    list_display = ('day', 'status', 'orders', 'revenue', 'delivery_fees')
+    list_filter = ('status',)
+
+
+@admin.register(DailyProductSales)
+class DailyProductSalesAdmin(RollupAdmin):
+    list_display = ('day', 'product', 'category', 'status', 'units')
+    list_filter = ('status', 'category')
+    list_select_related = ('product',)
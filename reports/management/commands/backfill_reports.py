@@ -0,0 +1,24 @@
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from reports.rollups import rebuild
+
+
+def date(value):
+    try:
+        return datetime.date.fromisoformat(value)
+    except ValueError:
+        raise CommandError(f"{value!r} is not a date (YYYY-MM-DD)")
+
+
+class Command(BaseCommand):
+    help = "Recompute the daily order/product rollups from the order tables (all days, or --from/--to)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--from', dest='start', type=date, help="First day to rebuild")
+        parser.add_argument('--to', dest='end', type=date, help="Last day to rebuild")
+
+    def handle(self, *args, **options):
+        days, products = rebuild(options['start'], options['end'])
+        self.stdout.write(f"Rebuilt {days} day/status row(s) and {products} day/product row(s)")
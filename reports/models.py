@@ -0,0 +1,66 @@
+from django.db import models
+
+from products.models import Product
+
+
+class DailyOrderStats(models.Model):
+    """Orders placed on `day` that currently have `status`.
+
+    A status change moves the order's numbers from one row to another, so
+    summing a day's rows over the wanted statuses gives live totals.
+    """
+    day = models.DateField()
+    status = models.CharField(max_length=20)
+    orders = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)  # Sum of total_amount
+    delivery_fees = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'status'], name='daily_order_stats_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.day} {self.status}: {self.orders} orders"
+
+
+class DailyProductSales(models.Model):
+    """Units of `product` in orders placed on `day` that currently have `status`"""
+    day = models.DateField()
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='+')
+    category = models.CharField(max_length=50)  # The product's category, copied for per-category reports
+    status = models.CharField(max_length=20)
+    units = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'product', 'status'], name='daily_product_sales_uniq'),
+        ]
+        indexes = [
+            # ✅ Per-category totals over a date range
+            models.Index(fields=['day', 'category'], name='daily_sales_day_category_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.day} product {self.product_id} {self.status}: {self.units}"
+
+
+class RollupDelta(models.Model):
+    """A change to the rollups, appended by the transaction that changed an order.
+
+    Order writes only ever insert these, so concurrent checkouts never wait
+    on the same day's rollup rows; ``reports.rollups.fold`` adds them into
+    the daily tables (and deletes them) from a job. ``product`` is None for
+    an order's numbers, set for a product's units.
+    """
+    day = models.DateField()
+    status = models.CharField(max_length=20)
+    product = models.ForeignKey(Product, null=True, on_delete=models.CASCADE, related_name='+')
+    category = models.CharField(max_length=50, blank=True)
+    orders = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    delivery_fees = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    units = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.day} {self.status} delta #{self.pk}"
@@ -0,0 +1,245 @@
+"""Incremental maintenance of the daily rollup tables.
+
+A change to an order appends ``RollupDelta`` rows in the transaction that
+made it, so they commit or roll back with the order. That is a plain
+INSERT: concurrent checkouts never touch (or lock) the shared
+``(today, 'Pending')`` rows. ``fold`` later adds the pending deltas into
+the daily tables with one ``INSERT ... ON CONFLICT DO UPDATE SET col = col +
+excluded.col`` per table and deletes them; after a commit each process
+queues the ``fold_rollups`` job at most once per ``REPORTS_FOLD_SECONDS``,
+so reports trail orders by about that long. ``rebuild`` recomputes a date
+range from the raw tables (the backfill command).
+"""
+import threading
+import time
+from collections import defaultdict
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import DatabaseError, connection, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from jobs.registry import task
+from order.models import Order, OrderItem
+
+from .models import DailyOrderStats, DailyProductSales, RollupDelta
+
+ORDER_KEYS = ('day', 'status')
+ORDER_COUNTERS = ('orders', 'revenue', 'delivery_fees')
+PRODUCT_KEYS = ('day', 'product_id', 'status')
+PRODUCT_COUNTERS = ('units',)
+COUNTED_FIELDS = Order.TRACKED_FIELDS  # What an order adds to the rollups
+FOLD_BATCH = 500  # Deltas folded per transaction (their ids go in one DELETE)
+
+
+def counted(order):
+    """The order's values the rollups count it under, as a dict of COUNTED_FIELDS"""
+    return {name: getattr(order, name) for name in COUNTED_FIELDS}
+
+
+def increment(model, keys, counters, rows):
+    """Add each row's counters to the row with the same keys, creating it if needed.
+
+    `rows` holds dicts of key and counter values (plus any other columns
+    to set on insert). One statement however many rows.
+    """
+    if not rows:
+        return
+    quote = connection.ops.quote_name
+    table = quote(model._meta.db_table)
+    columns = list(rows[0])
+    fields = [model._meta.get_field(name) for name in columns]
+    placeholders = "(" + ", ".join(["%s"] * len(columns)) + ")"
+    params = [
+        field.get_db_prep_save(row[name], connection)
+        for row in rows for name, field in zip(columns, fields)
+    ]
+    names = ", ".join(quote(field.column) for field in fields)
+    conflict = ", ".join(quote(model._meta.get_field(name).column) for name in keys)
+    updates = ", ".join(
+        f"{quote(column)} = {table}.{quote(column)} + excluded.{quote(column)}"
+        for column in (model._meta.get_field(name).column for name in counters)
+    )
+    sql = (
+        f"INSERT INTO {table} ({names}) VALUES {', '.join([placeholders] * len(rows))} "
+        f"ON CONFLICT ({conflict}) DO UPDATE SET {updates}"
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+
+
+def _product_deltas(day, status, items, sign):
+    """items: (product_id, category, quantity) triples"""
+    units = defaultdict(int)
+    categories = {}
+    for product_id, category, quantity in items:
+        units[product_id] += quantity
+        categories[product_id] = category
+    return [
+        RollupDelta(day=day, status=status, product_id=product_id, category=categories[product_id], units=sign * qty)
+        for product_id, qty in units.items()
+    ]
+
+
+def append(deltas):
+    """Record `deltas` with the current transaction and have them folded after it commits"""
+    if deltas:
+        RollupDelta.objects.bulk_create(deltas)
+        # robust: a fold that fails to queue is logged, never raised from the order's commit
+        transaction.on_commit(schedule_fold, robust=True)
+
+
+def record_order(values, sign=1, items=()):
+    """Count (sign=1) or uncount (sign=-1) an order with `values` (see counted) and the given items"""
+    day, status = timezone.localdate(values['created_at']), values['status']
+    append([RollupDelta(
+        day=day, status=status,
+        orders=sign,
+        revenue=sign * Decimal(values['total_amount'] or 0),
+        delivery_fees=sign * Decimal(values['delivery_fee'] or 0),
+    )] + _product_deltas(day, status, items, sign))
+
+
+def record_items(values, items, sign=1):
+    """Add (or with sign=-1, remove) units for items of an already-counted order with `values`"""
+    append(_product_deltas(timezone.localdate(values['created_at']), values['status'], items, sign))
+
+
+def order_items(order):
+    return list(
+        OrderItem.objects.filter(order=order).values_list('product_id', 'product__category', 'quantity')
+    )
+
+
+def move_order(order, before):
+    """Uncount an order as it was counted (`before`, see counted) and count it as it is now.
+
+    Its units only move when its status or day changed.
+    """
+    after = counted(order)
+    moved = before['status'] != after['status'] or (
+        timezone.localdate(before['created_at']) != timezone.localdate(after['created_at'])
+    )
+    items = order_items(order) if moved else ()
+    record_order(before, sign=-1, items=items)
+    record_order(after, items=items)
+
+
+def fold(batch=FOLD_BATCH):
+    """Add every pending delta into the daily tables; returns how many were folded.
+
+    Each batch is locked (skipping batches another fold holds), applied
+    and deleted in one transaction, so a delta is counted exactly once.
+    """
+    folded = 0
+    while True:
+        with transaction.atomic():
+            deltas = list(RollupDelta.objects.select_for_update(skip_locked=True).order_by('id')[:batch])
+            if not deltas:
+                return folded
+            stats = defaultdict(lambda: [0, Decimal(0), Decimal(0)])
+            sales = defaultdict(int)
+            categories = {}
+            for delta in deltas:
+                if delta.product_id is None:
+                    row = stats[delta.day, delta.status]
+                    row[0] += delta.orders
+                    row[1] += delta.revenue
+                    row[2] += delta.delivery_fees
+                else:
+                    sales[delta.day, delta.product_id, delta.status] += delta.units
+                    categories[delta.product_id] = delta.category
+            increment(DailyOrderStats, ORDER_KEYS, ORDER_COUNTERS, [
+                {'day': day, 'status': status, 'orders': orders, 'revenue': revenue, 'delivery_fees': fees}
+                for (day, status), (orders, revenue, fees) in stats.items()
+            ])
+            increment(DailyProductSales, PRODUCT_KEYS, PRODUCT_COUNTERS, [
+                {'day': day, 'product_id': product_id, 'category': categories[product_id], 'status': status,
+                 'units': units}
+                for (day, product_id, status), units in sales.items()
+            ])
+            RollupDelta.objects.filter(id__in=[delta.id for delta in deltas]).delete()
+        folded += len(deltas)
+        if len(deltas) < batch:
+            return folded
+
+
+@task(priority=3)
+def fold_rollups():
+    """Fold the deltas committed since the last run into the daily tables"""
+    fold()
+
+
+_fold_queued_until = 0.0
+_fold_lock = threading.Lock()
+
+
+def schedule_fold():
+    """Queue ``fold_rollups`` unless this process queued one that hasn't run yet.
+
+    The job runs ``REPORTS_FOLD_SECONDS`` from now and folds everything
+    committed by then, including deltas whose commit found it queued.
+    """
+    global _fold_queued_until
+    delay = getattr(settings, 'REPORTS_FOLD_SECONDS', 5)
+    now = time.monotonic()
+    with _fold_lock:
+        if now < _fold_queued_until:
+            return
+        if not settings.JOBS_EAGER:  # Eager jobs run right away: nothing stays queued
+            _fold_queued_until = now + delay
+    try:
+        fold_rollups.enqueue(delay=delay)
+    except DatabaseError:
+        _fold_queued_until = 0.0  # The next commit queues it
+        raise
+
+
+@transaction.atomic
+def rebuild(start=None, end=None):
+    """Recompute the rollups for orders placed between `start` and `end` (dates, inclusive)"""
+    orders = Order.objects.all()
+    if start is not None:
+        orders = orders.filter(created_at__date__gte=start)
+    if end is not None:
+        orders = orders.filter(created_at__date__lte=end)
+    items = OrderItem.objects.filter(order__in=orders.values('id'))
+
+    stats = DailyOrderStats.objects.all()
+    sales = DailyProductSales.objects.all()
+    if start is not None:
+        stats, sales = stats.filter(day__gte=start), sales.filter(day__gte=start)
+    if end is not None:
+        stats, sales = stats.filter(day__lte=end), sales.filter(day__lte=end)
+    stats.delete()
+    sales.delete()
+    # Pending deltas for these days are already in the recomputed totals
+    deltas = RollupDelta.objects.all()
+    if start is not None:
+        deltas = deltas.filter(day__gte=start)
+    if end is not None:
+        deltas = deltas.filter(day__lte=end)
+    deltas.delete()
+
+    rows = {}
+    for row in (
+        orders.annotate(day=TruncDate('created_at')).values('day', 'status')
+        .annotate(orders=Count('id'), revenue=Sum('total_amount'), delivery_fees=Sum('delivery_fee'))
+        .order_by()
+    ):
+        rows[row['day'], row['status']] = DailyOrderStats(**row)
+
+    product_rows = []
+    for row in (
+        items.annotate(day=TruncDate('order__created_at'), status=F('order__status'), category=F('product__category'))
+        .values('day', 'status', 'product_id', 'category')
+        .annotate(units=Sum('quantity'))
+        .order_by()
+    ):
+        product_rows.append(DailyProductSales(**row))
+
+    DailyOrderStats.objects.bulk_create(rows.values(), batch_size=1000)
+    DailyProductSales.objects.bulk_create(product_rows, batch_size=1000)
+    return len(rows), len(product_rows)
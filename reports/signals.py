@@ -0,0 +1,74 @@
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from order.models import Order, OrderItem
+from order.signals import order_items_created
+
+from .rollups import COUNTED_FIELDS, counted, move_order, order_items, record_items, record_order
+
+
+@receiver(pre_save, sender=Order)
+def order_saving(sender, instance, raw=False, **kwargs):
+    """Remember what the rollups counted for an existing order, so order_saved can move it"""
+    if raw or instance.pk is None:
+        return
+    before = getattr(instance, '_loaded_values', None)
+    if before is None or None in before.values():  # Not loaded from the database, or fields deferred
+        before = Order.objects.filter(pk=instance.pk).values(*COUNTED_FIELDS).first()
+    instance._counted = before
+
+
+@receiver(post_save, sender=Order)
+def order_saved(sender, instance, created, raw=False, **kwargs):
+    """Count new orders; move edited ones whose status, amounts or date changed"""
+    if raw:
+        return
+    before = instance.__dict__.pop('_counted', None)
+    after = counted(instance)
+    instance._loaded_values = after
+    if created or before is None:
+        record_order(after)
+    elif before != after:
+        move_order(instance, before)
+
+
+@receiver(order_items_created)
+def items_bulk_created(sender, order, items, **kwargs):
+    record_items(counted(order), [(item.product_id, item.product.category, item.quantity) for item in items])
+
+
+@receiver(pre_save, sender=OrderItem)
+def item_saving(sender, instance, raw=False, **kwargs):
+    if raw or instance.pk is None:
+        return
+    instance._counted = (
+        OrderItem.objects.filter(pk=instance.pk)
+        .values_list('order__status', 'order__created_at', 'product_id', 'product__category', 'quantity')
+        .first()
+    )
+
+
+@receiver(post_save, sender=OrderItem)
+def item_saved(sender, instance, created, raw=False, **kwargs):
+    """Items added or edited one at a time, e.g. from the admin inline"""
+    if raw:
+        return
+    before = instance.__dict__.pop('_counted', None)
+    if before is not None and not created:
+        status, created_at, product_id, category, quantity = before
+        record_items({'status': status, 'created_at': created_at}, [(product_id, category, quantity)], sign=-1)
+    record_items(counted(instance.order), [(instance.product_id, instance.product.category, instance.quantity)])
+
+
+@receiver(post_delete, sender=OrderItem)
+def item_deleted(sender, instance, origin=None, **kwargs):
+    """Items deleted themselves; order_deleted uncounts items deleted with their order"""
+    if not (isinstance(origin, OrderItem) or getattr(origin, 'model', None) is OrderItem):
+        return
+    item = (instance.product_id, instance.product.category, instance.quantity)
+    record_items(counted(instance.order), [item], sign=-1)
+
+
+@receiver(pre_delete, sender=Order)
+def order_deleted(sender, instance, **kwargs):
+    record_order(counted(instance), sign=-1, items=order_items(instance))
@@ -0,0 +1 @@
+from .rollups import fold_rollups  # noqa: F401  Registered here for the workers
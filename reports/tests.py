@@ -0,0 +1,246 @@
+import datetime
+from decimal import Decimal
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APITestCase
+
+from cart.models import Cart
+from jobs.models import Job
+from jobs.worker import run_pending
+from order.checkout import checkout
+from order.models import Order, OrderItem
+from products.models import Product
+
+from .models import DailyOrderStats, DailyProductSales, RollupDelta
+from . import rollups
+from .rollups import fold
+
+CUSTOMER = {
+    "mpesa_code": "QWERTY1234", "first_name": "Jane", "last_name": "Doe", "age": 30,
+    "phone_number": "0712345678", "email": "jane@example.com", "gender": "Female", "location": "Nairobi",
+}
+
+
+def snapshot():
+    """Both rollup tables, pending deltas folded, as comparable sets ignoring all-zero rows left by moves"""
+    fold()
+    stats = {
+        (row.day, row.status, row.orders, row.revenue, row.delivery_fees)
+        for row in DailyOrderStats.objects.all() if row.orders
+    }
+    sales = {
+        (row.day, row.product_id, row.category, row.status, row.units)
+        for row in DailyProductSales.objects.all() if row.units
+    }
+    return stats, sales
+
+
+def rebuilt():
+    """The snapshot backfill_reports produces from the order tables"""
+    call_command("backfill_reports", stdout=StringIO())
+    return snapshot()
+
+
+class RollupTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="shopper")
+        self.tv = Product.objects.create(name="Smart TV", price=30000, stock=10, category="Entertainment")
+        self.cable = Product.objects.create(name="HDMI cable", price=500, stock=10, category="Accessories")
+        self.today = timezone.localdate()
+        rollups._fold_queued_until = 0.0
+
+    def place_order(self, **quantities):
+        products = {"tv": self.tv, "cable": self.cable}
+        Cart.objects.bulk_create([
+            Cart(user=self.user, product=products[name], quantity=qty) for name, qty in quantities.items()
+        ])
+        return checkout(self.user, dict(CUSTOMER, delivery=False))
+
+    def test_checkout_updates_rollups(self):
+        self.place_order(tv=1, cable=2)
+        self.place_order(cable=3)
+        # The checkouts only appended deltas; the daily rows change when they are folded
+        self.assertFalse(DailyOrderStats.objects.exists())
+        self.assertEqual(fold(batch=2), 5)
+        self.assertFalse(RollupDelta.objects.exists())
+
+        stats = DailyOrderStats.objects.get(day=self.today, status="Pending")
+        self.assertEqual((stats.orders, stats.revenue), (2, Decimal("32500.00")))
+        units = dict(DailyProductSales.objects.values_list("product__name", "units"))
+        self.assertEqual(units, {"Smart TV": 1, "HDMI cable": 5})
+
+    def test_status_change_moves_counts(self):
+        order = self.place_order(tv=2)
+        order = Order.objects.get(id=order.id)
+        order.status = "Delivered"
+        order.save()
+        fold()
+
+        stats = dict(DailyOrderStats.objects.values_list("status", "orders"))
+        self.assertEqual(stats, {"Pending": 0, "Delivered": 1})
+        sales = dict(DailyProductSales.objects.values_list("status", "units"))
+        self.assertEqual(sales, {"Pending": 0, "Delivered": 2})
+
+    def test_delete_subtracts(self):
+        kept = self.place_order(cable=1)
+        Order.objects.get(id=self.place_order(tv=1).id).delete()
+        fold()
+
+        stats = DailyOrderStats.objects.get(day=self.today, status="Pending")
+        self.assertEqual((stats.orders, stats.revenue), (1, kept.total_amount))
+        self.assertEqual(DailyProductSales.objects.get(product=self.tv).units, 0)
+
+    def test_admin_added_items_are_counted(self):
+        order = Order.objects.create(user=self.user, total_amount=500, **CUSTOMER)
+        OrderItem.objects.create(order=order, product=self.cable, quantity=4)
+        fold()
+        self.assertEqual(DailyProductSales.objects.get(product=self.cable).units, 4)
+
+    def test_item_edit_moves_units(self):
+        order = self.place_order(tv=1, cable=2)
+        item = OrderItem.objects.get(order=order, product=self.cable)
+        item.quantity = 5
+        item.save()
+        moved = OrderItem.objects.get(order=order, product=self.tv)
+        moved.product = self.cable
+        moved.save()
+
+        fold()
+        units = dict(DailyProductSales.objects.values_list("product__name", "units"))
+        self.assertEqual(units, {"Smart TV": 0, "HDMI cable": 6})
+        self.assertEqual(snapshot(), rebuilt())
+
+    def test_item_delete_subtracts_units(self):
+        order = self.place_order(tv=1, cable=2)
+        OrderItem.objects.get(order=order, product=self.cable).delete()
+        OrderItem.objects.filter(order=order, product=self.tv).delete()
+
+        fold()
+        self.assertEqual(set(DailyProductSales.objects.values_list("units", flat=True)), {0})
+        self.assertEqual(DailyOrderStats.objects.get(status="Pending").orders, 1)
+        self.assertEqual(snapshot(), rebuilt())
+
+    def test_amount_and_date_edits_move_order_numbers(self):
+        order = Order.objects.get(id=self.place_order(tv=1).id)
+        order.total_amount = Decimal("25000")
+        order.delivery = True
+        order.save()
+        fold()
+        stats = DailyOrderStats.objects.get(day=self.today, status="Pending")
+        self.assertEqual((stats.orders, stats.revenue, stats.delivery_fees), (1, Decimal("25000"), Decimal("1000")))
+
+        order.created_at = timezone.now() - datetime.timedelta(days=2)
+        order.save()
+        fold()
+        two_days_ago = self.today - datetime.timedelta(days=2)
+        self.assertEqual(DailyOrderStats.objects.get(day=two_days_ago).revenue, Decimal("25000"))
+        self.assertEqual(DailyProductSales.objects.get(day=two_days_ago).units, 1)
+        self.assertEqual(snapshot(), rebuilt())
+
+    def test_commit_queues_one_fold_job(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.place_order(tv=1)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.place_order(cable=1)  # A fold is already queued: it will pick this order up too
+        folds = Job.objects.filter(task="reports.rollups.fold_rollups")
+        self.assertEqual(folds.count(), 1)
+
+        folds.update(run_at=timezone.now())
+        run_pending()
+        self.assertEqual(DailyOrderStats.objects.get(status="Pending").orders, 2)
+        self.assertFalse(RollupDelta.objects.exists())
+
+    def test_backfill_matches_incremental(self):
+        self.place_order(tv=1, cable=2)
+        order = self.place_order(cable=1)
+        Order.objects.filter(id=order.id).update(created_at=timezone.now() - datetime.timedelta(days=3))
+        order = Order.objects.get(id=order.id)
+        order.status = "Cancelled"
+        order.save()
+        # The date change above bypassed signals; rebuild everything once to start from truth
+        call_command("backfill_reports", stdout=StringIO())
+        self.place_order(tv=2)
+        incremental = snapshot()
+
+        out = StringIO()
+        call_command("backfill_reports", stdout=out)
+        self.assertIn("Rebuilt 2 day/status row(s)", out.getvalue())
+        self.assertEqual(snapshot(), incremental)
+
+    def test_backfill_range_leaves_other_days(self):
+        self.place_order(tv=1)
+        old = Order.objects.create(user=self.user, total_amount=700, **CUSTOMER)
+        Order.objects.filter(id=old.id).update(created_at=timezone.now() - datetime.timedelta(days=10))
+        DailyOrderStats.objects.all().delete()
+
+        day = (self.today - datetime.timedelta(days=10)).isoformat()
+        call_command("backfill_reports", "--from", day, "--to", day, stdout=StringIO())
+        self.assertEqual(list(DailyOrderStats.objects.values_list("day", "orders")), [
+            (self.today - datetime.timedelta(days=10), 1),
+        ])
+
+
+class ReportApiTests(APITestCase):
+    def setUp(self):
+        self.admin = User.objects.create_user(username="admin", is_staff=True)
+        self.client.force_authenticate(self.admin)
+        self.today = timezone.localdate()
+        tv = Product.objects.create(name="Smart TV", price=30000, stock=10, category="Entertainment")
+        cable = Product.objects.create(name="HDMI cable", price=500, stock=10, category="Accessories")
+        DailyOrderStats.objects.bulk_create([
+            DailyOrderStats(day=self.today, status="Pending", orders=2, revenue=Decimal("61000"), delivery_fees=1000),
+            DailyOrderStats(day=self.today - datetime.timedelta(days=1), status="Delivered", orders=1,
+                            revenue=Decimal("1500"), delivery_fees=0),
+            DailyOrderStats(day=self.today, status="Cancelled", orders=5, revenue=Decimal("99999"), delivery_fees=0),
+        ])
+        DailyProductSales.objects.bulk_create([
+            DailyProductSales(day=self.today, product=tv, category="Entertainment", status="Pending", units=2),
+            DailyProductSales(day=self.today - datetime.timedelta(days=1), product=cable, category="Accessories",
+                              status="Delivered", units=3),
+            DailyProductSales(day=self.today, product=cable, category="Accessories", status="Cancelled", units=50),
+        ])
+
+    def test_summary_excludes_cancelled_by_default(self):
+        with self.assertNumQueries(2):
+            response = self.client.get("/api/reports/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["orders"], 3)
+        self.assertEqual(response.data["revenue"], "62500.00")
+        self.assertEqual(response.data["units"], 5)
+        self.assertEqual(response.data["average_order_value"], "20833.33")
+
+        response = self.client.get("/api/reports/", {"status": "Cancelled"})
+        self.assertEqual((response.data["orders"], response.data["units"]), (5, 50))
+
+    def test_daily_fills_missing_days(self):
+        start = self.today - datetime.timedelta(days=2)
+        response = self.client.get("/api/reports/daily/", {"from": start.isoformat(), "to": self.today.isoformat()})
+        self.assertEqual([row["orders"] for row in response.data["results"]], [0, 1, 2])
+        self.assertEqual([row["units"] for row in response.data["results"]], [0, 3, 2])
+
+    def test_top_products_and_categories(self):
+        with self.assertNumQueries(2):  # Rollup aggregate, then product names
+            response = self.client.get("/api/reports/products/", {"limit": 1})
+        self.assertEqual([(row["name"], row["units"]) for row in response.data["results"]], [("HDMI cable", 3)])
+
+        response = self.client.get("/api/reports/products/", {"category": "Entertainment"})
+        self.assertEqual([row["name"] for row in response.data["results"]], ["Smart TV"])
+
+        response = self.client.get("/api/reports/categories/")
+        self.assertEqual(response.data["results"], [
+            {"category": "Accessories", "units": 3}, {"category": "Entertainment", "units": 2},
+        ])
+
+    def test_bad_range_is_rejected(self):
+        response = self.client.get("/api/reports/", {"from": "2024-02-01", "to": "2024-01-01"})
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get("/api/reports/", {"from": "yesterday"})
+        self.assertEqual(response.status_code, 400)
+
+    def test_admin_only(self):
+        self.client.force_authenticate(User.objects.create_user(username="shopper"))
+        self.assertEqual(self.client.get("/api/reports/").status_code, 403)
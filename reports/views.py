@@ -0,0 +1,146 @@
+import datetime
+from decimal import Decimal
+
+from django.db.models import Sum
+from django.utils import timezone
+from rest_framework import status, viewsets
+from rest_framework.decorators import action
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+
+from order.models import Order
+from products.models import Product
+
+from .models import DailyOrderStats, DailyProductSales
+
+DEFAULT_DAYS = 30
+MAX_DAYS = 366 * 3
+# Reports count every status except these unless ?status= says otherwise
+EXCLUDED_STATUSES = ('Cancelled',)
+
+
+class ReportError(Exception):
+    pass
+
+
+def money(value):
+    return f"{(value or Decimal(0)):.2f}"
+
+
+def parse_date(value, name):
+    try:
+        return datetime.date.fromisoformat(value)
+    except ValueError:
+        raise ReportError(f"{name} must be a date (YYYY-MM-DD)")
+
+
+class ReportViewSet(viewsets.ViewSet):
+    """Sales dashboards served from the daily rollup tables (see reports.rollups)"""
+    permission_classes = [IsAdminUser]
+
+    def get_range(self, request):
+        params = request.query_params
+        end = parse_date(params['to'], 'to') if params.get('to') else timezone.localdate()
+        start = parse_date(params['from'], 'from') if params.get('from') else end - datetime.timedelta(days=DEFAULT_DAYS - 1)
+        if start > end:
+            raise ReportError("from must not be after to")
+        if (end - start).days >= MAX_DAYS:
+            raise ReportError(f"at most {MAX_DAYS} days per report")
+        return start, end
+
+    def get_statuses(self, request):
+        value = request.query_params.get('status')
+        if not value:
+            return [key for key, _ in Order.ORDER_STATUS_CHOICES if key not in EXCLUDED_STATUSES]
+        return [part.strip() for part in value.split(',') if part.strip()]
+
+    def filtered(self, request, queryset):
+        start, end = self.get_range(request)
+        return queryset.filter(day__gte=start, day__lte=end, status__in=self.get_statuses(request)), start, end
+
+    def respond(self, request, build):
+        try:
+            return Response(build())
+        except ReportError as exc:
+            return Response({"error": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+    def list(self, request):
+        """Totals over the range: orders, revenue, delivery fees, units, average order value"""
+        def build():
+            stats, start, end = self.filtered(request, DailyOrderStats.objects.all())
+            sales, _, _ = self.filtered(request, DailyProductSales.objects.all())
+            totals = stats.aggregate(orders=Sum('orders'), revenue=Sum('revenue'), delivery_fees=Sum('delivery_fees'))
+            orders = totals['orders'] or 0
+            revenue = totals['revenue'] or Decimal(0)
+            return {
+                "from": start, "to": end,
+                "orders": orders,
+                "revenue": money(revenue),
+                "delivery_fees": money(totals['delivery_fees']),
+                "units": sales.aggregate(units=Sum('units'))['units'] or 0,
+                "average_order_value": money(revenue / orders if orders else 0),
+            }
+        return self.respond(request, build)
+
+    @action(detail=False)
+    def daily(self, request):
+        """One row per day in the range, zeros included, for charting"""
+        def build():
+            stats, start, end = self.filtered(request, DailyOrderStats.objects.all())
+            sales, _, _ = self.filtered(request, DailyProductSales.objects.all())
+            by_day = {
+                row['day']: row for row in stats.values('day').annotate(
+                    orders=Sum('orders'), revenue=Sum('revenue'), delivery_fees=Sum('delivery_fees'),
+                ).order_by()
+            }
+            units = dict(sales.values('day').annotate(units=Sum('units')).values_list('day', 'units').order_by())
+            results = []
+            day = start
+            while day <= end:
+                row = by_day.get(day, {})
+                results.append({
+                    "day": day,
+                    "orders": row.get('orders') or 0,
+                    "revenue": money(row.get('revenue')),
+                    "delivery_fees": money(row.get('delivery_fees')),
+                    "units": units.get(day) or 0,
+                })
+                day += datetime.timedelta(days=1)
+            return {"from": start, "to": end, "results": results}
+        return self.respond(request, build)
+
+    @action(detail=False)
+    def products(self, request):
+        """Best sellers by units, optionally within one ?category="""
+        def build():
+            sales, start, end = self.filtered(request, DailyProductSales.objects.all())
+            if request.query_params.get('category'):
+                sales = sales.filter(category=request.query_params['category'])
+            try:
+                limit = max(1, min(int(request.query_params.get('limit', 10)), 100))
+            except ValueError:
+                raise ReportError("limit must be an integer")
+            top = list(
+                sales.values('product_id').annotate(units=Sum('units')).filter(units__gt=0)
+                .order_by('-units', 'product_id')[:limit]
+            )
+            names = Product.objects.in_bulk([row['product_id'] for row in top])
+            return {"from": start, "to": end, "results": [
+                {
+                    "product_id": row['product_id'],
+                    "name": names[row['product_id']].name if row['product_id'] in names else None,
+                    "category": names[row['product_id']].category if row['product_id'] in names else None,
+                    "units": row['units'],
+                }
+                for row in top
+            ]}
+        return self.respond(request, build)
+
+    @action(detail=False)
+    def categories(self, request):
+        """Units per category over the range"""
+        def build():
+            sales, start, end = self.filtered(request, DailyProductSales.objects.all())
+            rows = sales.values('category').annotate(units=Sum('units')).filter(units__gt=0).order_by('-units', 'category')
+            return {"from": start, "to": end, "results": list(rows)}
+        return self.respond(request, build)